@@ -0,0 +1,62 @@
+# benchmarks/bench_engines.py
+"""
+Compara o motor de threads com o motor asyncio: vazão e CPU por MB.
+
+Uso:
+    python benchmarks/bench_engines.py --size 200000000 --segments 8 32 128
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.downloader import create_download_logic, ENGINES
+from benchmarks.local_server import LocalRangeServer
+
+
+class SilentLang:
+    """Substitui o LanguageManager: o benchmark não precisa de textos."""
+    def get_string(self, key, **kwargs):
+        return key
+
+
+def run_once(engine, url, segments, save_path):
+    errors = []
+    logic = create_download_logic(SilentLang(), {"on_error": lambda t, m: errors.append(m)},
+                                  {"engine": engine, "async_max_concurrency": segments})
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    logic.download_file_manager(url, save_path, segments)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    if errors:
+        raise RuntimeError(errors[0])
+    return wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=200 * 1024 * 1024, help="tamanho do arquivo em bytes")
+    parser.add_argument('--segments', type=int, nargs='+', default=[8, 32, 128])
+    parser.add_argument('--rate', type=float, default=0, help="limite por conexão no servidor (bytes/s)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    size_mb = args.size / 1024 / 1024
+    print(f"{'motor':<9} {'segmentos':>9} {'MB/s':>9} {'CPU s/MB':>10}")
+    with LocalRangeServer(rate=args.rate) as server, tempfile.TemporaryDirectory() as tmp:
+        for segments in args.segments:
+            for engine in ENGINES:
+                best_wall, best_cpu = float('inf'), float('inf')
+                for _ in range(args.repeat):
+                    wall, cpu = run_once(engine, server.url(args.size), segments, tmp)
+                    best_wall = min(best_wall, wall)
+                    best_cpu = min(best_cpu, cpu)
+                print(f"{engine:<9} {segments:>9} {size_mb / best_wall:>9.1f} {best_cpu / size_mb:>10.5f}")
+
+
+if __name__ == "__main__":
+    main()
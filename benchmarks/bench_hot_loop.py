@@ -0,0 +1,102 @@
+# benchmarks/bench_hot_loop.py
+"""
+Mede o custo por chunk da contabilidade de progresso no loop de download.
+
+Compara a versão antiga (global_lock + time.time() + cálculo de velocidade a
+cada chunk) com a atual (cada worker só incrementa o próprio contador; um
+sampler agrega os contadores a cada 0.5s). Nenhuma rede ou disco é usado:
+só o trecho que roda por chunk é medido, com N threads disputando ao mesmo tempo.
+
+Uso:
+    python benchmarks/bench_hot_loop.py --threads 1 8 32 --chunks 200000
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.downloader import DownloadLogic
+from core.segments import Segment
+from core.utils import format_speed
+
+CHUNK = 1024 * 128
+
+
+class LockedCounters:
+    """Contabilidade como era antes: tudo sob o lock global, relógio a cada chunk."""
+    def __init__(self):
+        self.global_lock = threading.Lock()
+        self.global_total_downloaded = 0
+        self.thread_stats = {}
+
+    @staticmethod
+    def new_stats():
+        return {"downloaded": 0, "total_size": 0, "speed_str": "0 KB/s",
+                "last_time": time.time(), "last_downloaded": 0}
+
+    def worker(self, thread_id, segment, chunks):
+        for _ in range(chunks):
+            segment.position += CHUNK
+            with self.global_lock:
+                self.global_total_downloaded += CHUNK
+                stats = self.thread_stats[thread_id]
+                stats['downloaded'] += CHUNK
+                stats['total_size'] = stats['downloaded'] + segment.remaining
+                current_time = time.time()
+                time_diff = current_time - stats['last_time']
+                if time_diff > 0.5:
+                    bytes_diff = stats['downloaded'] - stats['last_downloaded']
+                    stats['speed_str'] = format_speed(bytes_diff / time_diff)
+                    stats['last_time'] = current_time
+                    stats['last_downloaded'] = stats['downloaded']
+
+
+class OwnedCounters:
+    """Contabilidade atual: o worker é o único escritor do seu contador."""
+    def __init__(self):
+        self.thread_stats = {}
+        self.new_stats = DownloadLogic.new_thread_stats
+
+    def worker(self, thread_id, segment, chunks):
+        stats = self.thread_stats[thread_id]
+        for _ in range(chunks):
+            segment.position += CHUNK
+            stats['downloaded'] += CHUNK
+
+
+def run(counters, num_threads, chunks):
+    """Retorna o tempo médio por chunk, em nanossegundos."""
+    threads = []
+    for i in range(num_threads):
+        counters.thread_stats[i] = counters.new_stats()
+        segment = Segment(i, 0, CHUNK * chunks * 2)
+        threads.append(threading.Thread(target=counters.worker, args=(i, segment, chunks)))
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return elapsed / (num_threads * chunks) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--chunks', type=int, default=200000, help="chunks por thread")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'threads':>7} {'antes ns/chunk':>15} {'agora ns/chunk':>15} {'removido':>9}")
+    for num_threads in args.threads:
+        chunks = max(1000, args.chunks // num_threads)
+        before = min(run(LockedCounters(), num_threads, chunks) for _ in range(args.repeat))
+        after = min(run(OwnedCounters(), num_threads, chunks) for _ in range(args.repeat))
+        print(f"{num_threads:>7} {before:>15.0f} {after:>15.0f} {(1 - after / before) * 100:>8.0f}%")
+
+
+if __name__ == "__main__":
+    main()
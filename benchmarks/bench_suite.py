@@ -0,0 +1,386 @@
+# benchmarks/bench_suite.py
+"""
+Suíte de benchmarks de vazão do DownloadLogic contra o servidor local
+(benchmarks/local_server.py), para comparar uma mudança com a anterior.
+
+Cada cenário (perfil do servidor x tamanho x segmentos x motor) roda em um
+processo próprio, que mede:
+
+    MB/s          vazão do download (do probe ao arquivo fechado)
+    CPU s/GB      tempo de CPU do processo (todas as threads) por GB baixado
+    RSS pico      memória máxima do processo (MB)
+    lock ms       tempo que as threads passaram esperando locks do core/
+    contenção     % das aquisições desses locks que precisaram esperar
+
+Os resultados vão para um JSON (benchmarks/results/ por padrão) com o commit,
+a máquina e os parâmetros; --compare mostra a diferença entre dois arquivos.
+
+Uso:
+    python benchmarks/bench_suite.py                       # preset rápido
+    python benchmarks/bench_suite.py --preset full         # 1 MB a 10 GB, 1 a 128 segmentos
+    python benchmarks/bench_suite.py --sizes 100M 1G --segments 8 32 --servers livre
+    python benchmarks/bench_suite.py --baseline benchmarks/results/antes.json
+    python benchmarks/bench_suite.py --compare antes.json depois.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.local_server import LocalRangeServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+GB = 1024 ** 3
+
+# Perfis do servidor local: "limitado" simula um servidor que limita cada conexão
+SERVERS = {
+    "livre": {"rate": 0, "latency": 0.0},
+    "limitado": {"rate": 4 * 1024 * 1024, "latency": 0.03},
+}
+
+PRESETS = {
+    "quick": {"sizes": ["1M", "100M"], "segments": [1, 8, 32], "repeat": 3},
+    "full": {"sizes": ["1M", "100M", "1G", "10G"], "segments": [1, 4, 16, 64, 128], "repeat": 3},
+}
+
+
+def parse_size(text):
+    """'1M', '100M', '1G', '10G' ou bytes -> bytes."""
+    units = {"K": 1024, "M": 1024 ** 2, "G": GB}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit, factor in (("G", GB), ("M", 1024 ** 2), ("K", 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+# --- Medições dentro do processo do cenário ---
+
+class ContendedLock:
+    """Lock instrumentado: conta aquisições e o tempo esperado quando já estava ocupado."""
+    def __init__(self, inner, site, stats):
+        self._inner = inner
+        self._stats = stats.setdefault(site, {"acquires": 0, "contended": 0, "wait": 0.0})
+
+    def acquire(self, blocking=True, timeout=-1):
+        stats = self._stats
+        stats["acquires"] += 1
+        if self._inner.acquire(False):
+            return True
+        stats["contended"] += 1
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self._inner.acquire(True, timeout)
+        stats["wait"] += time.perf_counter() - start
+        return acquired
+
+    def release(self):
+        self._inner.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self._inner.release()
+
+    def __getattr__(self, name):
+        # _is_owned, _release_save... (usados pelo Condition) vão direto ao lock real
+        return getattr(self._inner, name)
+
+
+class LockProfiler:
+    """
+    Troca threading.Lock/RLock/Condition, enquanto ativo, por versões
+    instrumentadas, mas só para os locks criados por módulos do core/ (os da
+    biblioteca padrão e do requests continuam os originais).
+    """
+    def __init__(self):
+        self.stats = {}
+        self.saved = None
+
+    def _site(self):
+        frame = sys._getframe(2)
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('core.'):
+            return f"{module}:{frame.f_lineno}"
+        return None
+
+    def __enter__(self):
+        real_lock, real_rlock, real_condition = self.saved = (threading.Lock, threading.RLock,
+                                                              threading.Condition)
+
+        def make_lock(*args, **kwargs):
+            site = self._site()
+            lock = real_lock()
+            return ContendedLock(lock, site, self.stats) if site else lock
+
+        def make_rlock(*args, **kwargs):
+            site = self._site()
+            lock = real_rlock()
+            return ContendedLock(lock, site, self.stats) if site else lock
+
+        def make_condition(lock=None):
+            site = self._site()
+            if lock is None and site:
+                lock = ContendedLock(real_rlock(), site, self.stats)
+            return real_condition(lock)
+
+        threading.Lock, threading.RLock, threading.Condition = make_lock, make_rlock, make_condition
+        return self
+
+    def __exit__(self, *exc):
+        threading.Lock, threading.RLock, threading.Condition = self.saved
+
+    def summary(self):
+        acquires = sum(s["acquires"] for s in self.stats.values())
+        contended = sum(s["contended"] for s in self.stats.values())
+        wait = sum(s["wait"] for s in self.stats.values())
+        top = max(self.stats.items(), key=lambda item: item[1]["wait"], default=(None, None))[0]
+        return {"lock_acquires": acquires, "lock_contended": contended, "lock_wait": wait,
+                "lock_top_site": top, "lock_sites": self.stats}
+
+
+def peak_rss_mb():
+    """Memória máxima do processo até agora, em MB (None se a plataforma não informar)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024 # macOS: bytes; Linux: KB
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                       [(name, ctypes.c_size_t) for name in (
+                           "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                           "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                           "PagefileUsage", "PeakPagefileUsage")]
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / 1024 / 1024
+    except (AttributeError, OSError):
+        return None
+
+
+class SilentLang:
+    """Substitui o LanguageManager: o benchmark não precisa de textos."""
+    def get_string(self, key, **kwargs):
+        return key
+
+
+def run_scenario(scenario):
+    """Roda um cenário neste processo e retorna as medições (chamado via --child)."""
+    from core.downloader import create_download_logic
+
+    errors = []
+    rss_base = peak_rss_mb()
+    with tempfile.TemporaryDirectory(dir=scenario["dir"]) as tmp:
+        profiler = LockProfiler() if scenario["locks"] else None
+        if profiler:
+            profiler.__enter__()
+        try:
+            logic = create_download_logic(
+                SilentLang(), {"on_error": lambda title, message: errors.append(message)},
+                {"engine": scenario["engine"], "async_max_concurrency": scenario["segments"]})
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            logic.download_file_manager(scenario["url"], tmp, scenario["segments"])
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+        finally:
+            if profiler:
+                profiler.__exit__()
+        path = os.path.join(tmp, os.path.basename(scenario["url"]))
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    if errors or size != scenario["size"]:
+        return {"error": errors[0] if errors else f"tamanho {size} != {scenario['size']}"}
+    result = {"wall": wall, "cpu": cpu, "mb_s": size / 1024 / 1024 / wall,
+              "cpu_s_per_gb": cpu / (size / GB), "rss_base_mb": rss_base, "rss_peak_mb": peak_rss_mb()}
+    if profiler:
+        result.update(profiler.summary())
+    return result
+
+
+# --- Orquestração (processo principal) ---
+
+def run_child(scenario, verbose):
+    """Roda o cenário em um processo novo; a última linha do stdout é o JSON do resultado."""
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', json.dumps(scenario)],
+                          stdout=subprocess.PIPE, stderr=None if verbose else subprocess.PIPE, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        detail = (proc.stderr or "").strip().splitlines()[-1:] if proc.stderr else []
+        return {"error": detail[0] if detail else f"código de saída {proc.returncode}"}
+    return json.loads(lines[-1])
+
+
+def aggregate(runs):
+    """Mediana das repetições (o pico de RSS é o maior)."""
+    ok = [r for r in runs if "error" not in r]
+    if not ok:
+        return {"error": runs[0]["error"]}
+    summary = {key: statistics.median(r[key] for r in ok)
+               for key in ("wall", "cpu", "mb_s", "cpu_s_per_gb")}
+    peaks = [r["rss_peak_mb"] for r in ok if r.get("rss_peak_mb") is not None]
+    summary["rss_peak_mb"] = max(peaks) if peaks else None
+    if "lock_wait" in ok[0]:
+        for key in ("lock_acquires", "lock_contended", "lock_wait"):
+            summary[key] = statistics.median(r[key] for r in ok)
+        summary["lock_top_site"] = ok[0]["lock_top_site"]
+    summary["failed_runs"] = len(runs) - len(ok)
+    return summary
+
+
+def scenario_key(result):
+    return (result["server"], result["size"], result["segments"], result["engine"])
+
+
+HEADER = (f"{'servidor':<9} {'tamanho':>7} {'segm.':>5} {'motor':<8} {'MB/s':>8} {'CPU s/GB':>9} "
+          f"{'RSS MB':>7} {'lock ms':>8} {'cont.%':>6}")
+
+
+def format_row(result):
+    head = (f"{result['server']:<9} {format_size(result['size']):>7} {result['segments']:>5} "
+            f"{result['engine']:<8}")
+    summary = result["summary"]
+    if "error" in summary:
+        return f"{head} ERRO: {summary['error']}"
+    rss = f"{summary['rss_peak_mb']:.0f}" if summary.get("rss_peak_mb") is not None else "-"
+    lock_ms = contention = "-"
+    if "lock_wait" in summary:
+        lock_ms = f"{summary['lock_wait'] * 1000:.1f}"
+        acquires = summary["lock_acquires"]
+        contention = f"{summary['lock_contended'] / acquires * 100:.1f}" if acquires else "0.0"
+    return (f"{head} {summary['mb_s']:>8.1f} {summary['cpu_s_per_gb']:>9.2f} {rss:>7} "
+            f"{lock_ms:>8} {contention:>6}")
+
+
+def compare(old, new):
+    """Mostra, para os cenários presentes nos dois arquivos, a variação de vazão e CPU."""
+    old_results = {scenario_key(r): r["summary"] for r in old["results"]}
+    print(f"\nantes: {old['meta'].get('commit')} ({old['meta'].get('date')})")
+    print(f"agora: {new['meta'].get('commit')} ({new['meta'].get('date')})")
+    print(f"{'servidor':<9} {'tamanho':>7} {'segm.':>5} {'motor':<8} {'MB/s antes':>10} {'agora':>8} "
+          f"{'Δ':>7} {'CPU s/GB Δ':>11}")
+    for result in new["results"]:
+        before, after = old_results.get(scenario_key(result)), result["summary"]
+        if not before or "error" in before or "error" in after:
+            continue
+        speed_delta = (after["mb_s"] / before["mb_s"] - 1) * 100
+        cpu_delta = (after["cpu_s_per_gb"] / before["cpu_s_per_gb"] - 1) * 100 if before["cpu_s_per_gb"] else 0
+        print(f"{result['server']:<9} {format_size(result['size']):>7} {result['segments']:>5} "
+              f"{result['engine']:<8} {before['mb_s']:>10.1f} {after['mb_s']:>8.1f} "
+              f"{speed_delta:>+6.1f}% {cpu_delta:>+10.1f}%")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=PRESETS, default="quick")
+    parser.add_argument('--sizes', nargs='+', help="tamanhos dos arquivos (ex.: 1M 100M 1G 10G)")
+    parser.add_argument('--segments', type=int, nargs='+', help="número de segmentos (conexões)")
+    parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+    parser.add_argument('--engines', nargs='+', default=["threads"], help="threads e/ou asyncio")
+    parser.add_argument('--repeat', type=int, help="repetições por cenário (vale a mediana)")
+    parser.add_argument('--rate', type=float, help="limite por conexão do servidor 'limitado' (bytes/s)")
+    parser.add_argument('--latency', type=float, help="latência por requisição do servidor 'limitado' (s)")
+    parser.add_argument('--dir', default=None, help="pasta dos arquivos baixados (padrão: temporária)")
+    parser.add_argument('--no-locks', action='store_true', help="não instrumenta os locks do core/")
+    parser.add_argument('--output', help="arquivo JSON dos resultados (padrão: benchmarks/results/)")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparar no fim")
+    parser.add_argument('--compare', nargs=2, metavar=("ANTES", "DEPOIS"), help="só compara dois JSON")
+    parser.add_argument('--verbose', action='store_true', help="mostra as mensagens do motor")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Processo de um cenário: os print() do motor vão para stderr; stdout só com o resultado
+        stdout, sys.stdout = sys.stdout, sys.stderr
+        result = run_scenario(json.loads(args.child))
+        stdout.write(json.dumps(result) + "\n")
+        return
+    if args.compare:
+        compare(load_results(args.compare[0]), load_results(args.compare[1]))
+        return
+
+    preset = PRESETS[args.preset]
+    sizes = [parse_size(s) for s in (args.sizes or preset["sizes"])]
+    segments_list = args.segments or preset["segments"]
+    repeat = args.repeat or preset["repeat"]
+    servers = {name: dict(SERVERS[name]) for name in args.servers}
+    if "limitado" in servers:
+        if args.rate is not None:
+            servers["limitado"]["rate"] = args.rate
+        if args.latency is not None:
+            servers["limitado"]["latency"] = args.latency
+    download_dir = args.dir or tempfile.gettempdir()
+
+    meta = {"commit": git_commit(), "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "repeat": repeat, "servers": servers, "locks": not args.no_locks}
+    results = []
+    print(HEADER)
+    for server_name, profile in servers.items():
+        with LocalRangeServer(rate=profile["rate"], latency=profile["latency"]) as server:
+            for size in sizes:
+                for segments in segments_list:
+                    for engine in args.engines:
+                        result = {"server": server_name, "size": size, "segments": segments, "engine": engine}
+                        if shutil.disk_usage(download_dir).free < size * 1.1:
+                            result["summary"] = {"error": "espaço em disco insuficiente"}
+                        else:
+                            scenario = {"url": server.url(size), "size": size, "segments": segments,
+                                        "engine": engine, "dir": download_dir, "locks": not args.no_locks}
+                            runs = [run_child(scenario, args.verbose) for _ in range(repeat)]
+                            result["runs"] = runs
+                            result["summary"] = aggregate(runs)
+                        results.append(result)
+                        print(format_row(result), flush=True)
+
+    report = {"meta": meta, "results": results}
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{meta['commit'] or 'local'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados salvos em {output}")
+    if args.baseline:
+        compare(load_results(args.baseline), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# benchmarks/local_server.py
+"""
+Servidor HTTP local com suporte a Range, para benchmarks reprodutíveis.
+
+Os arquivos são sintéticos: /arquivo-<bytes>.bin tem exatamente <bytes> bytes,
+gerados a partir de um bloco pseudo-aleatório fixo (nada é lido do disco).
+Opções permitem limitar a banda por conexão, simular latência e recusar
+(503) conexões acima de um limite.
+
+Uso direto:
+    python benchmarks/local_server.py --port 8000 --rate 5000000 --latency 0.02
+"""
+import argparse
+import hashlib
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOCK_SIZE = 1024 * 1024
+_BLOCK = random.Random(1234).randbytes(BLOCK_SIZE)
+FILE_RE = re.compile(r'^/arquivo-(\d+)\.bin$')
+SEND_SIZE = 64 * 1024
+
+
+def synthetic_bytes(offset, length):
+    """Conteúdo do arquivo sintético entre offset e offset + length."""
+    out = bytearray()
+    while length > 0:
+        pos = offset % BLOCK_SIZE
+        piece = _BLOCK[pos:pos + min(length, BLOCK_SIZE - pos)]
+        out += piece
+        offset += len(piece)
+        length -= len(piece)
+    return bytes(out)
+
+
+def synthetic_sha256(size):
+    digest = hashlib.sha256()
+    for offset in range(0, size, BLOCK_SIZE):
+        digest.update(synthetic_bytes(offset, min(BLOCK_SIZE, size - offset)))
+    return digest.hexdigest()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    rate = 0        # bytes/s por conexão (0 = sem limite)
+    latency = 0.0   # segundos antes de responder cada requisição
+    no_ranges = False
+    max_conns = 0   # transferências simultâneas antes de responder 503 (0 = sem limite)
+    active = 0
+    active_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        match = FILE_RE.match(self.path.split('?')[0])
+        if not match:
+            self.send_error(404)
+            return
+        size = int(match.group(1))
+        etag = f'"sintetico-{size}"'
+        if self.latency:
+            time.sleep(self.latency)
+
+        start, end, status = 0, size - 1, 200
+        range_header = self.headers.get('Range')
+        if range_header and not self.no_ranges:
+            m = re.match(r'bytes=(\d*)-(\d*)', range_header)
+            if m and m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)) if m.group(2) else size - 1, size - 1)
+                status = 206
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+        if send_body and self.max_conns:
+            with self.active_lock:
+                refuse = RangeHandler.active >= self.max_conns
+                if not refuse:
+                    RangeHandler.active += 1
+            if refuse:
+                self.send_response(503)
+                self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            try:
+                self._send_headers(status, start, end, size, etag)
+                self._send_body(start, end)
+            finally:
+                with self.active_lock:
+                    RangeHandler.active -= 1
+            return
+
+        self._send_headers(status, start, end, size, etag)
+        if send_body:
+            self._send_body(start, end)
+
+    def _send_headers(self, status, start, end, size, etag):
+        self.send_response(status)
+        if not self.no_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+
+    def _send_body(self, start, end):
+        sent = 0
+        t0 = time.perf_counter()
+        offset = start
+        try:
+            while offset <= end:
+                length = min(SEND_SIZE, end - offset + 1)
+                self.wfile.write(synthetic_bytes(offset, length))
+                offset += length
+                sent += length
+                if self.rate:
+                    ahead = sent / self.rate - (time.perf_counter() - t0)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class BenchServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256 # Evita SYN descartados com 100+ conexões simultâneas
+
+    def handle_error(self, request, client_address):
+        # Clientes que fecham a conexão no meio (roubo de segmento, cancelamento) são normais
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def serve(port, rate=0, latency=0.0, no_ranges=False, max_conns=0):
+    handler = type('Handler', (RangeHandler,), {'rate': rate, 'latency': latency,
+                                                'no_ranges': no_ranges, 'max_conns': max_conns})
+    server = BenchServer(('127.0.0.1', port), handler)
+    print(f"PORT {server.server_address[1]}", flush=True)
+    server.serve_forever()
+
+
+class LocalRangeServer:
+    """
+    Sobe o servidor em um processo separado (para que a CPU dele não seja
+    contada no benchmark). Uso: `with LocalRangeServer(rate=...) as srv: srv.url(size)`.
+    """
+    def __init__(self, rate=0, latency=0.0, no_ranges=False, max_conns=0):
+        self.args = ['--rate', str(rate), '--latency', str(latency), '--max-conns', str(max_conns)]
+        if no_ranges:
+            self.args.append('--no-ranges')
+        self.proc = None
+        self.port = None
+
+    def __enter__(self):
+        self.proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--port', '0'] + self.args,
+                                     stdout=subprocess.PIPE, text=True)
+        line = self.proc.stdout.readline()
+        self.port = int(line.split()[1])
+        return self
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        self.proc.wait()
+
+    def url(self, size):
+        return f"http://127.0.0.1:{self.port}/arquivo-{size}.bin"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor HTTP local com suporte a Range")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--rate', type=float, default=0, help="bytes/s por conexão (0 = sem limite)")
+    parser.add_argument('--latency', type=float, default=0.0, help="atraso por requisição, em segundos")
+    parser.add_argument('--no-ranges', action='store_true', help="ignora o header Range")
+    parser.add_argument('--max-conns', type=int, default=0,
+                        help="responde 503 acima deste número de transferências simultâneas")
+    args = parser.parse_args()
+    serve(args.port, args.rate, args.latency, args.no_ranges, args.max_conns)
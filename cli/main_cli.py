@@ -0,0 +1,250 @@
+# cli/main_cli.py
+"""
+Modo sem interface gráfica (servidores, scripts, CI): `python run.py URL ...`
+
+Usa o mesmo motor das GUIs (create_download_logic) e escreve o progresso em
+stdout como JSON lines, um objeto por linha com o campo "event":
+
+    start     {url, index, total}
+    status    {url, message}
+    progress  {url, downloaded, total, progress, speed, eta}
+    complete  {url, file, hash}
+    error     {url, title, message}
+    trace     {url, file}   (com --trace: linha do tempo para o Perfetto)
+    summary   {completed, failed, seconds}
+
+Mensagens de diagnóstico do motor vão para stderr. Nada aqui importa
+tkinter, PIL, sv_ttk ou kivy.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from core import database
+from core.downloader import create_download_logic, ENGINES
+from core.i18n import LanguageManager
+from core.integrity import CHECKSUM_SUFFIXES
+from core.metrics import Metrics, MetricsServer, MetricsFile
+from core.settings import load_settings
+
+# Códigos de saída
+EXIT_OK = 0
+EXIT_FAILED = 1       # Pelo menos um download falhou
+EXIT_USAGE = 2        # Argumentos inválidos (o mesmo código do argparse)
+EXIT_CHECKSUM = 3     # Pelo menos um arquivo não bateu com o checksum (e nenhum outro erro)
+EXIT_INTERRUPTED = 130 # Ctrl+C; os journals ficam para retomar depois
+
+
+class JsonLines:
+    """Escreve um evento por linha; chamado da thread principal e da telemetria."""
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps(dict(event=event, **fields), ensure_ascii=False)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def parse_line(line):
+    """
+    Uma linha da lista de URLs (ou os argumentos de um download): a primeira
+    URL é a principal, as outras são espelhos; um hash ('hex' ou
+    'algoritmo:hex') ou a URL de um .sha256/.md5 é o checksum esperado.
+    Retorna (url, espelhos, checksum) ou None para linhas vazias/comentários.
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    urls, checksum = [], None
+    for token in line.split():
+        is_url = token.startswith(('http://', 'https://'))
+        if not is_url or token.lower().endswith(CHECKSUM_SUFFIXES):
+            checksum = token
+        else:
+            urls.append(token)
+    if not urls:
+        return None
+    return urls[0], urls[1:], checksum
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="run.py",
+        description="Gerenciador de Downloads Acelerado - modo sem interface (saída em JSON lines).")
+    parser.add_argument("urls", nargs="*", metavar="URL", help="URLs a baixar (uma por download)")
+    parser.add_argument("-i", "--input-file", metavar="ARQUIVO",
+                        help="lista de downloads, um por linha: URL [espelhos...] [checksum] ('-' = stdin)")
+    parser.add_argument("-o", "--output", default=".", metavar="PASTA", help="pasta de destino (padrão: atual)")
+    parser.add_argument("-n", "--connections", type=int, metavar="N",
+                        help="conexões por download (padrão: 'custom_threads' das configurações)")
+    parser.add_argument("-c", "--checksum", metavar="HASH",
+                        help="checksum esperado ('hex', 'algoritmo:hex' ou URL de um .sha256) de um único download")
+    parser.add_argument("-m", "--mirror", action="append", default=[], metavar="URL",
+                        help="espelho do mesmo arquivo (pode repetir) de um único download")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="modo adaptativo: --connections passa a ser o máximo")
+    parser.add_argument("--engine", choices=ENGINES, help="motor de download")
+    parser.add_argument("--max-speed", type=int, metavar="KB/s", help="limite de banda (0 = sem limite)")
+    parser.add_argument("--interval", type=float, metavar="SEG", help="segundos entre eventos 'progress'")
+    parser.add_argument("--trace", metavar="PASTA",
+                        help="grava a linha do tempo de cada download (Chrome trace, abra em ui.perfetto.dev)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORTA",
+                        help="serve as métricas (formato Prometheus) em http://127.0.0.1:PORTA/metrics")
+    parser.add_argument("--metrics-file", metavar="ARQUIVO",
+                        help="grava as métricas (formato Prometheus) neste arquivo periodicamente e no fim")
+    parser.add_argument("--store", action="store_true",
+                        help="usa o content store: arquivos já baixados (mesmo hash) são ligados/copiados em vez de baixados")
+    parser.add_argument("--delta", action="store_true",
+                        help="atualiza a cópia já existente baixando só os blocos que mudaram "
+                             "(requer URL.delta.json, gerado com python -m core.delta)")
+    return parser
+
+
+def collect_downloads(args, parser):
+    downloads = []
+    for url in args.urls:
+        downloads.append((url, [], None))
+    if args.input_file:
+        try:
+            if args.input_file == '-':
+                lines = sys.stdin.read().splitlines()
+            else:
+                with open(args.input_file, 'r', encoding='utf-8') as f:
+                    lines = f.read().splitlines()
+        except OSError as e:
+            parser.error(f"não foi possível ler {args.input_file}: {e}")
+        downloads.extend(d for d in map(parse_line, lines) if d)
+    if not downloads:
+        parser.error("informe pelo menos uma URL ou --input-file")
+    if args.checksum or args.mirror:
+        if len(downloads) != 1:
+            parser.error("--checksum e --mirror valem para um único download")
+        url, mirrors, checksum = downloads[0]
+        downloads[0] = (url, mirrors + args.mirror, args.checksum or checksum)
+    return downloads
+
+
+def run_download(logic, out, url, mirrors, checksum, output, connections):
+    """Baixa um arquivo; retorna EXIT_OK, EXIT_FAILED, EXIT_CHECKSUM ou EXIT_INTERRUPTED."""
+    result = {"file": None, "error": None}
+    checksum_title = logic.lang.get_string("error_checksum")
+
+    def on_complete(filename):
+        result["file"] = filename
+
+    def on_error(title, message):
+        result["error"] = title
+        out.emit("error", url=url, title=title, message=message)
+
+    def on_telemetry(snapshot):
+        out.emit("progress", url=url, downloaded=snapshot["downloaded"], total=snapshot["total"],
+                 progress=round(snapshot["progress"], 2), speed=round(snapshot["speed"]),
+                 eta=None if snapshot["eta"] is None else round(snapshot["eta"], 1))
+
+    logic.callbacks = {
+        "on_complete": on_complete,
+        "on_error": on_error,
+        "on_status_change": lambda message: out.emit("status", url=url, message=message),
+        "on_telemetry": on_telemetry,
+    }
+
+    # O download roda em outra thread para o Ctrl+C cancelar com o journal salvo.
+    # Espera por um Event: um join() interrompido pelo Ctrl+C pode retornar antes da hora.
+    finished = threading.Event()
+
+    def run():
+        try:
+            logic.download_file_manager(url, output, connections, checksum, mirrors)
+        finally:
+            finished.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while not finished.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        logic.stop_download(cancelled=True)
+        finished.wait()
+        out.emit("error", url=url, title="interrupted", message=logic.lang.get_string("status_cancelled"))
+        return EXIT_INTERRUPTED
+
+    if logic.trace_file:
+        out.emit("trace", url=url, file=logic.trace_file)
+    if result["error"]:
+        return EXIT_CHECKSUM if result["error"] == checksum_title else EXIT_FAILED
+    if not result["file"]:
+        return EXIT_FAILED
+    out.emit("complete", url=url, file=result["file"], hash=logic.file_hash)
+    return EXIT_OK
+
+
+def start_cli(argv):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    downloads = collect_downloads(args, parser)
+
+    settings = load_settings()
+    if args.engine:
+        settings["engine"] = args.engine
+    if args.adaptive:
+        settings["thread_mode"] = "Adaptativo"
+    if args.interval:
+        settings["telemetry_interval"] = args.interval
+    if args.store:
+        settings["content_store"] = True
+    if args.delta:
+        settings["delta_updates"] = True
+    connections = max(1, args.connections or int(settings.get("custom_threads", 16)))
+
+    # stdout fica só para o JSON; os print() do motor vão para stderr
+    out = JsonLines(sys.stdout)
+    sys.stdout = sys.stderr
+
+    lang = LanguageManager(settings)
+    database.init_db()
+    metrics = metrics_file = None
+    if args.metrics_port or args.metrics_file:
+        metrics = Metrics()
+    if args.metrics_port:
+        try:
+            MetricsServer(metrics, args.metrics_port).start()
+        except OSError as e:
+            print(f"Erro ao iniciar as métricas na porta {args.metrics_port}: {e}")
+    if args.metrics_file:
+        metrics_file = MetricsFile(metrics, args.metrics_file, settings.get("metrics_interval", 15))
+        metrics_file.start()
+    logic = None
+    completed = failed = 0
+    exit_code = EXIT_OK
+    started = time.time()
+    for index, (url, mirrors, checksum) in enumerate(downloads):
+        # Um motor por download, com o mesmo pool de conexões e a mesma telemetria
+        logic = create_download_logic(lang, {}, settings,
+                                      telemetry=logic.telemetry if logic else None,
+                                      connection_pool=logic.connection_pool if logic else None,
+                                      metrics=metrics)
+        if args.max_speed:
+            logic.set_speed_limit(args.max_speed * 1024)
+        if args.trace:
+            logic.trace_dir = args.trace
+        out.emit("start", url=url, index=index, total=len(downloads))
+        code = run_download(logic, out, url, mirrors, checksum, args.output, connections)
+        if code == EXIT_OK:
+            completed += 1
+        else:
+            failed += 1
+            # Um erro de download pesa mais que um checksum errado
+            if exit_code in (EXIT_OK, EXIT_CHECKSUM):
+                exit_code = code
+        if code == EXIT_INTERRUPTED:
+            break
+
+    out.emit("summary", completed=completed, failed=failed, seconds=round(time.time() - started, 2))
+    if metrics_file:
+        metrics_file.stop()
+    return exit_code
@@ -0,0 +1,115 @@
+# core/adaptive.py
+
+THROTTLE_STATUS = (429, 503) # Respostas que indicam excesso de conexões
+
+ADAPTIVE_INITIAL = 2      # Conexões iniciais no modo adaptativo
+ADAPTIVE_STEP = 2         # Conexões adicionadas a cada melhoria de vazão
+ADAPTIVE_INTERVAL = 1.0   # Segundos entre medições
+ADAPTIVE_MIN_GAIN = 0.05  # Ganho mínimo (5%) para continuar adicionando conexões
+ADAPTIVE_COOLDOWN = 5.0   # Segundos sem crescer depois de um sinal de limitação
+
+
+class ServerThrottled(Exception):
+    """O servidor recusou a conexão ou o Range: sinal para reduzir conexões."""
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status # Código HTTP, se a causa foi uma resposta
+        self.retry_after = retry_after # Segundos pedidos pelo header Retry-After
+
+
+class AdaptiveController:
+    """
+    Decide quantas conexões usar a partir da vazão medida (não do número de CPUs).
+
+    Começa com poucas conexões e, a cada intervalo, compara a vazão agregada
+    com a do nível anterior: enquanto melhora, adiciona conexões; quando
+    estabiliza, para de crescer; se piora após um aumento, desfaz o aumento.
+    Respostas 429/503, Range recusado ou conexões recusadas (`throttled()`)
+    cortam o número pela metade e bloqueiam o crescimento por um tempo. O
+    nível limitado vira um teto: depois do cooldown, a sondagem sobe só até
+    um abaixo dele. Sinais que chegam durante o cooldown vêm de requisições
+    feitas antes do corte e são ignorados.
+    """
+    def __init__(self, max_connections, initial=ADAPTIVE_INITIAL, step=ADAPTIVE_STEP,
+                 interval=ADAPTIVE_INTERVAL, min_gain=ADAPTIVE_MIN_GAIN):
+        self.max_connections = max(1, max_connections)
+        self.target = min(initial, self.max_connections)
+        self.step = step
+        self.interval = interval
+        self.min_gain = min_gain
+        self.growing = True
+        self.level_throughput = 0.0 # Vazão medida com o número de conexões anterior
+        self.last_bytes = None
+        self.last_time = None
+        self.frozen_until = 0.0
+        self.pending_throttle = False
+        self.ceiling = None # Menor número de conexões em que o servidor limitou
+
+    def throttled(self):
+        """Sinaliza que o servidor está limitando (pode ser chamado de qualquer thread)."""
+        self.pending_throttle = True
+
+    def observe(self, total_bytes, now):
+        """
+        Recebe o total de bytes baixados até `now` e devolve o novo número de
+        conexões desejado, ou None se nada mudou.
+        """
+        if self.pending_throttle and now < self.frozen_until:
+            self.pending_throttle = False # Conexões abertas antes do último corte
+        if self.pending_throttle:
+            self.pending_throttle = False
+            self.ceiling = min(self.ceiling or self.target, self.target)
+            self.growing = False
+            self.frozen_until = now + ADAPTIVE_COOLDOWN
+            self.last_bytes, self.last_time = total_bytes, now
+            self.level_throughput = 0.0
+            new_target = max(1, self.target // 2)
+            return self._set_target(new_target)
+
+        if self.last_time is None:
+            self.last_bytes, self.last_time = total_bytes, now
+            return None
+        elapsed = now - self.last_time
+        if elapsed < self.interval:
+            return None
+
+        throughput = (total_bytes - self.last_bytes) / elapsed
+        self.last_bytes, self.last_time = total_bytes, now
+
+        if now < self.frozen_until:
+            return None
+        if not self.growing and self.target < self._limit() and now >= self.frozen_until > 0:
+            # Fim do cooldown: volta a sondar com cuidado
+            self.frozen_until = 0.0
+            self.growing = True
+            self.level_throughput = throughput
+            return self._set_target(self.target + 1)
+
+        previous = self.level_throughput
+        self.level_throughput = throughput
+        if previous == 0:
+            return self._set_target(self.target + self.step) if self.growing else None
+
+        if throughput > previous * (1 + self.min_gain):
+            if self.growing:
+                return self._set_target(self.target + self.step)
+            return None
+        if self.growing and throughput < previous * (1 - self.min_gain):
+            # O último aumento piorou a vazão: desfaz e estabiliza
+            self.growing = False
+            return self._set_target(self.target - self.step)
+        self.growing = False # Platô
+        return None
+
+    def _limit(self):
+        """Máximo de conexões permitido: o configurado e, após uma limitação, um abaixo do teto."""
+        if self.ceiling is None:
+            return self.max_connections
+        return max(1, min(self.max_connections, self.ceiling - 1))
+
+    def _set_target(self, target):
+        target = max(1, min(self._limit(), target))
+        if target == self.target:
+            return None
+        self.target = target
+        return target
@@ -0,0 +1,333 @@
+# core/async_engine.py
+import asyncio
+import ssl
+import time
+from urllib.parse import urlparse
+
+from .adaptive import ServerThrottled, THROTTLE_STATUS, ADAPTIVE_INTERVAL
+from .downloader import DownloadLogic, JOURNAL_INTERVAL
+from .retry import HTTPStatusError, parse_retry_after
+from . import tracing
+
+IO_TIMEOUT = 20
+DEFAULT_MAX_CONCURRENCY = 64
+SUPERVISE_INTERVAL = 0.25 # Segundos entre checagens de cancelamento
+
+
+class RangeConnection:
+    """
+    Conexão HTTP/1.1 keep-alive mínima sobre asyncio streams, só para GETs
+    com Range. A sondagem (HEAD, redirecionamentos) continua sendo feita pelo
+    requests no DownloadLogic; aqui a URL já é a final.
+
+    Handshakes e reusos entram nos contadores do ConnectionPool do motor.
+    As conexões pertencem ao event loop do download e não passam para o
+    próximo job (o loop termina junto com ele).
+    """
+    def __init__(self, url, ssl_context, pool=None):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.is_https = parsed.scheme == 'https'
+        self.port = parsed.port or (443 if self.is_https else 80)
+        self.target = parsed.path or '/'
+        if parsed.query:
+            self.target += '?' + parsed.query
+        self.host_header = parsed.netloc.rsplit('@', 1)[-1]
+        self.ssl_context = ssl_context if self.is_https else None
+        self.pool = pool
+        self.pool_key = f"{self.host}:{self.port}"
+        self.reader = None
+        self.writer = None
+
+    async def request_range(self, start, end, extra_headers=None, trace=None):
+        """
+        Envia o GET e retorna (status, headers, content_length). Com `trace`
+        (tracing.SegmentTrace), a abertura da conexão (DNS + TCP + TLS) vira
+        um evento "connect".
+        """
+        reused = self.writer is not None
+        if not reused:
+            connect_start = time.perf_counter()
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self.ssl_context,
+                                        server_hostname=self.host if self.ssl_context else None),
+                IO_TIMEOUT)
+            if trace is not None:
+                trace.span("connect", connect_start, time.perf_counter(), tls=self.is_https)
+        if self.pool is not None:
+            self.pool.record(self.pool_key, reused)
+
+        lines = [f"GET {self.target} HTTP/1.1",
+                 f"Host: {self.host_header}",
+                 f"Range: bytes={start}-{end}",
+                 "Accept-Encoding: identity",
+                 "Connection: keep-alive"]
+        for key, value in (extra_headers or {}).items():
+            lines.append(f"{key}: {value}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        await self.writer.drain()
+
+        status_line = await asyncio.wait_for(self.reader.readline(), IO_TIMEOUT)
+        if not status_line:
+            raise ConnectionError("Conexão fechada pelo servidor")
+        status = int(status_line.split(b' ', 2)[1])
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), IO_TIMEOUT)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        if 'content-length' not in headers:
+            raise ConnectionError(f"Resposta sem Content-Length (HTTP {status})")
+        return status, headers, int(headers['content-length'])
+
+    async def read(self, size):
+        chunk = await asyncio.wait_for(self.reader.read(size), IO_TIMEOUT)
+        if not chunk:
+            raise ConnectionError("Conexão fechada no meio do corpo da resposta")
+        return chunk
+
+    def close(self):
+        """Descarta a conexão (necessário se o corpo não foi lido até o fim)."""
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class AsyncDownloadLogic(DownloadLogic):
+    """
+    Motor alternativo: todos os segmentos rodam como corrotinas em um único
+    event loop (sockets não bloqueantes), em vez de uma thread por conexão.
+
+    Mantém a mesma interface de callbacks, o scheduler e o journal do
+    DownloadLogic; só a etapa de transferência dos segmentos é substituída.
+    `max_concurrency` limita quantas conexões o loop mantém abertas.
+    """
+    def __init__(self, lang_manager, callbacks, connection_budget=None,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, telemetry=None, bandwidth=None,
+                 connection_pool=None):
+        super().__init__(lang_manager, callbacks, connection_budget=connection_budget,
+                         telemetry=telemetry, bandwidth=bandwidth, connection_pool=connection_pool)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.ssl_context = ssl.create_default_context()
+
+    def run_segments(self, session, url, writer, scheduler, num_workers, journal, validator):
+        asyncio.run(self._run_segments_async(url, writer, scheduler, num_workers, journal, validator))
+
+    async def _run_segments_async(self, url, writer, scheduler, num_workers, journal, validator):
+        num_workers = min(num_workers, self.max_concurrency)
+        tasks = []
+
+        def start_worker(worker_id):
+            tasks.append(asyncio.create_task(
+                self._segment_worker(writer, scheduler, worker_id)))
+
+        for _ in range(num_workers):
+            self._spawn_worker(start_worker)
+
+        await self._supervise(tasks, start_worker, scheduler, journal, url, validator,
+                              writer.fileno())
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._finish_journal(scheduler, journal, url, validator, writer.fileno())
+
+    async def _supervise(self, tasks, start_worker, scheduler, journal, url, validator, fd):
+        """
+        Salva o journal periodicamente, ajusta o número de corrotinas no modo
+        adaptativo e cancela todas se o download parar.
+        """
+        loop = asyncio.get_running_loop()
+        last_save = last_adapt = loop.time()
+        while not all(t.done() for t in tasks):
+            await asyncio.wait([t for t in tasks if not t.done()], timeout=SUPERVISE_INTERVAL)
+            if not self.download_active:
+                for t in tasks:
+                    t.cancel()
+                return
+            now = loop.time()
+            if self.adaptive_controller and now - last_adapt >= ADAPTIVE_INTERVAL:
+                last_adapt = now
+                self._adapt(start_worker, time.time())
+            if now - last_save >= JOURNAL_INTERVAL:
+                last_save = now
+                await loop.run_in_executor(None, self._save_journal, journal, url, validator,
+                                           scheduler, fd)
+
+    async def _segment_worker(self, writer, scheduler, worker_id):
+        loop = asyncio.get_running_loop()
+        conns = {} # Uma conexão keep-alive por espelho
+        retired = False
+        failures = 0
+        delay = 0
+        try:
+            while self.download_active:
+                if delay:
+                    # Backoff antes de pegar outro segmento (cancelado se o download parar)
+                    await asyncio.sleep(delay)
+                    delay = 0
+                if self._should_retire_worker():
+                    retired = True
+                    return
+                if self.connection_budget is not None:
+                    if not await loop.run_in_executor(None, self._acquire_connection):
+                        return
+                try:
+                    segment = scheduler.next_segment()
+                    if segment is None:
+                        return
+                    mirror = self.mirrors.pick()
+                    if mirror is None:
+                        scheduler.release(segment)
+                        raise ConnectionError("Nenhum espelho disponível")
+                    if not await self._acquire_host(mirror.url):
+                        scheduler.release(segment)
+                        return
+                    conn = conns.get(mirror.url)
+                    if conn is None:
+                        conn = conns[mirror.url] = RangeConnection(mirror.url, self.ssl_context,
+                                                                   self.connection_pool)
+                    self.thread_stats[worker_id]['segment'] = segment
+                    start_position, start_time = segment.position, loop.time()
+                    try:
+                        await self._download_segment(conn, mirror, writer, segment, worker_id)
+                    except Exception as e:
+                        if self.download_active and self.mirrors.can_fail_over(mirror):
+                            # Os bytes já gravados ficam; o resto da faixa vai para outro espelho
+                            print(f"Corrotina {worker_id}: falha no espelho {mirror.url}: {e}")
+                            conn.close()
+                            scheduler.release(segment)
+                            self.mirrors.failed(mirror, e)
+                            self._trace_event("mirror_failed", worker_id, mirror=mirror.url, error=str(e))
+                            continue
+                        if self.download_active and self._can_back_off(e):
+                            print(f"Corrotina {worker_id} encerrada: {e}")
+                            scheduler.release(segment)
+                            self._trace_event("throttled", worker_id, error=str(e))
+                            self._throttled()
+                            return
+                        # O resto da faixa volta para o scheduler, a partir do byte em que parou
+                        conn.close()
+                        scheduler.release(segment)
+                        if not self.download_active:
+                            return
+                        if segment.position > start_position:
+                            failures = 0
+                        failures += 1
+                        delay = self._retry_delay(e, failures, worker_id)
+                        if delay is None:
+                            return
+                        continue
+                    finally:
+                        self.connection_pool.release(mirror.url)
+                    self.mirrors.record(mirror, segment.position - start_position, loop.time() - start_time)
+                    scheduler.finish(segment)
+                    failures = 0
+                finally:
+                    self._release_connection()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            if self.download_active:
+                print(f"Erro na corrotina {worker_id}: {e}")
+                self.stop_download(error=e)
+        finally:
+            for conn in conns.values():
+                conn.close()
+            self._worker_exited(worker_id, retired)
+
+    async def _acquire_host(self, url):
+        """
+        Vaga no limite por host; só vai para o executor se o host estiver cheio.
+        Se a corrotina for cancelada enquanto espera (pausa, cancelamento ou o
+        modo adaptativo encerrando o worker), a thread do executor continua na
+        fila do host: a vaga que ela ainda conseguir é devolvida na hora.
+        """
+        if self.connection_pool.try_acquire(url):
+            return True
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, self.connection_pool.acquire, url, self.is_active)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda f: self._release_orphan_slot(f, url))
+            raise
+
+    def _release_orphan_slot(self, future, url):
+        if not future.cancelled() and future.exception() is None and future.result():
+            self.connection_pool.release(url)
+
+    async def _download_segment(self, conn, mirror, writer, segment, worker_id):
+        trace = tracing.SegmentTrace(self.tracer, worker_id, segment, mirror=mirror.url) if self.tracer else None
+        error = None
+        try:
+            await self._transfer_segment(conn, mirror, writer, segment, worker_id, trace)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if trace is not None:
+                trace.finish(error)
+
+    async def _transfer_segment(self, conn, mirror, writer, segment, worker_id, trace):
+        headers = {'If-Range': mirror.if_range} if mirror.if_range else None
+        try:
+            status, response_headers, body_left = await conn.request_range(segment.position, segment.end,
+                                                                           headers, trace)
+        except (ConnectionError, OSError):
+            # Conexão keep-alive pode ter sido fechada pelo servidor: tenta uma vez mais
+            conn.close()
+            status, response_headers, body_left = await conn.request_range(segment.position, segment.end,
+                                                                           headers, trace)
+        if trace is not None:
+            trace.headers(status)
+        if status != 206:
+            conn.close()
+            retry_after = parse_retry_after(response_headers.get('retry-after'))
+            if status in THROTTLE_STATUS:
+                raise ServerThrottled(f"Servidor limitando conexões (HTTP {status})", status, retry_after)
+            if status >= 400:
+                raise HTTPStatusError(status, retry_after)
+            raise ServerThrottled(f"Servidor ignorou o Range (HTTP {status})", status)
+
+        stats = self.thread_stats[worker_id]
+        write_hist = stats['write_hist'] # Só com métricas ligadas
+        while body_left > 0:
+            if not self.download_active:
+                conn.close()
+                return
+            if not mirror.alive:
+                raise ConnectionError("Espelho abandonado no meio do segmento")
+            # O tamanho da leitura acompanha a vazão do worker (ajustado pela telemetria)
+            if trace is not None:
+                trace.before_read()
+            chunk = await conn.read(min(stats['read_size'], body_left))
+            if trace is not None:
+                trace.after_read()
+            body_left -= len(chunk)
+
+            remaining = segment.end - segment.position + 1
+            if remaining <= 0:
+                # Outro worker roubou o resto da faixa: descarta o corpo restante
+                conn.close()
+                return
+            if len(chunk) > remaining:
+                chunk = memoryview(chunk)[:remaining]
+            if write_hist is not None:
+                write_start = time.perf_counter()
+            writer.write_at(chunk, segment.position)
+            if write_hist is not None:
+                write_hist.observe(time.perf_counter() - write_start)
+            if trace is not None:
+                trace.after_write()
+            len_chunk = len(chunk)
+            segment.position += len_chunk
+
+            stats['downloaded'] += len_chunk
+            if self.limiter.limited:
+                self.limiter.consume(len_chunk)
+                await self.limiter.wait_async(self.is_active)
+
+        if segment.position <= segment.end:
+            raise ConnectionError("Resposta terminou antes do fim do segmento")
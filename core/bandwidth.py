@@ -0,0 +1,103 @@
+# core/bandwidth.py
+import asyncio
+import threading
+import time
+
+BURST_SECONDS = 0.25 # Crédito máximo acumulado quando o download fica parado
+MAX_WAIT_SLICE = 0.1 # Espera em fatias curtas: mudanças de limite valem na hora
+
+
+class TokenBucket:
+    """
+    Balde de tokens em bytes/s (rate 0 = sem limite). Quem consome mais do que
+    há de crédito fica "devendo" e espera a dívida ser paga, o que mantém a
+    média exata mesmo com leituras maiores que o balde.
+    """
+    def __init__(self, rate=0):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(0, int(rate or 0))
+            # Dívida calculada com o limite antigo não vale para o novo
+            self.tokens = max(0.0, min(self.tokens, self.capacity))
+
+    @property
+    def capacity(self):
+        return self.rate * BURST_SECONDS
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def consume(self, nbytes):
+        if not self.rate:
+            return
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= nbytes
+
+    def delay(self):
+        """Segundos até a dívida ser paga (0 se há crédito ou não há limite)."""
+        if not self.rate:
+            return 0.0
+        with self.lock:
+            self._refill(time.monotonic())
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthLimiter:
+    """
+    Limite de banda de um download, opcionalmente pendurado em um limite
+    global (compartilhado pela fila e pelo download direto).
+
+    O limite global é um único balde: a banda que um job ocioso não usa fica
+    no balde e é consumida pelos jobs ativos, sem divisão fixa entre eles.
+    Os workers chamam `consume(n)` depois de cada leitura e esperam `delay()`.
+    """
+    def __init__(self, rate=0, parent=None):
+        self.bucket = TokenBucket(rate)
+        self.parent = parent
+
+    def set_rate(self, rate):
+        self.bucket.set_rate(rate)
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    @property
+    def limited(self):
+        """Checagem barata para o loop de leitura pular tudo quando não há limite."""
+        return bool(self.bucket.rate or (self.parent and self.parent.limited))
+
+    def consume(self, nbytes):
+        self.bucket.consume(nbytes)
+        if self.parent:
+            self.parent.consume(nbytes)
+
+    def delay(self):
+        own = self.bucket.delay()
+        return max(own, self.parent.delay()) if self.parent else own
+
+    def wait(self, should_continue=None):
+        """Bloqueia até a dívida ser paga (em fatias, para reagir a mudanças de limite)."""
+        while True:
+            delay = self.delay()
+            if delay <= 0 or (should_continue and not should_continue()):
+                return
+            time.sleep(min(delay, MAX_WAIT_SLICE))
+
+    async def wait_async(self, should_continue=None):
+        """Versão para o motor asyncio (não bloqueia o event loop)."""
+        while True:
+            delay = self.delay()
+            if delay <= 0 or (should_continue and not should_continue()):
+                return
+            await asyncio.sleep(min(delay, MAX_WAIT_SLICE))
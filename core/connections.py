@@ -0,0 +1,248 @@
+# core/connections.py
+import socket
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import HTTPError
+
+from . import tracing
+
+MAX_POOLED_HOSTS = 16 # Hosts com conexões keep-alive guardadas ao mesmo tempo
+DEFAULT_PER_HOST = 0 # Padrão de settings["max_connections_per_host"] (0 = automático)
+AUTO_PER_HOST = 16 # Limite inicial do modo automático; cresce com os segmentos pedidos (reserve)
+
+
+class ConnectionBudget:
+    """
+    Limite global de conexões HTTP simultâneas, compartilhado entre os jobs.
+    Cada worker segura uma vaga apenas enquanto baixa um segmento.
+    """
+    def __init__(self, limit):
+        self.limit = max(1, int(limit))
+        self.in_use = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, should_continue=None):
+        """Bloqueia até haver vaga. Retorna False se `should_continue()` ficar falso."""
+        with self.cond:
+            while self.in_use >= self.limit:
+                self.cond.wait(0.5)
+                if should_continue and not should_continue():
+                    return False
+            self.in_use += 1
+            return True
+
+    def try_acquire(self):
+        """Pega uma vaga só se houver uma livre agora (não bloqueia)."""
+        with self.cond:
+            if self.in_use >= self.limit:
+                return False
+            self.in_use += 1
+            return True
+
+    def release(self):
+        with self.cond:
+            self.in_use = max(0, self.in_use - 1)
+            self.cond.notify()
+
+    def set_limit(self, limit):
+        with self.cond:
+            self.limit = max(1, int(limit))
+            self.cond.notify_all()
+
+
+def host_key(url):
+    """'host:porta' de uma URL (a mesma chave usada pelos pools do urllib3)."""
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    return f"{parsed.hostname}:{port}"
+
+
+def _traced_connection(base):
+    class TracedConnection(base):
+        """
+        Com um trace ativo na thread (tracing.bind), separa a abertura da
+        conexão em DNS, TCP e TLS. Sem trace, é a conexão normal do urllib3.
+        """
+        connected_at = None
+
+        def _new_conn(self):
+            trace = tracing.current()
+            if trace is None:
+                return super()._new_conn()
+            tracer, worker = trace
+            start = tracer.now()
+            try:
+                address = socket.getaddrinfo(self._dns_host, self.port, type=socket.SOCK_STREAM)[0][4][0]
+            except OSError:
+                return super()._new_conn() # O urllib3 gera o erro de resolução de sempre
+            resolved = tracer.now()
+            tracer.span("dns", worker, start, resolved, host=self._dns_host)
+            # Conecta no endereço já resolvido (Host e SNI continuam usando self.host)
+            dns_host, self._dns_host = self._dns_host, address
+            try:
+                sock = super()._new_conn()
+            except (OSError, HTTPError):
+                self._dns_host = dns_host
+                sock = super()._new_conn() # Tenta os outros endereços do host
+            finally:
+                self._dns_host = dns_host
+            self.connected_at = tracer.now()
+            tracer.span("tcp", worker, resolved, self.connected_at, address=address)
+            return sock
+
+        def connect(self):
+            super().connect()
+            trace = tracing.current()
+            if trace is not None and self.connected_at is not None and isinstance(self, HTTPSConnection):
+                tracer, worker = trace
+                tracer.span("tls", worker, self.connected_at, tracer.now())
+            self.connected_at = None
+    return TracedConnection
+
+
+_TRACED_CONNECTIONS = {HTTPConnectionPool: _traced_connection(HTTPConnection),
+                       HTTPSConnectionPool: _traced_connection(HTTPSConnection)}
+
+
+def _counting_pool(base, owner):
+    class CountingPool(base):
+        ConnectionCls = _TRACED_CONNECTIONS[base]
+
+        def _get_conn(self, timeout=None):
+            conn = super()._get_conn(timeout)
+            # Sem socket, a conexão vai abrir um novo (TCP + TLS); com socket, é reuso
+            owner.record(f"{self.host}:{self.port}", reused=conn.sock is not None)
+            return conn
+    return CountingPool
+
+
+class _CountingAdapter(HTTPAdapter):
+    def __init__(self, owner, **kwargs):
+        self.owner = owner
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self.owner),
+            "https": _counting_pool(HTTPSConnectionPool, self.owner),
+        }
+
+
+class ConnectionPool:
+    """
+    Conexões HTTP do motor, compartilhadas entre segmentos e entre jobs.
+
+    Uma única requests.Session, com um pool do urllib3 por host dimensionado
+    para `per_host` conexões keep-alive (o padrão do requests guarda só 10 e
+    fecha as demais ao fim de cada requisição). Uma conexão devolvida por um
+    segmento é reaproveitada pelo próximo segmento, ou pelo próximo job no
+    mesmo host, sem novo handshake TCP/TLS.
+
+    `per_host` também limita as conexões simultâneas a um mesmo host, somando
+    todos os jobs: cada worker segura uma vaga (`acquire`) enquanto baixa um
+    segmento. Com per_host = 0 (automático), o limite acompanha a soma das
+    conexões pedidas pelos downloads em andamento (`reserve`/`unreserve`).
+    `counters()` informa handshakes e reusos por host.
+
+    Aumentar o limite troca a sessão: os workers leem `session` a cada
+    segmento, e as requisições em andamento na sessão antiga terminam
+    normalmente (o urllib3 fecha essas conexões quando são devolvidas).
+    """
+    def __init__(self, per_host=DEFAULT_PER_HOST):
+        self.lock = threading.Lock()
+        self.auto = int(per_host) <= 0
+        self.per_host = AUTO_PER_HOST if self.auto else int(per_host)
+        self.demand = 0 # Conexões pedidas pelos downloads em andamento (modo automático)
+        self.slots = {}    # host -> ConnectionBudget
+        self.handshakes = {} # host -> conexões novas (ou reabertas)
+        self.reused = {}     # host -> requisições em conexões já abertas
+        self.session = self._new_session()
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = _CountingAdapter(self, pool_connections=MAX_POOLED_HOSTS, pool_maxsize=self.per_host)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def set_per_host(self, per_host):
+        """Muda o limite por host (0 = automático). Aumentar recria a sessão."""
+        with self.lock:
+            self.auto = int(per_host) <= 0
+            if self.auto:
+                per_host = max(AUTO_PER_HOST, self.demand)
+            old = self._resize(max(1, int(per_host)))
+        if old is not None:
+            old.close()
+
+    def reserve(self, count):
+        """Um download vai usar até `count` conexões; no modo automático o limite cresce junto."""
+        with self.lock:
+            self.demand += count
+            old = self._resize(max(self.per_host, self.demand)) if self.auto else None
+        if old is not None:
+            old.close()
+
+    def unreserve(self, count):
+        with self.lock:
+            self.demand = max(0, self.demand - count)
+
+    def _resize(self, per_host):
+        # Chamado com self.lock adquirido. Retorna a sessão substituída (para fechar fora do lock)
+        grow = per_host > self.per_host
+        self.per_host = per_host
+        for slots in self.slots.values():
+            slots.set_limit(per_host)
+        if not grow:
+            return None
+        old, self.session = self.session, self._new_session()
+        return old
+
+    def _host_slots(self, url):
+        key = host_key(url)
+        with self.lock:
+            slots = self.slots.get(key)
+            if slots is None:
+                slots = self.slots[key] = ConnectionBudget(self.per_host)
+            return slots
+
+    def acquire(self, url, should_continue=None):
+        """Reserva uma conexão ao host de `url` (bloqueia se o host está no limite)."""
+        return self._host_slots(url).acquire(should_continue)
+
+    def try_acquire(self, url):
+        return self._host_slots(url).try_acquire()
+
+    def release(self, url):
+        self._host_slots(url).release()
+
+    def active(self):
+        """{host: conexões em uso agora} (vagas ocupadas por host)."""
+        with self.lock:
+            return {host: slots.in_use for host, slots in self.slots.items() if slots.in_use}
+
+    def record(self, host, reused):
+        """Conta uma requisição: em conexão reaproveitada ou com handshake novo."""
+        counter = self.reused if reused else self.handshakes
+        with self.lock:
+            counter[host] = counter.get(host, 0) + 1
+
+    def counters(self):
+        """{'handshakes': n, 'reused': n, 'hosts': {host: {'handshakes': n, 'reused': n}}}"""
+        with self.lock:
+            hosts = {host: {"handshakes": self.handshakes.get(host, 0), "reused": self.reused.get(host, 0)}
+                     for host in set(self.handshakes) | set(self.reused)}
+        return {
+            "handshakes": sum(h["handshakes"] for h in hosts.values()),
+            "reused": sum(h["reused"] for h in hosts.values()),
+            "hosts": hosts,
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,189 @@
+# core/content_store.py
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl # Só em sistemas POSIX (reflink no Linux)
+except ImportError:
+    fcntl = None
+
+from .settings import APP_DATA_PATH, DB_FILE
+
+STORE_DIR = os.path.join(APP_DATA_PATH, 'store')
+STORE_HASH = "sha256" # Algoritmo calculado nos downloads sem checksum informado
+DEFAULT_MAX_MB = 10240 # Padrão de settings["content_store_max_mb"]
+FICLONE = 0x40049409 # ioctl de clonagem do Linux (Btrfs, XFS, bcachefs...)
+
+
+def reflink(src, dst):
+    """Cópia copy-on-write: compartilha os blocos, mas cada arquivo é independente."""
+    if fcntl is None or not hasattr(fcntl, 'ioctl'):
+        raise OSError("reflink indisponível neste sistema")
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+
+def link_or_copy(src, dst):
+    """
+    Cria `dst` com o conteúdo de `src` pelo meio mais barato que o sistema de
+    arquivos aceitar: reflink, hardlink e, por último, cópia. Troca `dst` de
+    forma atômica e retorna o meio usado ('reflink', 'hardlink' ou 'copy').
+    """
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        for method, make in (("reflink", reflink), ("hardlink", os.link), ("copy", shutil.copyfile)):
+            try:
+                make(src, tmp)
+                break
+            except OSError:
+                if method == "copy":
+                    raise
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        os.replace(tmp, dst)
+        return method
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class ContentStore:
+    """
+    Arquivos já baixados, endereçados pelo hash ('algoritmo:hex'), para que
+    outro download do mesmo conteúdo (em outra pasta) vire um reflink,
+    hardlink ou cópia local em vez de uma nova transferência.
+
+    O índice fica no SQLite (tabela content_store). O tamanho total é
+    limitado a `max_bytes`, descartando os objetos usados há mais tempo.
+    Hardlinks compartilham o arquivo com as pastas: um objeto cujo tamanho
+    ou mtime não bate mais com o registrado foi alterado e é descartado.
+    """
+    def __init__(self, root=STORE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, db_file=DB_FILE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.db_file = db_file
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def _open(self):
+        # Chamado com self.lock adquirido
+        if self.conn is None:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS content_store (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                filename TEXT,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_content_store_last_used ON content_store (last_used)")
+            conn.commit()
+            self.conn = conn
+        return self.conn
+
+    def object_path(self, key):
+        algorithm, digest = key.split(':', 1)
+        return os.path.join(self.root, algorithm, digest[:2], digest)
+
+    def _entry(self, conn, key):
+        """(size, filename) de um objeto íntegro; remove do índice os que sumiram ou mudaram."""
+        row = conn.execute("SELECT size, mtime, filename FROM content_store WHERE hash = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            stat = os.stat(self.object_path(key))
+            if stat.st_size == row[0] and stat.st_mtime == row[1]:
+                return row[0], row[2]
+        except OSError:
+            pass
+        self._forget(conn, key)
+        return None
+
+    def _forget(self, conn, key):
+        conn.execute("DELETE FROM content_store WHERE hash = ?", (key,))
+        conn.commit()
+        try:
+            os.remove(self.object_path(key))
+        except OSError:
+            pass
+
+    def lookup(self, key):
+        """(tamanho, nome original do arquivo) se o hash `key` está no store, senão None."""
+        with self.lock:
+            return self._entry(self._open(), key.lower())
+
+    def add(self, key, path):
+        """Guarda o arquivo `path`, já conferido com o hash `key`. Retorna se ficou no store."""
+        key = key.lower()
+        with self.lock:
+            conn = self._open()
+            if self._entry(conn, key) is not None:
+                conn.execute("UPDATE content_store SET last_used = ? WHERE hash = ?", (time.time(), key))
+                conn.commit()
+                return True
+            size = os.path.getsize(path)
+            if size > self.max_bytes:
+                return False
+            target = self.object_path(key)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            link_or_copy(path, target)
+            conn.execute("INSERT OR REPLACE INTO content_store (hash, size, mtime, filename, last_used) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         (key, size, os.path.getmtime(target), os.path.basename(path), time.time()))
+            conn.commit()
+            self._evict(conn, keep=key)
+            return True
+
+    def materialize(self, key, dst):
+        """
+        Cria `dst` a partir do objeto `key`. Retorna (meio, tamanho) ou None
+        se o hash não está no store.
+        """
+        key = key.lower()
+        with self.lock:
+            conn = self._open()
+            entry = self._entry(conn, key)
+            if entry is None:
+                return None
+            source = self.object_path(key)
+            if os.path.exists(dst) and os.path.samefile(source, dst):
+                method = "hardlink" # Já é o mesmo arquivo
+            else:
+                method = link_or_copy(source, dst)
+            conn.execute("UPDATE content_store SET last_used = ?, hits = hits + 1 WHERE hash = ?",
+                         (time.time(), key))
+            conn.commit()
+            return method, entry[0]
+
+    def _evict(self, conn, keep):
+        """Remove os objetos usados há mais tempo até o total caber em max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM content_store").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT hash, size FROM content_store ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._forget(conn, key)
+            total -= size
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(max_mb=DEFAULT_MAX_MB):
+    """O ContentStore do processo; `max_mb` vem de settings["content_store_max_mb"]."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ContentStore()
+        _store.max_bytes = max(0, int(max_mb)) * 1024 * 1024
+        return _store
@@ -0,0 +1,290 @@
+# core/control_server.py
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+CONTROL_HOST = "127.0.0.1" # Só aceita conexões da própria máquina
+DEFAULT_CONTROL_PORT = 8799 # Padrão de settings["control_port"]
+SSE_KEEPALIVE = 15.0 # Segundos entre comentários ":" para manter o stream vivo
+MAX_BODY = 64 * 1024 # Bytes aceitos no corpo de um POST
+
+
+class _Subscriber:
+    """
+    Um cliente do /events. Guarda só o estado mais recente de cada job, então
+    um cliente lento não acumula memória nem atrasa os downloads: push() nunca
+    bloqueia (é chamado pelas threads da fila e da telemetria).
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = {}
+        self.closed = False
+
+    def push(self, job_dict):
+        with self.cond:
+            self.pending.pop(job_dict["id"], None) # Reinsere no fim: ordem da última mudança
+            self.pending[job_dict["id"]] = job_dict
+            self.cond.notify()
+
+    def take(self, timeout):
+        with self.cond:
+            if not self.pending and not self.closed:
+                self.cond.wait(timeout)
+            jobs = list(self.pending.values())
+            self.pending.clear()
+            return jobs
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+
+class ControlServer:
+    """
+    API HTTP/JSON local (127.0.0.1) para outras ferramentas controlarem a
+    fila de downloads (DownloadQueue) de uma instância em execução.
+
+        GET  /jobs                  lista de jobs
+        POST /jobs                  {"url", "save_path"?, "num_threads"?, "checksum"?,
+                                     "mirrors"?, "max_speed"?} -> 201 {"job": ...}
+        GET  /jobs/<id>             job com "segments" (última amostra de cada worker)
+        POST /jobs/<id>/pause       (também resume, cancel)
+        POST /jobs/<id>/limit       {"max_speed": KB/s}
+        GET  /events                Server-Sent Events: um evento "job" a cada mudança
+
+    POSTs exigem Content-Type: application/json (um site aberto no navegador
+    não consegue enviar isso sem preflight CORS, que esta API não responde) e
+    o Host precisa ser 127.0.0.1:<porta> ou localhost:<porta>, o que barra
+    páginas que apontam o próprio domínio para 127.0.0.1 (DNS rebinding).
+    Com `token`, toda requisição precisa de "Authorization: Bearer <token>";
+    sem token, o POST /jobs não aceita "save_path" (só a pasta padrão).
+    Cada requisição roda na sua própria thread e só lê o estado da fila, então
+    o servidor responde normalmente com vários jobs baixando a toda velocidade.
+    """
+    def __init__(self, queue, port=DEFAULT_CONTROL_PORT, token=None, default_path=None,
+                 default_threads=None):
+        self.queue = queue
+        self.port = port
+        self.token = token or None
+        # Funções chamadas quando o POST /jobs não informa pasta/conexões
+        self.default_path = default_path or (lambda: os.path.expanduser('~/Downloads'))
+        self.default_threads = default_threads or (lambda: 8)
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.httpd = None
+
+    def start(self):
+        """Abre a porta e atende em uma thread daemon. Lança OSError se a porta estiver em uso."""
+        self.httpd = ThreadingHTTPServer((CONTROL_HOST, self.port), _ControlHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.control = self
+        self.port = self.httpd.server_address[1]
+        self.queue.add_listener(self._on_job_update)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.httpd is None:
+            return
+        self.queue.remove_listener(self._on_job_update)
+        with self.lock:
+            for subscriber in self.subscribers:
+                subscriber.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.httpd = None
+
+    def _on_job_update(self, job_dict):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.push(job_dict)
+
+    def subscribe(self):
+        subscriber = _Subscriber()
+        with self.lock:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "GerenciadorDownloads"
+
+    def log_message(self, format, *args):
+        pass # Sem log de cada requisição no console da GUI
+
+    @property
+    def control(self):
+        return self.server.control
+
+    # --- Respostas ---
+
+    def _send_json(self, status, data, close=False):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if close:
+            self.send_header("Connection", "close") # O corpo da requisição não foi lido
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, close=False):
+        self._send_json(status, {"error": message}, close)
+
+    def _authorized(self):
+        port = self.control.port
+        if self.headers.get("Host") not in (f"127.0.0.1:{port}", f"localhost:{port}"):
+            self._error(403, "Host não permitido", close=True)
+            return False
+        token = self.control.token
+        if token and self.headers.get("Authorization") != f"Bearer {token}":
+            self._error(401, "token inválido", close=True)
+            return False
+        return True
+
+    def _read_json(self):
+        if not self.headers.get("Content-Type", "").startswith("application/json"):
+            self._error(415, "use Content-Type: application/json", close=True)
+            return None
+        length = self.headers.get("Content-Length") or "0"
+        if not (length.isascii() and length.isdigit()):
+            self._error(400, "Content-Length inválido", close=True)
+            return None
+        length = int(length)
+        if length > MAX_BODY:
+            self._error(413, f"corpo muito grande (máximo de {MAX_BODY} bytes)", close=True)
+            return None
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._error(400, "JSON inválido")
+            return None
+        if not isinstance(data, dict):
+            self._error(400, "o corpo deve ser um objeto JSON")
+            return None
+        return data
+
+    def _route(self):
+        """Caminho dividido em partes, ex.: /jobs/3/pause -> ['jobs', '3', 'pause']."""
+        return [p for p in urlparse(self.path).path.split('/') if p]
+
+    # --- Métodos HTTP ---
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = self._route()
+        queue = self.control.queue
+        if parts == ["jobs"]:
+            self._send_json(200, {"jobs": queue.list_jobs()})
+        elif len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            job = queue.get_job(int(parts[1]), segments=True)
+            if job is None:
+                self._error(404, "job não encontrado")
+            else:
+                self._send_json(200, {"job": job})
+        elif parts == ["events"]:
+            self._stream_events()
+        else:
+            self._error(404, "rota não encontrada")
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        parts = self._route()
+        data = self._read_json()
+        if data is None:
+            return
+        if parts == ["jobs"]:
+            self._submit(data)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[1].isdigit():
+            self._job_action(int(parts[1]), parts[2], data)
+        else:
+            self._error(404, "rota não encontrada")
+
+    def _submit(self, data):
+        url = data.get("url")
+        if not isinstance(url, str) or not url.strip():
+            self._error(400, "informe 'url'")
+            return
+        mirrors = data.get("mirrors") or []
+        if not isinstance(mirrors, list) or not all(isinstance(m, str) for m in mirrors):
+            self._error(400, "'mirrors' deve ser uma lista de URLs")
+            return
+        try:
+            num_threads = max(1, int(data.get("num_threads") or self.control.default_threads()))
+            max_speed = max(0, int(data.get("max_speed") or 0))
+        except (TypeError, ValueError):
+            self._error(400, "'num_threads' e 'max_speed' devem ser inteiros")
+            return
+        save_path = data.get("save_path")
+        checksum = data.get("checksum")
+        if save_path is not None and not isinstance(save_path, str):
+            self._error(400, "'save_path' deve ser um texto")
+            return
+        if checksum is not None and not isinstance(checksum, str):
+            self._error(400, "'checksum' deve ser um texto")
+            return
+        if save_path and not self.control.token:
+            # Sem token, qualquer processo local poderia gravar arquivos em qualquer pasta
+            self._error(403, "configure um token (control_token) para escolher 'save_path'")
+            return
+        job_id = self.control.queue.add(url.strip(), save_path or self.control.default_path(), num_threads,
+                                        max_speed=max_speed, checksum=checksum or None, mirrors=mirrors)
+        self._send_json(201, {"job": self.control.queue.get_job(job_id)})
+
+    def _job_action(self, job_id, action, data):
+        queue = self.control.queue
+        if queue.get_job(job_id) is None:
+            self._error(404, "job não encontrado")
+            return
+        if action == "pause":
+            queue.pause(job_id)
+        elif action == "resume":
+            queue.resume(job_id)
+        elif action == "cancel":
+            queue.cancel(job_id)
+        elif action == "limit":
+            try:
+                queue.set_job_speed_limit(job_id, int(data.get("max_speed", 0)))
+            except (TypeError, ValueError):
+                self._error(400, "'max_speed' deve ser inteiro (KB/s)")
+                return
+        else:
+            self._error(404, "ação desconhecida")
+            return
+        self._send_json(200, {"job": queue.get_job(job_id)})
+
+    def _stream_events(self):
+        """Server-Sent Events: começa com o estado de todos os jobs e segue com as mudanças."""
+        subscriber = self.control.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for job in self.control.queue.list_jobs():
+                subscriber.push(job)
+            while not subscriber.closed:
+                jobs = subscriber.take(SSE_KEEPALIVE)
+                if not jobs:
+                    self.wfile.write(b": keepalive\n\n")
+                for job in jobs:
+                    data = json.dumps(job, ensure_ascii=False)
+                    self.wfile.write(f"event: job\ndata: {data}\n\n".encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass # Cliente desconectou
+        finally:
+            self.control.unsubscribe(subscriber)
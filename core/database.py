@@ -1,40 +1,214 @@
 # core/database.py
 import sqlite3
-import os
 from .settings import DB_FILE # Importa o caminho do DB_FILE
+from .history import get_store, PAGE_SIZE
 
 def init_db():
     with sqlite3.connect(DB_FILE) as conn:
         cursor = conn.cursor()
         cursor.execute('''
-        CREATE TABLE IF NOT EXISTS downloads (
+        CREATE TABLE IF NOT EXISTS download_queue (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             url TEXT NOT NULL,
             path TEXT NOT NULL,
-            filename TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            num_threads INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            created DATETIME DEFAULT CURRENT_TIMESTAMP,
+            max_speed INTEGER NOT NULL DEFAULT 0,
+            checksum TEXT,
+            mirrors TEXT
         )
         ''')
+        # Bancos criados antes destas colunas
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(download_queue)")]
+        for column, definition in (("max_speed", "INTEGER NOT NULL DEFAULT 0"), ("checksum", "TEXT"),
+                                   ("mirrors", "TEXT")):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE download_queue ADD COLUMN {column} {definition}")
+        # Cache da sondagem (core/probe.py)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS host_capabilities (
+            host TEXT PRIMARY KEY,
+            accepts_ranges INTEGER NOT NULL,
+            head_ok INTEGER NOT NULL,
+            checked_at REAL NOT NULL,
+            max_connections INTEGER,
+            limited_at REAL
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS url_redirects (
+            url TEXT PRIMARY KEY,
+            final_url TEXT NOT NULL,
+            checked_at REAL NOT NULL
+        )
+        ''')
+        conn.commit()
+    # Tabela do histórico (core/history.py): cria/migra e deixa a conexão aberta
+    get_store().open()
+
+# --- Histórico (core/history.py) ---
+
+def add_to_history(url, file_path, size=None, duration=None, avg_speed=None, file_hash=None,
+                   etag=None, last_modified=None, mtime=None, source=None):
+    try:
+        get_store().add(url, file_path, size, duration, avg_speed, file_hash, etag, last_modified, mtime, source)
+    except Exception as e:
+        print(f"Erro ao salvar no histórico: {e}")
+
+def get_history(limit=None, offset=0):
+    """
+    (url, path, filename, timestamp, size, duration, avg_speed, hash, etag,
+    last_modified, mtime, source), mais recentes primeiro.
+    """
+    try:
+        return get_store().recent(limit, offset)
+    except Exception as e:
+        print(f"Erro ao ler o histórico: {e}")
+        return []
+
+def get_last_download(url, folder):
+    """(filename, size, hash, etag, last_modified, mtime) do último download de `url` em `folder`."""
+    try:
+        return get_store().last_download(url, folder)
+    except Exception as e:
+        print(f"Erro ao ler o histórico: {e}")
+        return None
+
+def get_last_hashed_download(url):
+    """Último download de `url` com hash registrado, em qualquer pasta (ver get_last_download)."""
+    try:
+        return get_store().last_hashed_download(url)
+    except Exception as e:
+        print(f"Erro ao ler o histórico: {e}")
+        return None
+
+def get_history_page(before=None, limit=PAGE_SIZE):
+    """Uma página do histórico; `before` é a chave (timestamp, id) da última linha carregada."""
+    try:
+        return get_store().page(before, limit)
+    except Exception as e:
+        print(f"Erro ao ler o histórico: {e}")
+        return []
+
+def search_history(text="", host=None, since=None, until=None, limit=PAGE_SIZE, offset=0):
+    """Busca no histórico (FTS5) com filtros de host e datas; ver HistoryStore.search."""
+    try:
+        return get_store().search(text, host, since, until, limit, offset)
+    except Exception as e:
+        print(f"Erro ao buscar no histórico: {e}")
+        return []
+
+def get_history_newer(after):
+    """Downloads concluídos depois da chave (timestamp, id) `after`."""
+    try:
+        return get_store().newer(after)
+    except Exception as e:
+        print(f"Erro ao ler o histórico: {e}")
+        return []
+
+# --- Fila de downloads (core/download_queue.py) ---
+
+def add_queue_job(url, save_path, num_threads, state="queued", max_speed=0, checksum=None, mirrors=None):
+    # Os espelhos são gravados separados por espaço (URLs não têm espaços)
+    with sqlite3.connect(DB_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO download_queue (url, path, num_threads, state, max_speed, checksum, mirrors) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (url, save_path, num_threads, state, max_speed, checksum, " ".join(mirrors or [])))
         conn.commit()
+        return cursor.lastrowid
 
-def add_to_history(url, file_path):
+def update_queue_job(job_id, state):
     try:
-        filename = os.path.basename(file_path)
-        folder_path = os.path.dirname(file_path)
         with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO downloads (url, path, filename) VALUES (?, ?, ?)", 
-                           (url, folder_path, filename))
+            conn.execute("UPDATE download_queue SET state = ? WHERE id = ?", (state, job_id))
             conn.commit()
     except Exception as e:
-        print(f"Erro ao salvar no histórico: {e}")
+        print(f"Erro ao atualizar a fila: {e}")
+
+def update_queue_job_speed(job_id, max_speed):
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            conn.execute("UPDATE download_queue SET max_speed = ? WHERE id = ?", (max_speed, job_id))
+            conn.commit()
+    except Exception as e:
+        print(f"Erro ao atualizar a fila: {e}")
 
-def get_history():
+def remove_queue_job(job_id):
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            conn.execute("DELETE FROM download_queue WHERE id = ?", (job_id,))
+            conn.commit()
+    except Exception as e:
+        print(f"Erro ao atualizar a fila: {e}")
+
+def load_queue_jobs():
     try:
         with sqlite3.connect(DB_FILE) as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT url, path, filename, timestamp FROM downloads ORDER BY timestamp DESC")
-            return cursor.fetchall()
+            cursor.execute("SELECT id, url, path, num_threads, state, max_speed, checksum, mirrors "
+                           "FROM download_queue ORDER BY id")
+            return [row[:7] + ((row[7] or "").split(),) for row in cursor.fetchall()]
     except Exception as e:
-        print(f"Erro ao ler o histórico: {e}")
-        return []
\ No newline at end of file
+        print(f"Erro ao ler a fila: {e}")
+        return []
+
+# --- Cache de capacidades dos hosts (core/probe.py) ---
+
+def get_host_capabilities(host, not_before):
+    """(accepts_ranges, head_ok, max_connections) ou None; dados anteriores a `not_before` expiraram."""
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            row = conn.execute("SELECT accepts_ranges, head_ok, checked_at, max_connections, limited_at "
+                               "FROM host_capabilities WHERE host = ?", (host,)).fetchone()
+    except Exception as e:
+        print(f"Erro ao ler o cache de hosts: {e}")
+        return None
+    if not row or row[2] < not_before:
+        return None
+    max_connections = row[3] if row[4] is not None and row[4] >= not_before else None
+    return bool(row[0]), bool(row[1]), max_connections
+
+def save_host_capabilities(host, accepts_ranges, head_ok, checked_at):
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            conn.execute("INSERT INTO host_capabilities (host, accepts_ranges, head_ok, checked_at) "
+                         "VALUES (?, ?, ?, ?) ON CONFLICT(host) DO UPDATE SET "
+                         "accepts_ranges = excluded.accepts_ranges, head_ok = excluded.head_ok, "
+                         "checked_at = excluded.checked_at",
+                         (host, int(accepts_ranges), int(head_ok), checked_at))
+            conn.commit()
+    except Exception as e:
+        print(f"Erro ao salvar o cache de hosts: {e}")
+
+def save_host_max_connections(host, max_connections, limited_at):
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            conn.execute("UPDATE host_capabilities SET max_connections = ?, limited_at = ? WHERE host = ?",
+                         (max_connections, limited_at, host))
+            conn.commit()
+    except Exception as e:
+        print(f"Erro ao salvar o cache de hosts: {e}")
+
+def get_redirect(url, not_before):
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            row = conn.execute("SELECT final_url FROM url_redirects WHERE url = ? AND checked_at >= ?",
+                               (url, not_before)).fetchone()
+            return row[0] if row else None
+    except Exception as e:
+        print(f"Erro ao ler o cache de hosts: {e}")
+        return None
+
+def save_redirect(url, final_url, checked_at):
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
+            if final_url == url:
+                conn.execute("DELETE FROM url_redirects WHERE url = ?", (url,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO url_redirects (url, final_url, checked_at) VALUES (?, ?, ?)",
+                             (url, final_url, checked_at))
+            conn.commit()
+    except Exception as e:
+        print(f"Erro ao salvar o cache de hosts: {e}")
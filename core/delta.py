@@ -0,0 +1,261 @@
+# core/delta.py
+"""
+Atualização por blocos (estilo zsync) de um arquivo que já existe no disco.
+
+Quem publica o arquivo gera, ao lado dele, um manifesto com a soma de cada
+bloco:
+
+    python -m core.delta imagem.iso              # grava imagem.iso.delta.json
+
+O manifesto tem o tamanho do arquivo, o tamanho do bloco, o SHA-256 do
+arquivo inteiro e, para cada bloco, [adler32, blake2b de 8 bytes]. Com ele,
+o motor procura na cópia antiga os blocos que não mudaram (em qualquer
+posição, com a soma rolante do adler32), copia esses blocos do disco e baixa
+só o resto por Range (ver DownloadLogic._prepare_delta).
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+import zlib
+from urllib.parse import urlparse
+
+MANIFEST_SUFFIX = ".delta.json"
+MANIFEST_VERSION = 1
+PART_SUFFIX = ".delta" # Arquivo novo sendo montado ao lado do antigo
+DEFAULT_BLOCK_SIZE = 64 * 1024
+STRONG_SIZE = 8 # Bytes do blake2b de cada bloco
+MERGE_GAP = 64 * 1024 # Faixas a baixar separadas por menos que isso viram uma requisição só
+ROLL_LIMIT = 1024 * 1024 # Bytes rolados sem coincidência antes de rolar só de vez em quando
+ROLL_EVERY = 64 # Depois de ROLL_LIMIT, rola um bloco inteiro a cada tantos blocos
+LOOKAHEAD = 8 # Blocos à frente conferidos antes de rolar (alterações no lugar não deslocam o resto)
+COPY_RUN = 8 * 1024 * 1024 # Blocos contíguos copiados de uma vez
+ADLER_MOD = 65521
+
+
+def strong_hash(block):
+    return hashlib.blake2b(block, digest_size=STRONG_SIZE).hexdigest()
+
+
+def manifest_url(url):
+    """URL do manifesto publicado ao lado do arquivo (mesma query string)."""
+    parsed = urlparse(url)
+    return parsed._replace(path=parsed.path + MANIFEST_SUFFIX).geturl()
+
+
+def build_manifest(path, block_size=DEFAULT_BLOCK_SIZE):
+    """Lê o arquivo uma vez e retorna o manifesto (dict pronto para o JSON)."""
+    sha256 = hashlib.sha256()
+    blocks = []
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            sha256.update(block)
+            blocks.append([zlib.adler32(block), strong_hash(block)])
+            size += len(block)
+    return {
+        "version": MANIFEST_VERSION,
+        "size": size,
+        "block_size": block_size,
+        "sha256": sha256.hexdigest(),
+        "blocks": blocks,
+    }
+
+
+def write_manifest(path, block_size=DEFAULT_BLOCK_SIZE):
+    """Gera `path` + MANIFEST_SUFFIX (troca atômica). Retorna o caminho gravado."""
+    manifest = build_manifest(path, block_size)
+    target = path + MANIFEST_SUFFIX
+    tmp = target + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp, target)
+    return target
+
+
+def parse_manifest(data):
+    """Valida o manifesto baixado; retorna o dict ou None se não for utilizável."""
+    try:
+        manifest = json.loads(data)
+        size, block_size, blocks = manifest["size"], manifest["block_size"], manifest["blocks"]
+        if manifest.get("version") != MANIFEST_VERSION or block_size <= 0 or size < 0:
+            return None
+        if len(blocks) != -(-size // block_size) or not isinstance(manifest["sha256"], str):
+            return None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return manifest
+
+
+def fetch_manifest(session, url, timeout=15):
+    """Baixa e valida o manifesto de `url`. None se não houver (404) ou for inválido."""
+    try:
+        response = session.get(manifest_url(url), timeout=timeout)
+    except Exception as e:
+        print(f"Erro ao buscar o manifesto de blocos: {e}")
+        return None
+    with response:
+        if response.status_code != 200:
+            return None
+        return parse_manifest(response.content)
+
+
+def find_blocks(manifest, old_path, is_active=None):
+    """
+    Procura em `old_path` os blocos do arquivo novo, em qualquer offset.
+    Retorna {índice do bloco novo: offset no arquivo antigo}, ou None se
+    `is_active()` ficar falso no meio da varredura.
+
+    Em cada posição o adler32 do bloco inteiro (zlib, em C) é procurado nas
+    somas do manifesto; só quando ele bate o blake2b confirma. Sem
+    coincidência, se um dos LOOKAHEAD blocos seguintes bate, os anteriores só
+    mudaram no lugar e a varredura pula para lá. Senão a janela anda um byte
+    por vez com a soma rolante (em Python, lento), até achar um bloco ou
+    andar um bloco inteiro. Depois de ROLL_LIMIT bytes rolados sem nenhuma
+    coincidência, a janela só rola um bloco inteiro a cada ROLL_EVERY blocos
+    (nos outros confere só a grade do arquivo antigo), então uma cópia antiga
+    sem relação com o arquivo novo custa pouco mais que lê-la. Como um trecho
+    deslocado por uma inserção ou remoção coincide em algum offset de
+    qualquer bloco inteiro dele, a varredura volta a achá-lo no máximo
+    ROLL_EVERY blocos depois do fim da alteração; a partir da coincidência,
+    os blocos anteriores são conferidos para trás. O último bloco do
+    manifesto, se for menor que block_size, sempre é baixado.
+    """
+    block_size = manifest["block_size"]
+    blocks = manifest["blocks"]
+    full_blocks = manifest["size"] // block_size
+    by_weak = {}
+    for index in range(full_blocks):
+        by_weak.setdefault(blocks[index][0], []).append(index)
+
+    found = {}
+    old_size = os.path.getsize(old_path)
+    if not by_weak or old_size < block_size:
+        return found
+    with open(old_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+
+        def match(pos, weak=None):
+            """Registra os blocos iguais à janela em `pos`; retorna se houve algum."""
+            window = data[pos:pos + block_size]
+            candidates = by_weak.get(zlib.adler32(window) if weak is None else weak)
+            if not candidates:
+                return False
+            strong = strong_hash(window)
+            matched = False
+            for index in candidates:
+                if blocks[index][1] == strong:
+                    found.setdefault(index, pos)
+                    matched = True
+            return matched
+
+        pos = 0
+        last = old_size - block_size # Última posição com um bloco inteiro
+        rolled = 0 # Bytes rolados desde a última coincidência
+        skipped = 0 # Blocos só conferidos na grade desde a última rolagem
+        while pos <= last:
+            if is_active is not None and not is_active():
+                return None
+            if match(pos):
+                pos += block_size
+                rolled = 0
+                continue
+            if rolled >= ROLL_LIMIT and skipped < ROLL_EVERY - 1:
+                pos = (pos // block_size + 1) * block_size # Na grade de blocos do arquivo antigo
+                skipped += 1
+                continue
+            skipped = 0
+            ahead = next((p for p in range(pos + block_size, min(pos + LOOKAHEAD * block_size, last) + 1,
+                                           block_size) if match(p)), None)
+            if ahead is not None:
+                pos = ahead + block_size # Blocos alterados no lugar; os seguintes continuam iguais
+                rolled = 0
+                continue
+            weak = zlib.adler32(data[pos:pos + block_size])
+            a, b = weak & 0xffff, weak >> 16
+            end = min(pos + block_size, last)
+            start = pos
+            hit = False
+            while pos < end:
+                # Tira o byte que sai da janela e soma o que entra
+                out, new = data[pos], data[pos + block_size]
+                a = (a - out + new) % ADLER_MOD
+                b = (b - block_size * out + a - 1) % ADLER_MOD
+                pos += 1
+                weak = (b << 16) | a
+                if weak in by_weak and match(pos, weak):
+                    hit = True
+                    break
+            rolled += pos - start
+            if hit:
+                # O trecho deslocado pode começar antes da coincidência
+                back = pos - block_size
+                while back >= 0 and match(back):
+                    back -= block_size
+                pos += block_size
+                rolled = 0
+            else:
+                pos += 1 # A janela em `end` já foi conferida
+    return found
+
+
+def copy_blocks(manifest, found, old_path, writer):
+    """Copia do arquivo antigo para `writer` os blocos achados, juntando os contíguos."""
+    block_size = manifest["block_size"]
+    with open(old_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        run_start = run_source = None
+        run_length = 0
+        for index in sorted(found):
+            target, source = index * block_size, found[index]
+            if (run_start is not None and target == run_start + run_length
+                    and source == run_source + run_length and run_length < COPY_RUN):
+                run_length += block_size
+                continue
+            if run_start is not None:
+                writer.write_at(data[run_source:run_source + run_length], run_start)
+            run_start, run_source, run_length = target, source, block_size
+        if run_start is not None:
+            writer.write_at(data[run_source:run_source + run_length], run_start)
+
+
+def missing_ranges(manifest, found, merge_gap=MERGE_GAP):
+    """Faixas [start, end] (inclusivas) que faltam baixar, no formato do SegmentScheduler."""
+    block_size, size = manifest["block_size"], manifest["size"]
+    ranges = []
+    for index in range(len(manifest["blocks"])):
+        if index in found:
+            continue
+        start = index * block_size
+        end = min(start + block_size, size) - 1
+        if ranges and start - ranges[-1][1] - 1 <= merge_gap:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return [tuple(r) for r in ranges]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m core.delta",
+        description="Gera o manifesto de blocos (ARQUIVO" + MANIFEST_SUFFIX + ") para atualizações delta.")
+    parser.add_argument("files", nargs="+", metavar="ARQUIVO")
+    parser.add_argument("-b", "--block-size", type=int, default=DEFAULT_BLOCK_SIZE, metavar="BYTES",
+                        help=f"tamanho do bloco (padrão: {DEFAULT_BLOCK_SIZE})")
+    args = parser.parse_args(argv)
+    if args.block_size < 1024:
+        parser.error("--block-size precisa ser de pelo menos 1024 bytes")
+    for path in args.files:
+        try:
+            print(write_manifest(path, args.block_size))
+        except OSError as e:
+            print(f"Erro ao gerar o manifesto de {path}: {e}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
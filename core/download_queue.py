@@ -0,0 +1,353 @@
+# core/download_queue.py
+import os
+import threading
+import time
+
+from . import database
+from .downloader import create_download_logic
+from .journal import DownloadJournal
+from .telemetry import Telemetry, TELEMETRY_INTERVAL
+from .bandwidth import BandwidthLimiter
+from .connections import ConnectionBudget, ConnectionPool, DEFAULT_PER_HOST
+
+# Estados de um job na fila
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class DownloadJob:
+    """Estado de um download na fila (o que as GUIs exibem)."""
+    def __init__(self, job_id, url, save_path, num_threads, state=QUEUED, max_speed=0, checksum=None,
+                 mirrors=None):
+        self.id = job_id
+        self.url = url
+        self.save_path = save_path
+        self.num_threads = num_threads
+        self.state = state
+        self.max_speed = max_speed # KB/s (0 = sem limite próprio)
+        self.checksum = checksum # Hash esperado (ver DownloadLogic.download_file_manager)
+        self.mirrors = list(mirrors or []) # Outras URLs do mesmo arquivo
+        self.filename = None
+        self.error = None
+        self.status_msg = ""
+        self.progress = 0
+        self.speed = "0 KB/s"
+        self.eta = None
+        self.downloaded = 0
+        self.total = 0
+        self.segments = {} # Última amostra por worker (ver Telemetry.sample)
+        self.logic = None
+        self.thread = None
+        self.stop_reason = None # PAUSED ou CANCELLED quando o usuário interrompe
+        self.partial_file = None # Arquivo incompleto de um job pausado ou com falha (apagado se for cancelado)
+        self.queued_at = time.time() # Quando entrou (ou voltou) na fila, para as métricas
+
+    def to_dict(self, segments=False):
+        """Estado do job; com `segments=True`, inclui a última amostra de cada worker."""
+        data = {
+            "id": self.id,
+            "url": self.url,
+            "save_path": self.save_path,
+            "num_threads": self.num_threads,
+            "state": self.state,
+            "max_speed": self.max_speed,
+            "checksum": self.checksum,
+            "mirrors": list(self.mirrors),
+            "filename": self.filename,
+            "error": self.error,
+            "status": self.status_msg,
+            "progress": self.progress,
+            "speed": self.speed,
+            "eta": self.eta,
+            "downloaded": self.downloaded,
+            "total": self.total,
+        }
+        if segments:
+            data["segments"] = {str(k): dict(v) for k, v in self.segments.items()}
+        return data
+
+
+class DownloadQueue:
+    """
+    Fila de downloads: mantém vários jobs, roda até `max_active_jobs` ao mesmo
+    tempo e divide um único orçamento de conexões e um único limite de banda
+    (settings["max_speed_kbps"]) entre eles; cada job pode ter o próprio
+    limite de banda, dentro do global. Os jobs também compartilham o pool
+    de conexões keep-alive (ConnectionPool): um job no mesmo host de um
+    anterior reaproveita as conexões já abertas.
+
+    Cada job em execução tem o seu próprio DownloadLogic. A fila é persistida
+    no SQLite (tabela download_queue); jobs que estavam rodando quando o
+    programa fechou voltam como "queued" e são retomados pelo journal.
+
+    Callbacks aceitos:
+        on_job_update(job_dict) - chamado de threads de trabalho a cada mudança.
+    Outros interessados (ex.: core/control_server.py) usam add_listener(),
+    com a mesma assinatura; eles não podem bloquear. Os avisos saem sem o
+    lock da fila, então um listener pode chamar pause/cancel/add.
+
+    Pausar mantém o arquivo incompleto e o journal para retomar; cancelar
+    apaga os dois (o job sai da fila e não pode mais ser retomado).
+
+    Com `metrics` (core/metrics.py), os jobs entram nas métricas do processo,
+    junto com o tempo de espera na fila e o número de jobs por estado.
+    """
+    def __init__(self, lang_manager, callbacks=None, max_active_jobs=3, max_connections=32,
+                 settings=None, metrics=None):
+        self.lang = lang_manager
+        self.callbacks = callbacks or {}
+        self.settings = settings or {} # Escolha do motor (ver create_download_logic)
+        self.max_active_jobs = max(1, int(max_active_jobs))
+        self.budget = ConnectionBudget(max_connections)
+        self.bandwidth = BandwidthLimiter(self.settings.get("max_speed_kbps", 0) * 1024)
+        self.lock = threading.RLock()
+        self.jobs = {}
+        self.listeners = []
+        # Um único sampler para todos os jobs em execução
+        self.telemetry = Telemetry(self.settings.get("telemetry_interval", TELEMETRY_INTERVAL))
+        self.connections = ConnectionPool(self.settings.get("max_connections_per_host", DEFAULT_PER_HOST))
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.watch_pool(self.connections)
+            metrics.watch_queue(self)
+
+        database.init_db()
+        for job_id, url, path, num_threads, state, max_speed, checksum, mirrors in database.load_queue_jobs():
+            if state == RUNNING:
+                state = QUEUED
+            self.jobs[job_id] = DownloadJob(job_id, url, path, num_threads, state, max_speed, checksum,
+                                            mirrors)
+        self._schedule()
+
+    # --- API pública ---
+
+    def add(self, url, save_path, num_threads, max_speed=0, checksum=None, mirrors=None):
+        job_id = database.add_queue_job(url, save_path, num_threads, max_speed=max_speed,
+                                        checksum=checksum, mirrors=mirrors)
+        with self.lock:
+            job = DownloadJob(job_id, url, save_path, num_threads, max_speed=max_speed,
+                              checksum=checksum, mirrors=mirrors)
+            self.jobs[job_id] = job
+        self._notify(job)
+        self._schedule()
+        return job_id
+
+    def pause(self, job_id):
+        self._interrupt(job_id, PAUSED)
+
+    def cancel(self, job_id):
+        self._interrupt(job_id, CANCELLED)
+
+    def resume(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.state not in (PAUSED, FAILED):
+                return
+            job.error = None
+            job.queued_at = time.time()
+            self._set_state(job, QUEUED)
+        self._notify(job)
+        self._schedule()
+
+    def remove(self, job_id):
+        """Tira da lista um job que não está rodando."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.state == RUNNING:
+                return
+            del self.jobs[job_id]
+        database.remove_queue_job(job_id)
+
+    def clear_finished(self):
+        with self.lock:
+            finished = [j.id for j in self.jobs.values() if j.state in FINISHED_STATES]
+        for job_id in finished:
+            self.remove(job_id)
+
+    def list_jobs(self):
+        with self.lock:
+            return [job.to_dict() for job in sorted(self.jobs.values(), key=lambda j: j.id)]
+
+    def get_job(self, job_id, segments=False):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job.to_dict(segments) if job else None
+
+    def add_listener(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def set_job_speed_limit(self, job_id, max_speed):
+        """Limite de banda de um job em KB/s (0 = sem limite); vale na hora se ele estiver rodando."""
+        max_speed = max(0, int(max_speed))
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            job.max_speed = max_speed
+            if job.logic:
+                job.logic.set_speed_limit(max_speed * 1024)
+        database.update_queue_job_speed(job_id, max_speed)
+        self._notify(job)
+
+    def set_limits(self, max_active_jobs=None, max_connections=None, max_speed_kbps=None,
+                   max_connections_per_host=None):
+        if max_active_jobs is not None:
+            self.max_active_jobs = max(1, int(max_active_jobs))
+        if max_connections is not None:
+            self.budget.set_limit(max_connections)
+        if max_connections_per_host is not None:
+            self.connections.set_per_host(max_connections_per_host)
+        if max_speed_kbps is not None:
+            self.bandwidth.set_rate(max(0, int(max_speed_kbps)) * 1024)
+        self._schedule()
+
+    # --- Internos ---
+
+    def _interrupt(self, job_id, reason):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.state in FINISHED_STATES:
+                return
+            logic = job.logic if job.state == RUNNING else None
+            if logic:
+                # _run_job muda o estado (e apaga o arquivo, se cancelado) quando o download parar
+                job.stop_reason = reason
+            else:
+                self._set_state(job, reason)
+                partial = job.partial_file
+                if reason == CANCELLED:
+                    job.partial_file = None
+        if logic:
+            logic.stop_download(cancelled=True)
+            return
+        if reason == CANCELLED:
+            self._discard_partial(partial)
+        self._notify(job)
+
+    @staticmethod
+    def _discard_partial(path):
+        """Apaga o arquivo incompleto de um job cancelado e o journal dele."""
+        if not path:
+            return
+        DownloadJournal(path).remove()
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Erro ao apagar o download cancelado: {e}")
+
+    def _set_state(self, job, state):
+        # Chamado com self.lock adquirido; quem chama avisa (_notify) depois de soltá-lo
+        job.state = state
+        if state in (COMPLETED, CANCELLED):
+            database.remove_queue_job(job.id)
+        else:
+            database.update_queue_job(job.id, state)
+
+    def _notify(self, job):
+        # Chamado sem self.lock: o estado e os listeners são copiados, e os avisos saem fora do lock
+        with self.lock:
+            job_dict = job.to_dict()
+            listeners = list(self.listeners)
+        if self.callbacks.get("on_job_update"):
+            self.callbacks["on_job_update"](job_dict)
+        for listener in listeners:
+            listener(job_dict)
+
+    def _schedule(self):
+        """Inicia jobs da fila até o limite de jobs simultâneos."""
+        started = []
+        with self.lock:
+            running = sum(1 for j in self.jobs.values() if j.state == RUNNING)
+            for job in sorted(self.jobs.values(), key=lambda j: j.id):
+                if running >= self.max_active_jobs:
+                    break
+                if job.state == QUEUED:
+                    self._start_job(job)
+                    started.append(job)
+                    running += 1
+        for job in started:
+            self._notify(job)
+
+    def _start_job(self, job):
+        # Chamado com self.lock adquirido
+        job.stop_reason = None
+        job.progress = 0
+        job.speed = "0 KB/s"
+        job.eta = None
+        job.segments = {}
+        if self.metrics is not None:
+            self.metrics.queue_waited(time.time() - job.queued_at)
+        job.logic = create_download_logic(self.lang, self._job_callbacks(job), self.settings,
+                                          connection_budget=self.budget, telemetry=self.telemetry,
+                                          bandwidth=self.bandwidth, connection_pool=self.connections,
+                                          metrics=self.metrics)
+        job.logic.set_speed_limit(job.max_speed * 1024)
+        self._set_state(job, RUNNING)
+        job.thread = threading.Thread(target=self._run_job, args=(job,), daemon=True)
+        job.thread.start()
+
+    def _job_callbacks(self, job):
+        def on_complete(filename):
+            job.filename = filename
+
+        def on_error(title, message):
+            job.error = f"{title}: {message}"
+
+        def on_status_change(message):
+            job.status_msg = message
+            self._notify(job)
+
+        def on_telemetry(snapshot):
+            job.progress = snapshot["progress"]
+            job.speed = snapshot["speed_str"]
+            job.eta = snapshot["eta"]
+            job.downloaded = snapshot["downloaded"]
+            job.total = snapshot["total"]
+            job.segments = snapshot["segments"]
+            self._notify(job)
+
+        return {
+            "on_complete": on_complete,
+            "on_error": on_error,
+            "on_status_change": on_status_change,
+            "on_telemetry": on_telemetry,
+        }
+
+    def _run_job(self, job):
+        try:
+            job.logic.download_file_manager(job.url, job.save_path, job.num_threads, job.checksum,
+                                            job.mirrors)
+        except Exception as e:
+            job.error = str(e)
+
+        with self.lock:
+            if job.stop_reason:
+                state = job.stop_reason
+            elif job.error or not job.filename:
+                state = FAILED
+            else:
+                state = COMPLETED
+                job.progress = 100
+            partial = job.logic.partial_file
+            job.partial_file = partial if state in (PAUSED, FAILED) else None
+            job.logic = None
+            job.segments = {}
+            self._set_state(job, state)
+        if state == CANCELLED:
+            self._discard_partial(partial)
+        self._notify(job)
+        self._schedule()
@@ -2,46 +2,119 @@
 import requests
 import threading
 import os
+import hashlib
 import time
-import sqlite3
 from urllib.parse import urlparse
 
-# --- Lógica de DB (de run.py) ---
-# (Idealmente, estaria em core/database.py, mas incluído aqui para ser completo)
-
-# Bloco de run.py
-APP_NAME = "GerenciadorDownloadsAcelerado"
-if os.name == 'nt':
-    APP_DATA_PATH = os.path.join(os.getenv('APPDATA'), APP_NAME)
-else:
-    APP_DATA_PATH = os.path.join(os.path.expanduser('~'), '.config', APP_NAME)
-DB_FILE = os.path.join(APP_DATA_PATH, 'history.db')
-os.makedirs(APP_DATA_PATH, exist_ok=True)
-# ---
-
-def add_to_history(url, file_path):
-    # Bloco de run.py
-    try:
-        filename = os.path.basename(file_path)
-        folder_path = os.path.dirname(file_path)
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO downloads (url, path, filename) VALUES (?, ?, ?)", 
-                           (url, folder_path, filename))
-            conn.commit()
-    except Exception as e:
-        print(f"Erro ao salvar no histórico: {e}")
+from .segments import SegmentScheduler
+from .journal import DownloadJournal, build_validator, validator_matches, if_range_value
+from .adaptive import AdaptiveController, ServerThrottled, THROTTLE_STATUS, ADAPTIVE_INTERVAL
+from .telemetry import Telemetry, TELEMETRY_INTERVAL
+from .storage import FileWriter, MIN_READ_SIZE
+from .bandwidth import BandwidthLimiter
+from .integrity import PrefixHasher, parse_checksum, hash_file_range
+from .mirrors import Mirror, MirrorSet, MirrorFailed
+from .connections import ConnectionPool, DEFAULT_PER_HOST
+from .probe import probe, remember_max_connections
+from .retry import SegmentFailed, is_retryable, retry_after_of, backoff_delay, parse_retry_after, RETRY_ATTEMPTS
+from .settings import APP_DATA_PATH
+from .database import add_to_history, get_last_download, get_last_hashed_download
+from .content_store import STORE_HASH, DEFAULT_MAX_MB
+from . import content_store
+from . import delta
+from . import tracing
+
+JOURNAL_INTERVAL = 2.0 # Segundos entre gravações do journal
+
+TRACE_DIR = os.path.join(APP_DATA_PATH, 'traces') # Traces gravados com settings["trace_downloads"]
+
+class ChunkReader:
+    """readinto sobre response.iter_content: o caminho seguro quando o atalho de body_reader não vale."""
+    def __init__(self, response, chunk_size):
+        self.chunks = response.iter_content(chunk_size)
+        self.pending = memoryview(b"")
+
+    def readinto(self, view):
+        if not self.pending:
+            self.pending = memoryview(next(self.chunks, b""))
+        n = min(len(view), len(self.pending))
+        view[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+
+def body_reader(response, chunk_size):
+    """
+    Leitor do corpo com readinto direto no buffer do worker: o http.client por
+    baixo do urllib3 (o readinto do urllib3 aloca um bytes por leitura).
+    `_fp` é interno do urllib3: o atalho só vale se ele existir com readinto
+    e o urllib3 não estiver decodificando o corpo (gzip etc.); senão, o corpo
+    passa pelo iter_content do requests, como em qualquer download.
+    """
+    raw = response.raw
+    fp = getattr(raw, '_fp', None)
+    if (fp is not None and hasattr(fp, 'readinto') and not getattr(raw, 'decode_content', True)
+            and response.headers.get('content-encoding', 'identity') == 'identity'):
+        return fp
+    return ChunkReader(response, chunk_size)
 
 # --- Classe de Lógica de Download ---
 
+ENGINES = ("threads", "asyncio")
+
+def create_download_logic(lang_manager, callbacks, settings=None, connection_budget=None,
+                          telemetry=None, bandwidth=None, connection_pool=None, metrics=None):
+    """
+    Cria o motor de download escolhido nas configurações ('engine').
+    Os dois motores têm a mesma interface de callbacks. Passe `telemetry`
+    para reaproveitar o sampler de um motor anterior, `bandwidth` para
+    pendurar o download no limite de banda global, `connection_pool` para
+    reaproveitar as conexões keep-alive de downloads anteriores e `metrics`
+    (core/metrics.py) para somar o download nas métricas do processo.
+    """
+    settings = settings or {}
+    if telemetry is None:
+        telemetry = Telemetry(settings.get("telemetry_interval", TELEMETRY_INTERVAL))
+    if connection_pool is None:
+        connection_pool = ConnectionPool(settings.get("max_connections_per_host", DEFAULT_PER_HOST))
+    if settings.get("engine") == "asyncio":
+        from .async_engine import AsyncDownloadLogic
+        logic = AsyncDownloadLogic(lang_manager, callbacks, connection_budget=connection_budget,
+                                   max_concurrency=settings.get("async_max_concurrency", 64),
+                                   telemetry=telemetry, bandwidth=bandwidth,
+                                   connection_pool=connection_pool)
+    else:
+        logic = DownloadLogic(lang_manager, callbacks, connection_budget=connection_budget,
+                              telemetry=telemetry, bandwidth=bandwidth, connection_pool=connection_pool)
+    logic.adaptive = settings.get("thread_mode") == "Adaptativo"
+    logic.metrics = metrics
+    if settings.get("trace_downloads"):
+        logic.trace_dir = TRACE_DIR
+    if settings.get("content_store"):
+        logic.content_store = content_store.get_store(settings.get("content_store_max_mb", DEFAULT_MAX_MB))
+    logic.delta_updates = bool(settings.get("delta_updates"))
+    return logic
+
 class DownloadLogic:
     """
     Contém toda a lógica de download, de forma independente da GUI.
     Baseado em run.py
     """
-    def __init__(self, lang_manager, callbacks):
+    def __init__(self, lang_manager, callbacks, connection_budget=None, telemetry=None,
+                 bandwidth=None, connection_pool=None):
         self.lang = lang_manager
         self.callbacks = callbacks # Dicionário de funções da GUI
+        self.connection_budget = connection_budget # Limite global (DownloadQueue), opcional
+        # Conexões keep-alive e limite por host, compartilhados entre downloads
+        self.connection_pool = connection_pool or ConnectionPool()
+        self.telemetry = telemetry or Telemetry() # Sampler de progresso/velocidade
+        # Limite de banda deste download, dentro do limite global (`bandwidth`), se houver
+        self.limiter = BandwidthLimiter(0, parent=bandwidth)
+        self.adaptive = False # Modo adaptativo: num_threads passa a ser o máximo de conexões
+        self.trace_dir = None # Pasta onde gravar a linha do tempo de cada download (core/tracing.py)
+        self.metrics = None # Métricas do processo (core/metrics.py), opcional
+        self.content_store = None # Arquivos já baixados, por hash (core/content_store.py), opcional
+        self.delta_updates = False # Atualiza a cópia local só nos blocos que mudaram (core/delta.py)
         self.reset_globals()
         
     def reset_globals(self):
@@ -50,193 +123,579 @@ class DownloadLogic:
         self.is_multithreaded = False
         self.global_progress = 0
         self.global_speed = "0 MB/s"
-        self.global_total_downloaded = 0
+        self.eta = None # Segundos restantes estimados pela telemetria
+        self.global_total_downloaded = 0 # Atualizado pela telemetria (ver current_downloaded)
+        self.resumed_bytes = 0
         self.global_total_size = 0
         self.global_lock = threading.Lock()
         self.url_para_historico = ""
         self.thread_stats = {} 
+        self.mirrors = None # MirrorSet do download segmentado (a URL principal + espelhos)
+        self.adaptive_controller = None
+        self.host_ceiling = None # Conexões que o servidor aguentou antes de limitar (429/503)
+        self.running_workers = 0
+        self.worker_limit = 0
+        self.free_worker_ids = [] # IDs (e contadores) de workers encerrados, reaproveitados pelos novos
+        self.segment_error = None # Última falha passageira de um segmento (ver _retry_delay)
+        self.expected_checksum = None # (algoritmo, hex) informado pelo usuário
+        self.checksum_files = {} # URL do .sha256 -> conteúdo, baixado uma vez por download
+        self.stream_hasher = None # Hash contínuo do modo de conexão única
+        self.hash_algorithm = None # Hash calculado no download: o do checksum ou, com o content store, STORE_HASH
+        self.file_hash = None
+        self.source = None # De onde veio o arquivo quando não foi baixado ('not_modified', 'store:<meio>', 'delta')
+        self.tracer = None # Tracer do download atual, se trace_dir estiver definido
+        self.trace_file = None # Caminho do trace gravado no fim do download
+        self.result = "failed" # 'completed', 'failed' ou 'cancelled' (para as métricas)
+        self.started_at = 0.0 # time.time() do início, para a duração no histórico
+        self.etag = None # Validadores do servidor, gravados no histórico para o download condicional
+        self.last_modified = None
+        self.partial_file = None # Arquivo sendo gravado (incompleto até o fim); o antigo, num delta, fica de fora
 
-    def update_progress_bar(self):
-        # Esta função agora é um loop interno, não um 'after' do Tkinter
-        if not self.download_active:
-            return
-
-        last_downloaded = self.global_total_downloaded
-        last_time = time.time()
-        
-        # Inicia o loop de monitoramento
-        threading.Thread(target=self._update_speed_logic, 
-                         args=(last_downloaded, last_time), daemon=True).start()
-
-    def _update_speed_logic(self, last_downloaded, last_time):
-        # Baseado em run.py
+    def _on_telemetry(self, snapshot):
+        """Recebe as amostras do sampler (thread da telemetria) e repassa para a GUI."""
         if not self.download_active:
             return
-
-        current_time = time.time()
-        time_diff = current_time - last_time
-        
-        with self.global_lock:
-            current_downloaded = self.global_total_downloaded
-            if self.global_total_size > 0:
-                self.global_progress = (current_downloaded / self.global_total_size) * 100
-            else:
-                self.global_progress = 0
-
-        bytes_diff = current_downloaded - last_downloaded
-        
-        if time_diff > 0:
-            speed_bps = bytes_diff / time_diff
-            speed_MBps = (speed_bps / 1024 / 1024)
-            speed_KBps = (speed_bps / 1024)
-
-            if speed_MBps >= 1:
-                self.global_speed = f"{speed_MBps:.2f} MB/s"
-            else:
-                self.global_speed = f"{speed_KBps:.2f} KB/s"
+        self.global_total_downloaded = snapshot["downloaded"]
+        self.global_progress = snapshot["progress"]
+        self.global_speed = snapshot["speed_str"]
+        self.eta = snapshot["eta"]
         
         # CHAMA O CALLBACK DA GUI
         if self.callbacks.get("on_progress"):
             self.callbacks["on_progress"](self.global_progress, self.global_speed)
+        if self.callbacks.get("on_telemetry"):
+            self.callbacks["on_telemetry"](snapshot)
+        if self.metrics is not None:
+            self.metrics.sample(self, snapshot)
 
-        # Reagenda (usando time.sleep em vez de app.after)
-        time.sleep(0.5) # Atualiza a cada 0.5s
-        if self.download_active:
-            self._update_speed_logic(self.global_total_downloaded, time.time())
-
-    def download_file_chunk(self, session, url, filename, start_byte, end_byte, thread_id):
+    def download_file_chunk(self, session, mirror, writer, segment, thread_id):
         #
-        # (Esta função é idêntica à original em run.py)
+        # Baixa a faixa restante do segmento a partir de um espelho. O fim
+        # (segment.end) pode encolher durante o download se outro worker
+        # roubar a metade final.
+        # Com o trace desligado, `trace` é None e o loop só faz o teste de None.
+        trace = tracing.SegmentTrace(self.tracer, thread_id, segment, mirror=mirror.url) if self.tracer else None
+        error = None
         try:
-            headers = {'Range': f'bytes={start_byte}-{end_byte}'}
-            with session.get(url, headers=headers, stream=True, timeout=20) as response:
+            headers = {'Range': f'bytes={segment.position}-{segment.end}',
+                       'Accept-Encoding': 'identity'}
+            if mirror.if_range:
+                headers['If-Range'] = mirror.if_range # Se o arquivo mudar, o servidor responde 200
+            with session.get(mirror.url, headers=headers, stream=True, timeout=20) as response:
+                if trace is not None:
+                    trace.headers(response.status_code)
+                if response.status_code in THROTTLE_STATUS:
+                    raise ServerThrottled(f"Servidor limitando conexões (HTTP {response.status_code})",
+                                          response.status_code,
+                                          parse_retry_after(response.headers.get('Retry-After')))
                 response.raise_for_status()
+                if response.status_code != 206:
+                    raise ServerThrottled(f"Servidor ignorou o Range (HTTP {response.status_code})",
+                                          response.status_code)
 
-                with open(filename, 'r+b') as f:
-                    f.seek(start_byte)
-                    for chunk in response.iter_content(chunk_size=1024*128):
-                        if not self.download_active: return 
-                        if chunk:
-                            f.write(chunk)
-                            len_chunk = len(chunk)
-                            
-                            with self.global_lock:
-                                self.global_total_downloaded += len_chunk
-                                stats = self.thread_stats[thread_id]
-                                stats['downloaded'] += len_chunk
-                                
-                                current_time = time.time()
-                                time_diff = current_time - stats['last_time']
-                                if time_diff > 0.5: 
-                                    bytes_diff = stats['downloaded'] - stats['last_downloaded']
-                                    speed_bps = bytes_diff / time_diff
-                                    speed_MBps = (speed_bps / 1024 / 1024)
-                                    speed_KBps = (speed_bps / 1024)
-                                    if speed_MBps >= 1:
-                                        stats['speed_str'] = f"{speed_MBps:.2f} MB/s"
-                                    else:
-                                        stats['speed_str'] = f"{speed_KBps:.2f} KB/s"
-                                    stats['last_time'] = current_time
-                                    stats['last_downloaded'] = stats['downloaded']
+                stats = self.thread_stats[thread_id]
+                write_hist = stats['write_hist'] # Só com métricas ligadas
+                view = self._read_buffer(stats)
+                reader = body_reader(response, len(view))
+                body_left = int(response.headers.get('content-length', -1))
+                while True:
+                    if not self.download_active: return 
+                    if not mirror.alive:
+                        raise MirrorFailed("Espelho abandonado no meio do segmento")
+                    remaining = segment.end - segment.position + 1
+                    if remaining <= 0:
+                        break
+                    if len(view) != stats['read_size']:
+                        view = self._read_buffer(stats)
+                    if trace is not None:
+                        trace.before_read()
+                    n = reader.readinto(view[:remaining] if remaining < len(view) else view)
+                    if not n:
+                        raise ConnectionError("Resposta terminou antes do fim do segmento")
+                    if trace is not None:
+                        trace.after_read()
+                    if write_hist is not None:
+                        write_start = time.perf_counter()
+                    writer.write_at(view[:n], segment.position)
+                    if write_hist is not None:
+                        write_hist.observe(time.perf_counter() - write_start)
+                    if trace is not None:
+                        trace.after_write()
+                    segment.position += n
+                    body_left -= n
+                    # Só esta thread escreve no seu contador: sem lock nem relógio aqui
+                    stats['downloaded'] += n
+                    if self.limiter.limited:
+                        self.limiter.consume(n)
+                        self.limiter.wait(self.is_active)
+                if body_left == 0:
+                    # Corpo lido até o fim fora do urllib3: devolve a conexão ao pool
+                    response.raw.release_conn()
         except Exception as e:
+            error = e
             if self.download_active:
-                print(f"Erro na thread {thread_id}: {e}")
-                self.stop_download(error=e)
+                if self.mirrors.can_fail_over(mirror):
+                    raise MirrorFailed(str(e)) from e
+                if self._can_back_off(e):
+                    raise ServerThrottled(str(e)) from e
+                raise SegmentFailed(e) from e # O worker decide: nova tentativa ou desistir
+        finally:
+            if trace is not None:
+                trace.finish(error)
+
+    def is_active(self):
+        return self.download_active
+
+    def set_speed_limit(self, bytes_per_second):
+        """Limita a banda deste download (0 = sem limite). Vale imediatamente."""
+        self.limiter.set_rate(bytes_per_second)
+
+    def _retry_delay(self, error, failures, worker):
+        """
+        Quanto esperar antes de tentar de novo (backoff com jitter, ou o
+        Retry-After do servidor), ou None se o worker deve desistir. Erros que
+        não se resolvem tentando de novo (disco, HTTP 4xx) param o download.
+        """
+        if not is_retryable(error):
+            print(f"Erro no worker {worker}: {error}")
+            self.stop_download(error=error)
+            return None
+        self.segment_error = error
+        if failures > RETRY_ATTEMPTS:
+            print(f"Worker {worker} desistiu após {RETRY_ATTEMPTS} tentativas: {error}")
+            return None
+        delay = backoff_delay(failures, retry_after_of(error))
+        print(f"Worker {worker}: {error}; nova tentativa em {delay:.1f}s")
+        self._trace_event("retry", worker, attempt=failures, delay=round(delay, 3), error=str(error))
+        if self.metrics is not None:
+            self.metrics.retry(self)
+        return delay
+
+    def _trace_event(self, name, worker, **args):
+        """Evento pontual no trace (novas tentativas, espelhos abandonados...), se ligado."""
+        if self.tracer is not None:
+            self.tracer.instant(name, worker, **args)
+
+    def _sleep_while_active(self, seconds):
+        deadline = time.time() + seconds
+        while self.download_active:
+            left = deadline - time.time()
+            if left <= 0:
+                return
+            time.sleep(min(left, 0.25))
+
+    def _can_back_off(self, error):
+        """No modo adaptativo, limitação do servidor reduz conexões em vez de abortar."""
+        if self.adaptive_controller is None or self.running_workers <= 1:
+            return False
+        return isinstance(error, (ServerThrottled, ConnectionError, requests.exceptions.ConnectionError))
+
+    @staticmethod
+    def new_thread_stats():
+        # 'downloaded', 'buffer' e 'write_hist' são do worker dono; o resto é escrito pela telemetria
+        return {"downloaded": 0, "total_size": 0, "speed_str": "0 KB/s", "segment": None,
+                "read_size": MIN_READ_SIZE, "buffer": None, "write_hist": None}
+
+    @staticmethod
+    def _read_buffer(stats):
+        """Buffer de leitura reaproveitado do worker, realocado só quando o tamanho muda."""
+        if stats['buffer'] is None or len(stats['buffer']) != stats['read_size']:
+            stats['buffer'] = memoryview(bytearray(stats['read_size']))
+        return stats['buffer']
+
+    def current_downloaded(self):
+        """Total baixado: bytes de execuções anteriores + contadores dos workers."""
+        return self.resumed_bytes + sum(s['downloaded'] for s in list(self.thread_stats.values()))
+
+    def download_worker(self, writer, scheduler, thread_id):
+        """
+        Pega segmentos do scheduler até não haver mais nada para baixar.
+        Se um segmento falha, o resto dele volta para o scheduler (outro worker
+        continua do byte em que parou) e este worker espera antes de pegar o
+        próximo; depois de RETRY_ATTEMPTS falhas seguidas sem progresso, desiste.
+        A sessão é lida do pool a cada segmento: ela é trocada quando o limite
+        por host aumenta (ConnectionPool.reserve).
+        """
+        retired = False
+        failures = 0
+        delay = 0
+        tracing.bind(self.tracer, thread_id) # As conexões abertas por esta thread entram no trace
+        try:
+            while self.download_active:
+                if delay:
+                    self._sleep_while_active(delay)
+                    delay = 0
+                if self._should_retire_worker():
+                    retired = True
+                    return
+                if not self._acquire_connection():
+                    return
+                try:
+                    segment = scheduler.next_segment()
+                    if segment is None:
+                        return
+                    mirror = self.mirrors.pick()
+                    if mirror is None:
+                        scheduler.release(segment)
+                        self.stop_download(error=ConnectionError("Nenhum espelho disponível"))
+                        return
+                    if not self.connection_pool.acquire(mirror.url, self.is_active):
+                        scheduler.release(segment)
+                        return
+                    self.thread_stats[thread_id]['segment'] = segment
+                    start_position, start_time = segment.position, time.time()
+                    try:
+                        self.download_file_chunk(self.connection_pool.session, mirror, writer, segment, thread_id)
+                    except MirrorFailed as e:
+                        # Os bytes já gravados ficam; o resto da faixa vai para outro espelho
+                        print(f"Thread {thread_id}: falha no espelho {mirror.url}: {e}")
+                        scheduler.release(segment)
+                        self.mirrors.failed(mirror, e)
+                        self._trace_event("mirror_failed", thread_id, mirror=mirror.url, error=str(e))
+                        continue
+                    except ServerThrottled as e:
+                        # Devolve o resto da faixa e encerra esta conexão
+                        print(f"Thread {thread_id} encerrada: {e}")
+                        scheduler.release(segment)
+                        self._trace_event("throttled", thread_id, error=str(e))
+                        self._throttled()
+                        return
+                    except SegmentFailed as e:
+                        scheduler.release(segment)
+                        if segment.position > start_position:
+                            failures = 0 # Houve progresso: a contagem recomeça
+                        failures += 1
+                        delay = self._retry_delay(e.error, failures, thread_id)
+                        if delay is None:
+                            return
+                        continue
+                    finally:
+                        self.connection_pool.release(mirror.url)
+                    self.mirrors.record(mirror, segment.position - start_position, time.time() - start_time)
+                    scheduler.finish(segment)
+                    failures = 0
+                finally:
+                    self._release_connection()
+        finally:
+            self._worker_exited(thread_id, retired)
+
+    # --- Modo adaptativo (número de conexões guiado pela vazão) ---
+
+    def _spawn_worker(self, start_worker):
+        """
+        Cria um worker novo (thread ou corrotina, via `start_worker(id)`).
+        Reaproveita o ID e os contadores de um worker já encerrado, se houver:
+        o modo adaptativo encerra e cria workers o download inteiro, e as
+        linhas do monitor e os medidores da telemetria ficam limitados ao
+        maior número de workers simultâneos. O 'downloaded' herdado continua
+        contando no total.
+        """
+        with self.global_lock:
+            self.running_workers += 1
+            if self.free_worker_ids:
+                thread_id = self.free_worker_ids.pop()
+            else:
+                thread_id = len(self.thread_stats)
+                stats = self.new_thread_stats()
+                if self.metrics is not None:
+                    stats['write_hist'] = self.metrics.write_histogram(self)
+                self.thread_stats[thread_id] = stats
+        start_worker(thread_id)
+
+    def _throttled(self):
+        """O servidor limitou: reduz as conexões e lembra quantas ele aguentou."""
+        with self.global_lock:
+            # Só o primeiro sinal conta: os seguintes vêm de conexões já em excesso
+            if self.host_ceiling is None:
+                self.host_ceiling = max(1, self.running_workers - 1)
+        self.adaptive_controller.throttled()
+
+    def _worker_exited(self, thread_id, retired=False):
+        # Um worker aposentado já saiu da contagem em _should_retire_worker
+        with self.global_lock:
+            if not retired:
+                self.running_workers -= 1
+            self.thread_stats[thread_id]['segment'] = None
+            self.free_worker_ids.append(thread_id)
+
+    def _should_retire_worker(self):
+        """Verdadeiro se há mais workers do que o alvo do modo adaptativo."""
+        if self.adaptive_controller is None:
+            return False
+        with self.global_lock: # Uma vez por segmento, não por bloco
+            if self.running_workers > self.worker_limit:
+                self.running_workers -= 1
+                return True
+        return False
+
+    def _adapt(self, start_worker, now):
+        """Consulta o controlador e ajusta o número de workers."""
+        target = self.adaptive_controller.observe(self.current_downloaded(), now)
+        if target is None:
+            return
+        self.worker_limit = target
+        for _ in range(target - self.running_workers):
+            self._spawn_worker(start_worker)
+        self._callback_status("status_adaptive", count=target)
+
+    def _acquire_connection(self):
+        """Reserva uma vaga no limite global de conexões (se houver um)."""
+        if self.connection_budget is None:
+            return True
+        return self.connection_budget.acquire(lambda: self.download_active)
+
+    def _release_connection(self):
+        if self.connection_budget is not None:
+            self.connection_budget.release()
 
     def download_file_single(self, session, url, filename, total_size):
         #
         # (Esta função é idêntica à original em run.py, com a correção do bug)
+        stats = self.thread_stats[0] = self.new_thread_stats()
         try:
             with session.get(url, stream=True, allow_redirects=True, timeout=20) as response:
                 response.raise_for_status()
                 with open(filename, 'wb') as f:
+                    self.partial_file = filename
                     for chunk in response.iter_content(chunk_size=1024*128):
                         if not self.download_active: return 
                         if chunk:
                             f.write(chunk)
-                            len_chunk = len(chunk) # <--- Correção
-                            with self.global_lock:
-                                 self.global_total_downloaded += len_chunk
+                            if self.stream_hasher is not None:
+                                self.stream_hasher.update(chunk)
+                            stats['downloaded'] += len(chunk)
+                            if self.limiter.limited:
+                                self.limiter.consume(len(chunk))
+                                self.limiter.wait(self.is_active)
         except Exception as e:
             if self.download_active:
                 print(f"Erro no download (single): {e}")
                 self.stop_download(error=e)
 
-    def download_file_manager(self, url, save_path, num_threads):
+    def run_segments(self, session, url, writer, scheduler, num_workers, journal, validator):
+        """Baixa os segmentos do scheduler usando uma thread por conexão."""
+        threads = []
+        
+        def start_worker(thread_id):
+            t = threading.Thread(target=self.download_worker, 
+                                 args=(writer, scheduler, thread_id))
+            t.daemon = True
+            t.start()
+            threads.append(t)
+        
+        for _ in range(num_workers):
+            self._spawn_worker(start_worker)
+        
+        self._wait_workers(threads, scheduler, journal, url, validator, start_worker, writer.fileno())
+
+    def _wait_workers(self, threads, scheduler, journal, url, validator, start_worker, data_fd):
+        """
+        Aguarda os workers salvando o journal periodicamente (e, no modo
+        adaptativo, ajustando o número de conexões). Ao final, o journal é
+        removido se tudo foi baixado, ou salvo uma última vez para retomada.
+        """
+        tick = ADAPTIVE_INTERVAL if self.adaptive_controller else JOURNAL_INTERVAL
+        last_save = time.time()
+        while True:
+            alive = [t for t in threads if t.is_alive()]
+            if not alive:
+                break
+            alive[0].join(tick)
+            
+            now = time.time()
+            if self.adaptive_controller and self.download_active:
+                self._adapt(start_worker, now)
+            if now - last_save >= JOURNAL_INTERVAL:
+                self._save_journal(journal, url, validator, scheduler, data_fd)
+                last_save = now
+        
+        self._finish_journal(scheduler, journal, url, validator, data_fd)
+
+    def _save_journal(self, journal, url, validator, scheduler, data_fd):
+        start = time.perf_counter()
+        journal.save(url, validator, scheduler.snapshot(), data_fd)
+        if self.tracer is not None:
+            self.tracer.span("journal", tracing.MAIN, start, time.perf_counter())
+
+    def _finish_journal(self, scheduler, journal, url, validator, data_fd):
+        if scheduler.is_complete() and self.download_active:
+            journal.remove()
+        else:
+            self._save_journal(journal, url, validator, scheduler, data_fd)
+
+    def download_file_manager(self, url, save_path, num_threads, checksum=None, mirrors=None):
         #
+        # `checksum` (opcional): hash esperado ('hex', 'algoritmo:hex' ou URL de
+        # um .sha256); o arquivo é verificado antes de ir para o histórico.
+        # `mirrors` (opcional): outras URLs do mesmo arquivo, usadas em paralelo
+        # no modo segmentado.
         self.reset_globals()
         self.download_active = True
         self.url_para_historico = url
+        self.started_at = time.time()
         self.is_multithreaded = False
+        self.telemetry.track(self, self, self._on_telemetry)
+        if self.trace_dir:
+            self.tracer = tracing.Tracer(url)
+            tracing.bind(self.tracer, tracing.MAIN)
+        # No modo automático, o limite por host do pool acompanha as conexões deste download.
+        # num_threads pode cair depois (sondagem, modo adaptativo): devolve-se o que foi reservado
+        reserved = num_threads
+        self.connection_pool.reserve(reserved)
 
         try:
             if not url.startswith(('http://', 'https://')):
                 url = 'https://' + url.lstrip('/')
+            if self.metrics is not None:
+                self.metrics.download_started(self, url) # Depois do esquema: o host vem da URL completa
             
-            with requests.Session() as session:
-                response = session.head(url, allow_redirects=True, timeout=10)
-                response.raise_for_status()
-                
-                self.global_total_size = int(response.headers.get('content-length', 0))
-                
-                final_url = response.url 
-                parsed_path = urlparse(final_url).path
-                base_filename = os.path.basename(parsed_path)
-                filename = os.path.join(save_path, base_filename or "downloaded_file")
+            # Sessão do motor: as conexões keep-alive ficam para os próximos downloads
+            session = self.connection_pool.session
+            # Checksum informado e o conteúdo já está no store: nem precisa sondar
+            if self.content_store is not None and checksum and self._from_store_by_checksum(url, save_path,
+                                                                                            checksum, session):
+                return
+            # Mesma URL e pasta de um download anterior (ou o mesmo conteúdo no store):
+            # a sondagem vira condicional
+            conditional, previous, in_store = self._conditional_headers(save_path)
+            probe_start = time.perf_counter()
+            probed = probe(session, url, conditional)
+            if self.tracer:
+                self.tracer.span("probe", tracing.MAIN, probe_start, time.perf_counter(),
+                                 size=probed.size, accepts_ranges=probed.accepts_ranges,
+                                 not_modified=probed.not_modified)
+            if probed.not_modified:
+                if in_store:
+                    self.etag = probed.headers.get('ETag') or previous[3]
+                    self.last_modified = probed.headers.get('Last-Modified') or previous[4]
+                    if self._from_store(previous[2], save_path, previous[0]):
+                        return
+                elif self._keep_previous(previous, probed, save_path, checksum, session):
+                    return
+                probed = probe(session, url) # A cópia local não confere: baixa de novo
+            self.etag = probed.headers.get('ETag')
+            self.last_modified = probed.headers.get('Last-Modified')
+            
+            self.global_total_size = probed.size
+            
+            final_url = probed.url 
+            parsed_path = urlparse(final_url).path
+            base_filename = os.path.basename(parsed_path)
+            filename = os.path.join(save_path, base_filename or "downloaded_file")
+            
+            if checksum:
+                try:
+                    self.expected_checksum = parse_checksum(checksum, base_filename, session, self.checksum_files)
+                except ValueError:
+                    self.stop_download(error_msg=self.lang.get_string("error_checksum_input", value=checksum),
+                                       title=self.lang.get_string("error_checksum"))
+                    return
+            if self.expected_checksum:
+                self.hash_algorithm = self.expected_checksum[0]
+            elif self.content_store is not None:
+                self.hash_algorithm = STORE_HASH # Para guardar o arquivo no store
 
-                supports_ranges = response.headers.get('Accept-Ranges') == 'bytes'
-                
-                # --- CHAMADAS DE CALLBACK ---
-                self._callback_status("status_starting")
+            supports_ranges = probed.accepts_ranges
+            
+            # --- CHAMADAS DE CALLBACK ---
+            self._callback_status("status_starting")
 
-                if supports_ranges and self.global_total_size > 0 and num_threads > 1:
-                    self.is_multithreaded = True
+            if supports_ranges and self.global_total_size > 0 and num_threads > 1:
+                self.is_multithreaded = True
+                if probed.max_connections:
+                    # O host já limitou acima disso em um download recente
+                    num_threads = max(1, min(num_threads, probed.max_connections))
+                if self.adaptive:
+                    self.adaptive_controller = AdaptiveController(num_threads)
+                    num_threads = self.worker_limit = self.adaptive_controller.target
+                    self._callback_status("status_adaptive", count=num_threads)
+                else:
                     self._callback_status("status_accelerated", count=num_threads)
-                    if self.callbacks.get("on_show_monitor"):
-                        self.callbacks["on_show_monitor"](True)
-                    
-                    with open(filename, 'wb') as f:
-                        f.seek(self.global_total_size - 1)
-                        f.write(b'\0')
-                    
-                    chunk_size = self.global_total_size // num_threads
-                    threads = []
-                    
-                    for i in range(num_threads):
-                        start_byte = i * chunk_size
-                        end_byte = start_byte + chunk_size - 1 if i < num_threads - 1 else self.global_total_size - 1
-                        
-                        this_chunk_size = (end_byte - start_byte) + 1
-                        self.thread_stats[i] = {"downloaded": 0, "total_size": this_chunk_size, 
-                                                "speed_str": "0 KB/s", "last_time": time.time(), 
-                                                "last_downloaded": 0}
-                        
-                        t = threading.Thread(target=self.download_file_chunk, 
-                                             args=(session, final_url, filename, start_byte, end_byte, i))
-                        t.daemon = True
-                        t.start()
-                        threads.append(t)
-                    
-                    for t in threads:
-                        t.join()
+                if self.callbacks.get("on_show_monitor"):
+                    self.callbacks["on_show_monitor"](True)
+                
+                validator = build_validator(probed.headers, self.global_total_size)
+                journal = DownloadJournal(filename)
+                state = journal.load()
+                manifest = None
+                
+                if state and validator_matches(state["validator"], validator):
+                    # Retoma apenas as faixas que faltam
+                    self.resumed_bytes = DownloadJournal.downloaded_bytes(state)
+                    self.global_total_downloaded = self.resumed_bytes
+                    percent = (self.global_total_downloaded / self.global_total_size) * 100
+                    self._callback_status("status_resuming", percent=percent)
+                    scheduler = SegmentScheduler(self.global_total_size, num_threads,
+                                                 ranges=DownloadJournal.missing_ranges(state))
+                    writer = FileWriter(filename)
                 else:
-                    self.is_multithreaded = False
-                    if self.callbacks.get("on_show_monitor"):
-                        self.callbacks["on_show_monitor"](False)
-                    
-                    if num_threads > 1:
-                        self._callback_status("status_unsupported")
+                    journal.remove()
+                    prepared = None
+                    if self.delta_updates:
+                        prepared = self._prepare_delta(session, final_url, filename, validator, num_threads)
+                        if not self.download_active:
+                            return # Cancelado durante a comparação; a cópia antiga fica intacta
+                    if prepared:
+                        # O arquivo novo é montado ao lado do antigo e só o substitui no fim
+                        writer, scheduler, journal, manifest = prepared
+                        if self.hash_algorithm is None:
+                            self.hash_algorithm = "sha256" # Para conferir com o manifesto
                     else:
-                        self._callback_status("status_normal")
-                    
-                    self.download_file_single(session, final_url, filename, self.global_total_size)
+                        # Reserva o espaço do arquivo inteiro antes de começar
+                        writer = FileWriter(filename, self.global_total_size, truncate=True)
+                        scheduler = SegmentScheduler(self.global_total_size, num_threads)
                 
-                if self.download_active:
-                    self.global_progress = 100
-                    # CHAMA O CALLBACK DE CONCLUSÃO
-                    if self.callbacks.get("on_complete"):
-                        self.callbacks["on_complete"](filename)
-                    add_to_history(self.url_para_historico, filename) #
+                self.mirrors = MirrorSet([Mirror(final_url, if_range_value(validator))] +
+                                         self._probe_mirrors(session, mirrors or [], validator))
+                if len(self.mirrors) > 1:
+                    self._callback_status("status_mirrors", count=len(self.mirrors))
+                self.partial_file = writer.filename
+                hasher = None
+                if self.hash_algorithm:
+                    hasher = PrefixHasher(self.hash_algorithm, writer.filename, scheduler)
+                try:
+                    with writer:
+                        self.run_segments(session, final_url, writer, scheduler, num_threads,
+                                          journal, validator)
+                    if self.download_active and not scheduler.is_complete():
+                        # Todos os workers desistiram; o journal guarda o que já foi baixado
+                        self.stop_download(error=self.segment_error or
+                                           ConnectionError("Nenhum worker conseguiu continuar o download"))
+                    if self.host_ceiling:
+                        remember_max_connections(final_url, self.host_ceiling)
+                    if hasher and self.download_active:
+                        self._callback_status("status_verifying")
+                        self.file_hash = hasher.finish(self.global_total_size)
+                finally:
+                    if hasher:
+                        hasher.close()
+                if manifest is not None and self.download_active:
+                    self._finish_delta(writer.filename, filename, manifest)
+            else:
+                self.is_multithreaded = False
+                if self.callbacks.get("on_show_monitor"):
+                    self.callbacks["on_show_monitor"](False)
+                
+                if num_threads > 1:
+                    self._callback_status("status_unsupported")
+                else:
+                    self._callback_status("status_normal")
+                
+                DownloadJournal(filename).remove() # Sem Range não há como retomar
+                if self.hash_algorithm:
+                    self.stream_hasher = hashlib.new(self.hash_algorithm)
+                if self._acquire_connection():
+                    try:
+                        self.download_file_single(session, final_url, filename, self.global_total_size)
+                    finally:
+                        self._release_connection()
+                if self.stream_hasher is not None:
+                    self.file_hash = self.stream_hasher.hexdigest()
+            
+            if self.download_active and self.expected_checksum:
+                self._verify_checksum()
+            if self.download_active:
+                self._complete(filename)
 
         except requests.exceptions.MissingSchema:
             self._callback_error(self.lang.get_string("error_url_msg", url=url), 
@@ -246,8 +705,264 @@ class DownloadLogic:
         except Exception as e:
             self._callback_error(self.lang.get_string("error_file"), str(e))
         finally:
+            self.connection_pool.unreserve(reserved)
+            self.telemetry.untrack(self)
             if self.download_active:
                 self.stop_download()
+            if self.metrics is not None:
+                self.metrics.download_finished(self, self.result)
+            if self.tracer:
+                self._export_trace(url)
+
+    def _complete(self, filename):
+        if self.content_store is not None and self.file_hash:
+            try:
+                self.content_store.add(f"{self.hash_algorithm}:{self.file_hash}", filename)
+            except OSError as e:
+                print(f"Erro ao guardar o arquivo no store: {e}")
+        self.partial_file = None
+        self.global_progress = 100
+        self.result = "completed"
+        # CHAMA O CALLBACK DE CONCLUSÃO
+        if self.callbacks.get("on_complete"):
+            self.callbacks["on_complete"](filename)
+        self._record_history(filename)
+
+    def _record_history(self, filename):
+        """
+        Grava o download concluído no histórico, com tamanho, duração, vazão
+        média, hash ('algoritmo:hex'), os validadores ETag/Last-Modified e o
+        mtime do arquivo (para saber depois se ele foi alterado).
+        """
+        try:
+            mtime = os.path.getmtime(filename)
+        except OSError:
+            mtime = None
+        duration = max(time.time() - self.started_at, 0.001)
+        size = self.global_total_size or self.current_downloaded()
+        session_bytes = self.current_downloaded() - self.resumed_bytes
+        file_hash = f"{self.hash_algorithm}:{self.file_hash}" if self.file_hash else None
+        add_to_history(self.url_para_historico, filename, size=size, duration=round(duration, 3),
+                       avg_speed=round(max(session_bytes, 0) / duration, 1), file_hash=file_hash,
+                       etag=self.etag, last_modified=self.last_modified, mtime=mtime, source=self.source)
+
+    def _conditional_headers(self, save_path):
+        """
+        If-None-Match/If-Modified-Since do último download desta URL nesta
+        pasta, se o arquivo ainda estiver lá com o tamanho registrado; senão,
+        com o content store, do último download da URL (em qualquer pasta)
+        cujo conteúdo está no store. Retorna (cabeçalhos, linha do histórico,
+        veio do store) ou (None, None, False).
+        """
+        # Mesma pasta gravada pelo histórico (dirname do caminho do arquivo)
+        previous = get_last_download(self.url_para_historico, os.path.dirname(os.path.join(save_path, "")))
+        if previous is not None and previous[1]:
+            try:
+                if os.path.getsize(os.path.join(save_path, previous[0])) == previous[1]:
+                    headers = self._validator_headers(previous)
+                    if headers:
+                        return headers, previous, False
+            except OSError:
+                pass
+        if self.content_store is not None:
+            previous = get_last_hashed_download(self.url_para_historico)
+            if previous is not None and self.content_store.lookup(previous[2]) is not None:
+                headers = self._validator_headers(previous)
+                if headers:
+                    return headers, previous, True
+        return None, None, False
+
+    @staticmethod
+    def _validator_headers(previous):
+        _, _, _, etag, last_modified, _ = previous
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers or None
+
+    def _keep_previous(self, previous, probed, save_path, checksum, session):
+        """
+        O servidor respondeu 304. Se a cópia local é a que foi baixada (não foi
+        alterada depois, ou ainda confere com o hash registrado), o download
+        termina aqui e retorna True; senão retorna False para baixar de novo.
+        """
+        filename, size, stored_hash, etag, last_modified, mtime = previous
+        path = os.path.join(save_path, filename)
+        algorithm, digest = stored_hash.split(':', 1) if stored_hash else (None, None)
+        if checksum:
+            # Só vale o hash registrado se for o mesmo pedido agora
+            try:
+                expected = parse_checksum(checksum, filename, session, self.checksum_files)
+            except ValueError:
+                return False # O download normal reporta o erro
+            if algorithm != expected[0] or digest.lower() != expected[1].lower():
+                return False
+        if os.path.getmtime(path) != mtime:
+            # Alterado depois do download (ou histórico sem mtime): só serve se o hash conferir
+            if not algorithm:
+                return False
+            self._callback_status("status_verifying")
+            hasher = hashlib.new(algorithm)
+            with open(path, 'rb') as f:
+                hash_file_range(hasher, f.fileno(), 0, size)
+            if hasher.hexdigest() != digest:
+                return False
+
+        self._callback_status("status_not_modified")
+        self.global_total_size = size
+        self.resumed_bytes = self.global_total_downloaded = size # Nada baixado nesta sessão
+        if algorithm:
+            self.hash_algorithm = algorithm
+            self.file_hash = digest
+        # O 304 pode trazer validadores novos (ETag fraco reemitido, por exemplo)
+        self.etag = probed.headers.get('ETag') or etag
+        self.last_modified = probed.headers.get('Last-Modified') or last_modified
+        self.source = "not_modified"
+        self._complete(path)
+        return True
+
+    def _from_store_by_checksum(self, url, save_path, checksum, session):
+        """O hash pedido já está no content store: materializa sem sondar a URL."""
+        name = os.path.basename(urlparse(url).path)
+        try:
+            algorithm, digest = parse_checksum(checksum, name, session, self.checksum_files)
+        except (ValueError, requests.exceptions.RequestException):
+            return False # O download normal reporta o erro
+        return self._from_store(f"{algorithm}:{digest}", save_path, name)
+
+    def _from_store(self, key, save_path, name):
+        """
+        Cria o arquivo em save_path a partir do objeto `key` do content store
+        (reflink, hardlink ou cópia), sem transferência. Retorna False se o
+        hash não estiver no store.
+        """
+        entry = self.content_store.lookup(key)
+        if entry is None:
+            return False
+        path = os.path.join(save_path, name or entry[1] or "downloaded_file")
+        try:
+            result = self.content_store.materialize(key, path)
+        except OSError as e:
+            print(f"Erro ao criar o arquivo a partir do store: {e}")
+            return False
+        if result is None:
+            return False
+        method, size = result
+        self._callback_status("status_from_store", method=method)
+        self.global_total_size = size
+        self.resumed_bytes = self.global_total_downloaded = size # Nada baixado nesta sessão
+        self.hash_algorithm, self.file_hash = key.lower().split(':', 1)
+        self.source = f"store:{method}"
+        self._complete(path)
+        return True
+
+    def _prepare_delta(self, session, url, filename, validator, num_threads):
+        """
+        Modo delta (core/delta.py): com uma cópia antiga em `filename` e o
+        manifesto de blocos publicado ao lado da URL, copia do disco os blocos
+        que não mudaram para um arquivo novo ao lado do antigo e agenda só o
+        resto para os workers. Retorna (writer, scheduler, journal, manifesto)
+        ou None para baixar o arquivo inteiro.
+        """
+        size = self.global_total_size
+        part = filename + delta.PART_SUFFIX
+        journal = DownloadJournal(part)
+        state = journal.load()
+        if not os.path.isfile(filename) and not state:
+            return None
+        manifest = delta.fetch_manifest(session, url)
+        if manifest is None or manifest["size"] != size:
+            return None
+        if state and validator_matches(state["validator"], validator):
+            # Delta interrompido: o arquivo novo já tem os blocos copiados e parte dos baixados
+            ranges = DownloadJournal.missing_ranges(state)
+            writer = FileWriter(part)
+        else:
+            journal.remove()
+            self._callback_status("status_delta_scan")
+            scan_start = time.perf_counter()
+            try:
+                found = delta.find_blocks(manifest, filename, self.is_active)
+            except (OSError, ValueError) as e:
+                print(f"Erro ao comparar com a cópia local: {e}")
+                return None
+            if self.tracer:
+                self.tracer.span("delta_scan", tracing.MAIN, scan_start, time.perf_counter(),
+                                 blocks=len(manifest["blocks"]), found=len(found or ()))
+            if not found:
+                return None
+            writer = FileWriter(part, size, truncate=True)
+            try:
+                delta.copy_blocks(manifest, found, filename, writer)
+            except Exception:
+                writer.close()
+                raise
+            ranges = delta.missing_ranges(manifest, found)
+        self.resumed_bytes = self.global_total_downloaded = size - sum(end - start + 1 for start, end in ranges)
+        self._callback_status("status_delta", percent=self.resumed_bytes / size * 100)
+        scheduler = SegmentScheduler(size, num_threads, ranges=ranges)
+        return writer, scheduler, journal, manifest
+
+    def _finish_delta(self, part, filename, manifest):
+        """Confere o arquivo montado com o SHA-256 do manifesto e troca a cópia antiga por ele."""
+        digest = self.file_hash if self.hash_algorithm == "sha256" else None
+        if digest is None:
+            self._callback_status("status_verifying")
+            hasher = hashlib.sha256()
+            with open(part, 'rb') as f:
+                hash_file_range(hasher, f.fileno(), 0, manifest["size"])
+            digest = hasher.hexdigest()
+        expected = manifest["sha256"].lower()
+        if digest != expected:
+            DownloadJournal(part).remove()
+            os.remove(part)
+            self.stop_download(error_msg=self.lang.get_string("error_checksum_msg", algorithm="SHA256",
+                                                              expected=expected, actual=digest),
+                               title=self.lang.get_string("error_checksum"))
+            return
+        os.replace(part, filename)
+        self.source = "delta"
+
+    def _export_trace(self, url):
+        """Grava o trace do download em trace_dir (abra em ui.perfetto.dev)."""
+        tracing.bind(None, None)
+        name = os.path.basename(urlparse(url).path) or "download"
+        path = os.path.join(self.trace_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.trace.json")
+        try:
+            self.trace_file = self.tracer.export(path)
+            print(f"Trace do download salvo em {self.trace_file}")
+        except OSError as e:
+            print(f"Erro ao salvar o trace: {e}")
+
+    def _probe_mirrors(self, session, urls, validator):
+        """
+        Sonda cada espelho (ver core/probe.py): só entram os que aceitam Range
+        e têm o mesmo tamanho e validador (ETag/Last-Modified) da URL principal.
+        """
+        accepted = []
+        for mirror_url in urls:
+            if not mirror_url.startswith(('http://', 'https://')):
+                mirror_url = 'https://' + mirror_url.lstrip('/')
+            try:
+                probed = probe(session, mirror_url)
+                mirror_validator = build_validator(probed.headers, probed.size)
+                if not probed.accepts_ranges or not validator_matches(validator, mirror_validator):
+                    print(f"Espelho ignorado (arquivo diferente ou sem Range): {mirror_url}")
+                    continue
+                accepted.append(Mirror(probed.url, if_range_value(mirror_validator)))
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Espelho ignorado ({e}): {mirror_url}")
+        return accepted
+
+    def _verify_checksum(self):
+        """Compara o hash calculado durante o download com o esperado."""
+        algorithm, expected = self.expected_checksum
+        if self.file_hash != expected:
+            self.stop_download(error_msg=self.lang.get_string("error_checksum_msg", algorithm=algorithm.upper(),
+                                                              expected=expected, actual=self.file_hash),
+                               title=self.lang.get_string("error_checksum"))
 
     def stop_download(self, error=None, error_msg=None, title=None, cancelled=False):
         #
@@ -264,6 +979,7 @@ class DownloadLogic:
             self.callbacks["on_set_downloading_state"](False)
         
         if cancelled:
+            self.result = "cancelled"
             self._callback_status("status_cancelled")
             return
 
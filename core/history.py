@@ -0,0 +1,317 @@
+# core/history.py
+import atexit
+import datetime
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from .settings import DB_FILE
+
+BATCH_SIZE = 256 # Inserções gravadas por transação, no máximo
+BATCH_WAIT = 0.05 # Segundos esperando outras inserções antes de gravar o lote
+PAGE_SIZE = 200 # Linhas por página do histórico (page())
+
+HISTORY_COLUMNS = "url, path, filename, timestamp, size, duration, avg_speed, hash, etag, last_modified, mtime, source"
+_INSERT_COLUMNS = HISTORY_COLUMNS + ", host"
+
+# Colunas adicionadas depois da primeira versão da tabela
+_NEW_COLUMNS = (("size", "INTEGER"), ("duration", "REAL"), ("avg_speed", "REAL"), ("hash", "TEXT"),
+                ("host", "TEXT"), ("etag", "TEXT"), ("last_modified", "TEXT"),
+                ("mtime", "REAL"), ("source", "TEXT"))
+
+# Pesos do bm25 para as colunas do índice de texto (url, filename, path):
+# o nome do arquivo pesa mais que a URL, e a pasta menos
+FTS_WEIGHTS = (1.0, 4.0, 0.5)
+
+
+def host_of(url):
+    """Host (sem porta, minúsculo) gravado na coluna indexada `host`."""
+    try:
+        return urlparse(url).hostname or ""
+    except ValueError:
+        return ""
+
+
+def fts_query(text):
+    """
+    Texto digitado -> consulta FTS5: cada palavra vira um prefixo entre aspas
+    (sem operadores do usuário), todas obrigatórias. "" se não houver palavras.
+    """
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", text))
+
+
+class HistoryStore:
+    """
+    Histórico de downloads concluídos em uma única conexão SQLite que fica
+    aberta (modo WAL), em vez de uma conexão por chamada.
+
+    add() só enfileira: uma thread gravadora junta as inserções dos jobs
+    concorrentes e grava cada lote em uma transação. As leituras esperam
+    o lote pendente, então um download recém-terminado já aparece.
+    """
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.conn = None
+        self.lock = threading.Lock() # A conexão é compartilhada entre as threads
+        self.pending = queue.Queue()
+        self.writer = None
+        self.fts = False # SQLite com FTS5 (senão, a busca usa LIKE)
+
+    def open(self):
+        """Abre a conexão e migra o esquema (chamado também por database.init_db)."""
+        with self.lock:
+            if self.conn is None:
+                conn = sqlite3.connect(self.db_file, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL") # Seguro com WAL; só o último lote pode se perder
+                self.fts = self._migrate(conn)
+                self.conn = conn
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_loop, daemon=True)
+                self.writer.start()
+
+    @staticmethod
+    def _migrate(conn):
+        """Cria/atualiza a tabela e os índices; retorna se o índice de texto (FTS5) existe."""
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS downloads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            path TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            size INTEGER,
+            duration REAL,
+            avg_speed REAL,
+            hash TEXT,
+            host TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            mtime REAL,
+            source TEXT
+        )
+        ''')
+        # Bancos criados antes destas colunas
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(downloads)")]
+        for column, definition in _NEW_COLUMNS:
+            if column not in columns:
+                conn.execute(f"ALTER TABLE downloads ADD COLUMN {column} {definition}")
+        if "host" not in columns:
+            conn.executemany("UPDATE downloads SET host = ? WHERE id = ?",
+                             [(host_of(url), row_id) for row_id, url in conn.execute("SELECT id, url FROM downloads")])
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_timestamp ON downloads (timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_url ON downloads (url)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_filename ON downloads (filename)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_host ON downloads (host, timestamp)")
+        fts = HistoryStore._migrate_fts(conn)
+        conn.commit()
+        return fts
+
+    @staticmethod
+    def _migrate_fts(conn):
+        # Índice de texto externo (content=downloads): guarda só os termos, e
+        # os gatilhos o mantêm em dia com as inserções, remoções e alterações
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'downloads_fts'").fetchone()
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS downloads_fts USING fts5("
+                         "url, filename, path, content='downloads', content_rowid='id')")
+        except sqlite3.OperationalError as e:
+            print(f"Busca no histórico sem FTS5 ({e}); usando LIKE")
+            return False
+        conn.executescript('''
+        CREATE TRIGGER IF NOT EXISTS downloads_fts_insert AFTER INSERT ON downloads BEGIN
+            INSERT INTO downloads_fts (rowid, url, filename, path) VALUES (new.id, new.url, new.filename, new.path);
+        END;
+        CREATE TRIGGER IF NOT EXISTS downloads_fts_delete AFTER DELETE ON downloads BEGIN
+            INSERT INTO downloads_fts (downloads_fts, rowid, url, filename, path)
+            VALUES ('delete', old.id, old.url, old.filename, old.path);
+        END;
+        CREATE TRIGGER IF NOT EXISTS downloads_fts_update AFTER UPDATE OF url, filename, path ON downloads BEGIN
+            INSERT INTO downloads_fts (downloads_fts, rowid, url, filename, path)
+            VALUES ('delete', old.id, old.url, old.filename, old.path);
+            INSERT INTO downloads_fts (rowid, url, filename, path) VALUES (new.id, new.url, new.filename, new.path);
+        END;
+        ''')
+        if not exists:
+            # Histórico anterior ao índice
+            conn.execute("INSERT INTO downloads_fts (downloads_fts) VALUES ('rebuild')")
+        return True
+
+    def add(self, url, file_path, size=None, duration=None, avg_speed=None, file_hash=None,
+            etag=None, last_modified=None, mtime=None, source=None):
+        """
+        Enfileira um download concluído; a gravação acontece no próximo lote.
+        `file_hash` vai como 'algoritmo:hex'; `etag` e `last_modified` são os
+        cabeçalhos do servidor e `mtime` a data de modificação do arquivo
+        gravado, para o download condicional (last_download). `source` diz de
+        onde veio o arquivo quando não foi baixado: 'not_modified' (304) ou
+        'store:<meio>' (core/content_store.py).
+        """
+        self.open()
+        # Mesmo formato do CURRENT_TIMESTAMP (UTC), com a hora do término e não a da gravação
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        self.pending.put((url, os.path.dirname(file_path), os.path.basename(file_path), timestamp,
+                          size, duration, avg_speed, file_hash, etag, last_modified, mtime, source, host_of(url)))
+
+    def _write_loop(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + BATCH_WAIT
+            while len(batch) < BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self.pending.get(timeout=timeout) if timeout > 0
+                                 else self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self.pending.task_done()
+
+    def _write(self, batch):
+        try:
+            with self.lock:
+                with self.conn:
+                    self.conn.executemany(f"INSERT INTO downloads ({_INSERT_COLUMNS}) "
+                                          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        except Exception as e:
+            print(f"Erro ao salvar no histórico: {e}")
+
+    def flush(self):
+        """Espera as inserções enfileiradas serem gravadas."""
+        if self.writer is not None:
+            self.pending.join()
+
+    def recent(self, limit=None, offset=0):
+        """
+        Linhas (url, path, filename, timestamp, size, duration, avg_speed, hash,
+        etag, last_modified, mtime, source), das mais recentes para as mais antigas. Sem `limit`, todas.
+        """
+        self.open()
+        self.flush()
+        with self.lock:
+            return self.conn.execute(f"SELECT {HISTORY_COLUMNS} FROM downloads "
+                                     "ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                                     (-1 if limit is None else limit, offset)).fetchall()
+
+    def page(self, before=None, limit=PAGE_SIZE):
+        """
+        Paginação por chave (keyset) no índice de timestamp: as `limit` linhas
+        (id, url, path, ...) mais recentes anteriores a `before`, a chave
+        (timestamp, id) da última linha já carregada. Sem `before`, a primeira
+        página. Ao contrário do OFFSET, o custo não cresce com a página.
+        """
+        self.open()
+        self.flush()
+        select = f"SELECT id, {HISTORY_COLUMNS} FROM downloads "
+        with self.lock:
+            if before is None:
+                return self.conn.execute(select + "ORDER BY timestamp DESC, id DESC LIMIT ?", (limit,)).fetchall()
+            # Duas buscas no índice em vez de (timestamp, id) < (?, ?), que varre
+            # todas as linhas com o mesmo timestamp (históricos importados em lote)
+            timestamp, row_id = before
+            rows = self.conn.execute(select + "WHERE timestamp = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                                     (timestamp, row_id, limit)).fetchall()
+            if len(rows) < limit:
+                rows += self.conn.execute(select + "WHERE timestamp < ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+                                          (timestamp, limit - len(rows))).fetchall()
+            return rows
+
+    def newer(self, after):
+        """Linhas (id, url, path, ...) posteriores à chave `after`, mais recentes primeiro."""
+        self.open()
+        self.flush()
+        with self.lock:
+            return self.conn.execute(f"SELECT id, {HISTORY_COLUMNS} FROM downloads "
+                                     "WHERE (timestamp, id) > (?, ?) "
+                                     "ORDER BY timestamp DESC, id DESC", after).fetchall()
+
+    def last_download(self, url, folder):
+        """
+        O download mais recente de `url` para `folder` (índice de url):
+        (filename, size, hash, etag, last_modified, mtime) ou None.
+        """
+        self.open()
+        self.flush()
+        with self.lock:
+            return self.conn.execute("SELECT filename, size, hash, etag, last_modified, mtime FROM downloads "
+                                     "WHERE url = ? AND path = ? ORDER BY timestamp DESC, id DESC LIMIT 1",
+                                     (url, folder)).fetchone()
+
+    def last_hashed_download(self, url):
+        """Como last_download, mas de qualquer pasta e só downloads com hash registrado."""
+        self.open()
+        self.flush()
+        with self.lock:
+            return self.conn.execute("SELECT filename, size, hash, etag, last_modified, mtime FROM downloads "
+                                     "WHERE url = ? AND hash IS NOT NULL ORDER BY timestamp DESC, id DESC LIMIT 1",
+                                     (url,)).fetchone()
+
+    def search(self, text="", host=None, since=None, until=None, limit=PAGE_SIZE, offset=0):
+        """
+        Busca no histórico: linhas (id, url, path, ...) cujas URL, nome ou pasta
+        contêm palavras começando com as de `text`, ordenadas por relevância
+        (bm25). `host` e o intervalo de datas `since`/`until` ('AAAA-MM-DD',
+        inclusivos) usam os índices de host e timestamp. Sem `text`, só filtra,
+        dos mais recentes para os mais antigos.
+        """
+        self.open()
+        self.flush()
+        filters, args = [], []
+        if host:
+            filters.append("d.host = ?")
+            args.append(host.strip().lower())
+        if since:
+            filters.append("d.timestamp >= ?")
+            args.append(datetime.date.fromisoformat(since).isoformat())
+        if until:
+            filters.append("d.timestamp < ?")
+            args.append((datetime.date.fromisoformat(until) + datetime.timedelta(days=1)).isoformat())
+
+        columns = ", ".join(f"d.{column}" for column in ("id",) + tuple(HISTORY_COLUMNS.split(", ")))
+        query = fts_query(text or "")
+        if query and self.fts:
+            sql = (f"SELECT {columns} FROM downloads_fts JOIN downloads d ON d.id = downloads_fts.rowid "
+                   f"WHERE downloads_fts MATCH ?{''.join(' AND ' + f for f in filters)} "
+                   f"ORDER BY bm25(downloads_fts, {', '.join(map(str, FTS_WEIGHTS))}), d.id DESC LIMIT ? OFFSET ?")
+            args.insert(0, query)
+        else:
+            for term in re.findall(r"\w+", text or ""):
+                filters.append("(d.url LIKE ? OR d.filename LIKE ? OR d.path LIKE ?)")
+                args.extend([f"%{term}%"] * 3)
+            where = f"WHERE {' AND '.join(filters)} " if filters else ""
+            sql = f"SELECT {columns} FROM downloads d {where}ORDER BY d.timestamp DESC, d.id DESC LIMIT ? OFFSET ?"
+        with self.lock:
+            return self.conn.execute(sql, (*args, limit, offset)).fetchall()
+
+    def count(self):
+        self.open()
+        self.flush()
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    def close(self):
+        """Grava o que estiver pendente e fecha a conexão."""
+        self.flush()
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """O HistoryStore do processo (uma conexão para todos os downloads)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+            atexit.register(_store.close) # Não perde o último lote ao sair
+        return _store
@@ -0,0 +1,154 @@
+# core/integrity.py
+import hashlib
+import mmap
+import os
+import re
+import threading
+
+import requests
+
+HASH_LENGTHS = {32: 'md5', 40: 'sha1', 64: 'sha256', 128: 'sha512'}
+CHECKSUM_SUFFIXES = ('.sha256', '.sha512', '.sha1', '.md5')
+HASH_WINDOW = 64 * 1024 * 1024 # Tamanho de cada janela mmap na leitura
+PREFIX_INTERVAL = 0.5 # Segundos entre avanços do hash durante o download segmentado
+HEX_RE = re.compile(r'^[0-9a-fA-F]+$')
+
+
+def _pick_digest(text, filename):
+    """
+    Extrai o hash de um arquivo de checksums (formato do sha256sum ou BSD).
+    Com várias linhas, usa a que cita `filename`; senão, a primeira.
+    """
+    first = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if '=' in line and '(' in line:  # BSD: SHA256 (arquivo) = hex
+            name = line[line.find('(') + 1:line.rfind(')')]
+            digest = line.rsplit('=', 1)[1].strip()
+        else:
+            parts = line.split()
+            digest = parts[0]
+            name = parts[-1].lstrip('*') if len(parts) > 1 else None
+        if filename and name and os.path.basename(name) == filename:
+            return digest
+        if first is None:
+            first = digest
+    return first
+
+
+def parse_checksum(value, filename=None, session=None, cache=None):
+    """
+    Interpreta o checksum esperado informado pelo usuário: 'hex',
+    'algoritmo:hex' ou a URL de um arquivo .sha256/.md5/... Retorna
+    (algoritmo, hex). Lança ValueError se não for um checksum válido.
+    `cache` (dict, opcional) guarda o conteúdo das URLs já baixadas, para
+    consultar o mesmo arquivo de checksums de novo sem outra requisição.
+    """
+    value = (value or '').strip()
+    algorithm = None
+    if value.startswith(('http://', 'https://')):
+        suffix = next((s for s in CHECKSUM_SUFFIXES if value.lower().endswith(s)), None)
+        algorithm = suffix[1:] if suffix else None
+        text = cache.get(value) if cache is not None else None
+        if text is None:
+            response = (session or requests).get(value, timeout=10)
+            response.raise_for_status()
+            text = response.text
+            if cache is not None:
+                cache[value] = text
+        value = _pick_digest(text, filename) or ''
+    elif ':' in value:
+        algorithm, value = value.split(':', 1)
+        algorithm = algorithm.strip().lower().replace('-', '')
+
+    value = value.strip().lower()
+    if not HEX_RE.match(value):
+        raise ValueError(value)
+    algorithm = algorithm or HASH_LENGTHS.get(len(value))
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(value)
+    if hashlib.new(algorithm).digest_size * 2 != len(value):
+        raise ValueError(value)
+    return algorithm, value
+
+
+def hash_file_range(hasher, fd, start, end):
+    """Atualiza `hasher` com os bytes [start, end) do arquivo, lidos via mmap."""
+    granularity = mmap.ALLOCATIONGRANULARITY
+    while start < end:
+        base = start - start % granularity
+        length = min(end - base, HASH_WINDOW)
+        with mmap.mmap(fd, length, access=mmap.ACCESS_READ, offset=base) as mapped:
+            view = memoryview(mapped)
+            try:
+                # hashlib solta o GIL em blocos grandes: os workers continuam baixando
+                hasher.update(view[start - base:])
+            finally:
+                view.release()
+        start = base + length
+
+
+class PrefixHasher:
+    """
+    Calcula o hash do arquivo enquanto o download segmentado acontece.
+
+    SHA-256 e afins não podem ser montados a partir de hashes por segmento,
+    então este thread acompanha o prefixo já completo do arquivo (tudo antes
+    do segmento pendente mais à esquerda) e o lê via mmap logo depois de
+    gravado, ainda no cache de páginas do SO. No fim, `finish()` só precisa
+    cobrir o que faltou, em vez de reler o arquivo inteiro do disco.
+
+    Um segmento lento segura o prefixo: o que terminou depois dele fica para
+    `finish()`, lido em sequência. Hashes por segmento em paralelo não
+    ajudariam, porque o hash esperado é o do arquivo inteiro e o digest só
+    pode ser calculado em ordem.
+    """
+    def __init__(self, algorithm, filename, scheduler):
+        self.algorithm = algorithm
+        self.hasher = hashlib.new(algorithm)
+        self.scheduler = scheduler
+        self.position = 0
+        self.failed = False
+        self.fd = os.open(filename, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _complete_prefix(self):
+        positions = [position for _, end, position in self.scheduler.snapshot() if position <= end]
+        return min(positions) if positions else self.scheduler.total_size
+
+    def _advance(self, end):
+        if end > self.position:
+            hash_file_range(self.hasher, self.fd, self.position, end)
+            self.position = end
+
+    def _loop(self):
+        try:
+            while not self.stop_event.wait(PREFIX_INTERVAL):
+                self._advance(self._complete_prefix())
+        except (OSError, ValueError) as e:
+            # O hash parcial pode ter ficado inconsistente: finish() refaz do início
+            self.failed = True
+            print(f"Erro ao calcular o hash durante o download: {e}")
+
+    def finish(self, total_size):
+        """Espera o thread, cobre o resto do arquivo e retorna o hash (hex)."""
+        self.stop()
+        if self.failed:
+            self.hasher = hashlib.new(self.algorithm)
+            self.position = 0
+        self._advance(total_size)
+        return self.hasher.hexdigest()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def close(self):
+        self.stop()
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,115 @@
+# core/journal.py
+import json
+import os
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_VERSION = 1
+
+
+def build_validator(headers, total_size):
+    """Extrai dos headers HTTP o que identifica a versão do arquivo remoto."""
+    return {
+        "etag": headers.get('ETag'),
+        "last_modified": headers.get('Last-Modified'),
+        "size": total_size,
+    }
+
+
+def if_range_value(validator):
+    """Valor para o header If-Range (ETags fracas não são aceitas pelo HTTP)."""
+    etag = validator.get("etag")
+    if etag and not etag.startswith('W/'):
+        return etag
+    return validator.get("last_modified")
+
+
+def validator_matches(saved, current):
+    """
+    Diz se o arquivo remoto ainda é o mesmo do journal.
+    O tamanho precisa bater sempre; ETag e Last-Modified são comparados
+    apenas quando os dois lados os possuem.
+    """
+    if not saved or saved.get("size") != current.get("size"):
+        return False
+    for key in ("etag", "last_modified"):
+        if saved.get(key) and current.get(key) and saved[key] != current[key]:
+            return False
+    return True
+
+
+class DownloadJournal:
+    """
+    Journal em disco, ao lado do arquivo parcial, com as faixas já gravadas.
+
+    Cada segmento é salvo como [start, end, position]: os bytes de start até
+    position - 1 já estão no arquivo. A gravação é atômica (arquivo temporário
+    + os.replace), então uma queda no meio do save mantém o journal anterior.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.path = filename + JOURNAL_SUFFIX
+
+    def load(self):
+        """Retorna o estado salvo ou None se não houver journal válido."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        except OSError as e:
+            print(f"Erro ao ler o journal: {e}")
+            return None
+
+        if state.get("version") != JOURNAL_VERSION:
+            return None
+        size = state.get("validator", {}).get("size")
+        try:
+            if not os.path.isfile(self.filename) or os.path.getsize(self.filename) != size:
+                return None
+        except OSError:
+            return None
+        return state
+
+    def save(self, url, validator, segments, data_fd=None):
+        """
+        Grava o journal. Se `data_fd` for informado, os dados do arquivo são
+        enviados ao disco (fsync) antes, para que o journal nunca aponte para
+        bytes que ainda não foram persistidos.
+        """
+        state = {
+            "version": JOURNAL_VERSION,
+            "url": url,
+            "validator": validator,
+            "segments": [list(s) for s in segments],
+        }
+        tmp_path = self.path + ".tmp"
+        try:
+            if data_fd is not None:
+                os.fsync(data_fd)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Erro ao salvar o journal: {e}")
+
+    def remove(self):
+        for path in (self.path, self.path + ".tmp"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Erro ao remover o journal: {e}")
+
+    @staticmethod
+    def missing_ranges(state):
+        """Faixas [start, end] que ainda faltam baixar segundo o journal."""
+        return [(position, end) for start, end, position in state["segments"] if position <= end]
+
+    @staticmethod
+    def downloaded_bytes(state):
+        # Faixas fora da lista de segmentos foram concluídas em execuções anteriores
+        missing = sum(end - position + 1 for position, end in DownloadJournal.missing_ranges(state))
+        return state["validator"]["size"] - missing
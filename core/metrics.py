@@ -0,0 +1,312 @@
+# core/metrics.py
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from .connections import host_key
+
+PREFIX = "download_manager"
+DEFAULT_METRICS_PORT = 9464 # Padrão de settings["metrics_port"]
+METRICS_INTERVAL = 15.0 # Segundos entre gravações do arquivo (settings["metrics_interval"])
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+WAIT_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 3600)
+WRITE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+
+class Histogram:
+    """
+    Histograma com buckets fixos. observe() não usa lock: cada worker tem o
+    seu (ver Metrics.write_histogram) ou a chamada já está sob o lock de Metrics.
+    """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # O último é o +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.sum += other.sum
+        self.count += other.count
+
+    def copy(self):
+        clone = Histogram(self.buckets)
+        clone.merge(self)
+        return clone
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value):
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+class _Active:
+    """Um download em andamento, visto pelas amostras da telemetria."""
+    __slots__ = ('host', 'started', 'counted', 'speed', 'write_hists')
+
+    def __init__(self, host):
+        self.host = host
+        self.started = time.time()
+        self.counted = 0 # Bytes desta sessão já somados em bytes_total
+        self.speed = 0.0
+        self.write_hists = []
+
+
+class Metrics:
+    """
+    Contadores e histogramas do gerenciador, no formato texto do Prometheus
+    (render()). Um único objeto por processo, compartilhado pelos motores
+    (create_download_logic(metrics=...)) e pela fila.
+
+    Nada aqui roda no loop de leitura: bytes e vazão vêm das amostras da
+    telemetria, conexões são lidas do ConnectionPool na hora da coleta e a
+    latência de escrita vai para um histograma por worker (só o worker
+    escreve nele), somado na coleta.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bytes = {}     # host -> bytes baixados
+        self.retries = {}   # host -> novas tentativas de segmentos
+        self.downloads = {} # resultado -> downloads terminados
+        self.durations = {} # resultado -> Histogram
+        self.queue_wait = Histogram(WAIT_BUCKETS)
+        self.write_latency = Histogram(WRITE_BUCKETS) # Workers de downloads já terminados
+        self.active = {}    # id(logic) -> _Active
+        self.pools = []     # ConnectionPool dos motores
+        self.queues = []    # DownloadQueue
+
+    # --- Chamado pelos motores e pela fila ---
+
+    def watch_pool(self, pool):
+        with self.lock:
+            if not any(p is pool for p in self.pools):
+                self.pools.append(pool)
+
+    def watch_queue(self, queue):
+        with self.lock:
+            self.queues.append(queue)
+
+    def download_started(self, logic, url):
+        self.watch_pool(logic.connection_pool)
+        with self.lock:
+            self.active[id(logic)] = _Active(host_key(url))
+
+    def sample(self, logic, snapshot):
+        """Amostra da telemetria (thread do sampler): soma os bytes novos e guarda a vazão."""
+        with self.lock:
+            active = self.active.get(id(logic))
+            if active is not None:
+                self._count_bytes(active, snapshot["downloaded"] - logic.resumed_bytes)
+                active.speed = snapshot["speed"]
+
+    def _count_bytes(self, active, session_bytes):
+        # Chamado com self.lock adquirido
+        delta = session_bytes - active.counted
+        if delta > 0:
+            self.bytes[active.host] = self.bytes.get(active.host, 0) + delta
+            active.counted = session_bytes
+
+    def write_histogram(self, logic):
+        """Histograma de latência de escrita de um worker (sem lock no observe)."""
+        histogram = Histogram(WRITE_BUCKETS)
+        with self.lock:
+            active = self.active.get(id(logic))
+            if active is not None:
+                active.write_hists.append(histogram)
+        return histogram
+
+    def retry(self, logic):
+        with self.lock:
+            active = self.active.get(id(logic))
+            host = active.host if active else "desconhecido"
+            self.retries[host] = self.retries.get(host, 0) + 1
+
+    def download_finished(self, logic, result):
+        """result: 'completed', 'failed' ou 'cancelled'."""
+        with self.lock:
+            active = self.active.pop(id(logic), None)
+            if active is None:
+                return
+            self._count_bytes(active, logic.current_downloaded() - logic.resumed_bytes)
+            for histogram in active.write_hists:
+                self.write_latency.merge(histogram)
+            self.downloads[result] = self.downloads.get(result, 0) + 1
+            duration = self.durations.get(result)
+            if duration is None:
+                duration = self.durations[result] = Histogram(DURATION_BUCKETS)
+            duration.observe(time.time() - active.started)
+
+    def queue_waited(self, seconds):
+        with self.lock:
+            self.queue_wait.observe(max(0.0, seconds))
+
+    # --- Exposição ---
+
+    def render(self):
+        """Todas as métricas no formato texto do Prometheus."""
+        with self.lock:
+            bytes_total = dict(self.bytes)
+            retries = dict(self.retries)
+            downloads = dict(self.downloads)
+            durations = {result: h.copy() for result, h in self.durations.items()}
+            queue_wait = self.queue_wait.copy()
+            write_latency = self.write_latency.copy()
+            throughput = {}
+            for active in self.active.values():
+                throughput[active.host] = throughput.get(active.host, 0.0) + active.speed
+                for histogram in active.write_hists:
+                    write_latency.merge(histogram)
+            pools = list(self.pools)
+            queues = list(self.queues)
+
+        connections, opened, reused = {}, {}, {}
+        for pool in pools:
+            for host, in_use in pool.active().items():
+                connections[host] = connections.get(host, 0) + in_use
+            for host, counts in pool.counters()["hosts"].items():
+                opened[host] = opened.get(host, 0) + counts["handshakes"]
+                reused[host] = reused.get(host, 0) + counts["reused"]
+        jobs = {}
+        for queue in queues:
+            for job in queue.list_jobs():
+                jobs[job["state"]] = jobs.get(job["state"], 0) + 1
+
+        lines = []
+        self._series(lines, "bytes_total", "counter", "Bytes baixados, por host.", "host", bytes_total)
+        self._series(lines, "throughput_bytes_per_second", "gauge",
+                     "Vazão atual dos downloads em andamento, por host.", "host", throughput)
+        self._series(lines, "segment_retries_total", "counter",
+                     "Novas tentativas de segmentos após falhas passageiras, por host.", "host", retries)
+        self._series(lines, "active_connections", "gauge", "Conexões baixando segmentos agora, por host.",
+                     "host", connections)
+        self._series(lines, "connections_opened_total", "counter",
+                     "Requisições que abriram conexão nova (TCP/TLS), por host.", "host", opened)
+        self._series(lines, "connections_reused_total", "counter",
+                     "Requisições em conexões keep-alive reaproveitadas, por host.", "host", reused)
+        self._series(lines, "downloads_total", "counter", "Downloads terminados, por resultado.",
+                     "result", downloads)
+        self._series(lines, "queue_jobs", "gauge", "Jobs da fila, por estado.", "state", jobs)
+        self._histogram(lines, "job_duration_seconds", "Duração dos downloads, por resultado.",
+                        {(("result", r),): h for r, h in durations.items()})
+        self._histogram(lines, "queue_wait_seconds", "Tempo dos jobs na fila até começarem.",
+                        {(): queue_wait})
+        self._histogram(lines, "disk_write_seconds", "Latência de cada escrita no arquivo.",
+                        {(): write_latency})
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _series(lines, name, kind, help_text, label, values):
+        name = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in sorted(values.items()):
+            lines.append(f"{name}{_labels(**{label: key})} {_number(value)}")
+
+    @staticmethod
+    def _histogram(lines, name, help_text, histograms):
+        name = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in sorted(histograms.items()):
+            labels = dict(labels)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(**labels, le=_number(bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(**labels)} {_number(histogram.sum)}")
+            lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if urlparse(self.path).path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer:
+    """GET http://127.0.0.1:<port>/metrics para o Prometheus coletar."""
+    def __init__(self, metrics, port=DEFAULT_METRICS_PORT):
+        self.metrics = metrics
+        self.port = port
+        self.httpd = None
+
+    def start(self):
+        """Lança OSError se a porta estiver em uso."""
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", self.port), _MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.metrics = self.metrics
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+class MetricsFile:
+    """
+    Grava render() em `path` a cada `interval` segundos (troca atômica do
+    arquivo), para o textfile collector do node_exporter ou scripts.
+    """
+    def __init__(self, metrics, path, interval=METRICS_INTERVAL):
+        self.metrics = metrics
+        self.path = path
+        self.interval = max(1.0, float(interval))
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.write()
+
+    def write(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(self.metrics.render())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Erro ao gravar as métricas em {self.path}: {e}")
+
+    def stop(self):
+        """Para a gravação periódica e grava uma última vez."""
+        self.stop_event.set()
+        self.write()
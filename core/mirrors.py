@@ -0,0 +1,98 @@
+# core/mirrors.py
+import threading
+
+MIRROR_MAX_FAILURES = 2  # Falhas seguidas antes de abandonar um espelho
+MIRROR_SLOW_FACTOR = 0.2 # Abaixo desta fração da vazão do melhor espelho, o espelho é abandonado
+MIRROR_EWMA_ALPHA = 0.5
+MIRROR_MIN_SAMPLE = 256 * 1024 # Transferências menores (sobras de roubo) não medem vazão
+
+
+class MirrorFailed(Exception):
+    """Uma requisição a um espelho falhou, mas ainda há outros espelhos vivos."""
+
+
+class Mirror:
+    """Uma URL que serve o mesmo arquivo (mesmo tamanho e validador)."""
+    __slots__ = ("url", "if_range", "rate", "served", "failures", "alive", "bytes")
+
+    def __init__(self, url, if_range=None):
+        self.url = url
+        self.if_range = if_range
+        self.rate = None # Vazão por conexão (bytes/s, EWMA); None até a primeira medição
+        self.served = 0 # Segmentos entregues a este espelho
+        self.failures = 0
+        self.alive = True
+        self.bytes = 0
+
+    def __repr__(self):
+        return f"Mirror({self.url}, rate={self.rate}, alive={self.alive})"
+
+
+class MirrorSet:
+    """
+    Distribui as requisições de segmentos entre os espelhos na proporção da
+    vazão medida de cada um (o espelho com menor `servidos / vazão` recebe o
+    próximo segmento). Espelhos ainda não medidos recebem o peso do melhor,
+    para serem testados logo.
+
+    Um espelho que falha MIRROR_MAX_FAILURES vezes seguidas, ou fica muito
+    mais lento que o melhor, deixa de receber segmentos. Os bytes que ele já
+    gravou continuam valendo: o resto do segmento volta para o scheduler.
+    Com um único espelho, o comportamento é o de sempre.
+    """
+    def __init__(self, mirrors):
+        self.mirrors = list(mirrors)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.mirrors)
+
+    def alive(self):
+        with self.lock:
+            return [m for m in self.mirrors if m.alive]
+
+    def _weight(self, mirror, best):
+        return mirror.rate if mirror.rate else (best or 1.0)
+
+    def pick(self):
+        """Espelho para o próximo segmento, ou None se todos foram abandonados."""
+        with self.lock:
+            alive = [m for m in self.mirrors if m.alive]
+            if not alive:
+                return None
+            best = max((m.rate or 0 for m in alive), default=0)
+            mirror = min(alive, key=lambda m: (m.served + 1) / self._weight(m, best))
+            mirror.served += 1
+            return mirror
+
+    def can_fail_over(self, mirror):
+        """True se, sem este espelho, ainda sobra algum outro."""
+        with self.lock:
+            return any(m.alive and m is not mirror for m in self.mirrors)
+
+    def failed(self, mirror, error):
+        with self.lock:
+            mirror.failures += 1
+            if mirror.failures >= MIRROR_MAX_FAILURES and mirror.alive:
+                mirror.alive = False
+                print(f"Espelho abandonado após falhas ({error}): {mirror.url}")
+
+    def record(self, mirror, nbytes, seconds):
+        """Registra uma transferência concluída (uma por segmento, não por bloco)."""
+        with self.lock:
+            mirror.failures = 0
+            mirror.bytes += nbytes
+            if nbytes < MIRROR_MIN_SAMPLE or seconds <= 0:
+                return
+            rate = nbytes / seconds
+            if mirror.rate is None:
+                mirror.rate = rate
+            else:
+                mirror.rate += MIRROR_EWMA_ALPHA * (rate - mirror.rate)
+
+            measured = [m for m in self.mirrors if m.alive and m.rate]
+            best = max((m.rate for m in measured), default=0)
+            for m in measured:
+                if m.rate < best * MIRROR_SLOW_FACTOR:
+                    m.alive = False
+                    print(f"Espelho abandonado por lentidão: {m.url}")
@@ -0,0 +1,148 @@
+# core/probe.py
+import re
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from . import database
+
+CAPABILITY_TTL = 24 * 3600 # Segundos até um host (ou redirecionamento) ser sondado de novo
+PROBE_TIMEOUT = 10
+CONTENT_RANGE_RE = re.compile(r'bytes\s+\d+-\d+/(\d+|\*)')
+
+
+class ProbeResult:
+    """O que a sondagem descobriu sobre uma URL."""
+    __slots__ = ("url", "size", "accepts_ranges", "headers", "max_connections", "not_modified")
+
+    def __init__(self, url, size, accepts_ranges, headers, max_connections=None, not_modified=False):
+        self.url = url # URL final, depois dos redirecionamentos
+        self.size = size # 0 se desconhecido
+        self.accepts_ranges = accepts_ranges
+        self.headers = headers # Para build_validator (ETag, Last-Modified)
+        self.max_connections = max_connections # Limite que o host tolerou, se conhecido
+        self.not_modified = not_modified # 304 para a sondagem condicional: nada mudou no servidor
+
+
+def host_of(url):
+    return urlparse(url).netloc.rsplit('@', 1)[-1].lower()
+
+
+def _ranged_get(session, url, conditional=None):
+    """
+    GET com Range: bytes=0-0. Serve para servidores que recusam HEAD, omitem
+    Accept-Ranges ou o Content-Length no HEAD: um 206 com Content-Range
+    confirma o suporte a Range e informa o tamanho total.
+    """
+    headers = {'Range': 'bytes=0-0', 'Accept-Encoding': 'identity', **(conditional or {})}
+    with session.get(url, headers=headers, stream=True, allow_redirects=True,
+                     timeout=PROBE_TIMEOUT) as response:
+        response.raise_for_status()
+        if response.status_code == 304:
+            return ProbeResult(response.url, 0, False, response.headers, not_modified=True)
+        if response.status_code == 206:
+            match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+            size = int(match.group(1)) if match and match.group(1) != '*' else 0
+            response.content # 1 byte: a conexão volta para o pool
+            return ProbeResult(response.url, size, size > 0, response.headers)
+        # 200: o servidor ignorou o Range (o corpo não é lido; a conexão é descartada)
+        size = int(response.headers.get('content-length', 0))
+        return ProbeResult(response.url, size, False, response.headers)
+
+
+def _probe(session, url, head_ok, conditional=None, no_ranges=False):
+    """
+    HEAD (se o host costuma responder direito a ele) e, se faltar algo, o GET
+    com Range. Com `no_ranges` (o cache diz que o host não aceita Range), um
+    HEAD com o tamanho basta: o GET só confirmaria o que já se sabe.
+    """
+    head_size = 0
+    if head_ok:
+        try:
+            response = session.head(url, headers=conditional, allow_redirects=True, timeout=PROBE_TIMEOUT)
+            if response.status_code == 304:
+                return ProbeResult(response.url, 0, False, response.headers, not_modified=True), True
+            if response.ok:
+                size = int(response.headers.get('content-length', 0))
+                if size > 0 and response.headers.get('Accept-Ranges') == 'bytes':
+                    return ProbeResult(response.url, size, True, response.headers), True
+                if size > 0 and no_ranges:
+                    return ProbeResult(response.url, size, False, response.headers), True
+                head_size = size
+                url = response.url
+        except requests.exceptions.ConnectionError:
+            raise # Host inacessível: o GET também falharia
+        except requests.exceptions.RequestException as e:
+            print(f"HEAD falhou ({e}), sondando com GET: {url}")
+    result = _ranged_get(session, url, conditional)
+    # O GET confirmou o que o HEAD disse (tamanho, sem Range): o HEAD serve para este host
+    return result, head_size > 0 and not result.accepts_ranges and result.size == head_size
+
+
+def probe(session, url, conditional=None):
+    """
+    Descobre a URL final, o tamanho e o suporte a Range de `url`.
+
+    O resultado fica em cache no SQLite por host (suporte a Range, se o HEAD
+    basta e o máximo de conexões tolerado) e por URL (o destino do
+    redirecionamento), por CAPABILITY_TTL segundos. O host é o da URL final,
+    onde as capacidades foram medidas: um redirecionador (espelhos, CDN) não
+    herda as do destino. Com o cache, as próximas
+    sondagens vão direto ao destino final, pulam o HEAD nos hosts em que ele
+    não serve e, nos hosts sem suporte a Range, dispensam o GET de
+    confirmação depois do HEAD. Lança requests.RequestException se a URL não
+    responder.
+
+    `conditional` (If-None-Match/If-Modified-Since) torna a sondagem um
+    pedido condicional: se o servidor responder 304, o resultado vem com
+    not_modified=True e sem tamanho, na mesma ida e volta.
+    """
+    now = time.time()
+    not_before = now - CAPABILITY_TTL
+    result = None
+    target = database.get_redirect(url, not_before)
+    if target:
+        host, cached, head_ok, no_ranges = _cached_capabilities(target, not_before)
+        try:
+            result, head_ok = _probe(session, target, head_ok, conditional, no_ranges)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # Destino antigo (ou URL assinada que expirou): sonda a URL original
+            print(f"Redirecionamento em cache falhou ({e}): {target}")
+            result = None
+    if result is None:
+        host, cached, head_ok, no_ranges = _cached_capabilities(url, not_before)
+        result, head_ok = _probe(session, url, head_ok, conditional, no_ranges)
+    if result.not_modified:
+        # Um 304 não diz nada sobre o suporte a Range: o cache fica como está
+        return result
+
+    final_host = host_of(result.url)
+    if final_host != host:
+        # O redirecionamento mudou de host: o cache usado na sondagem era de outro
+        cached = database.get_host_capabilities(final_host, not_before)
+        no_ranges = False
+    if not (no_ranges and not result.accepts_ranges):
+        # Resultado vindo do cache não renova a data: o host é sondado de novo quando expirar
+        database.save_host_capabilities(final_host, result.accepts_ranges, head_ok, now)
+    database.save_redirect(url, result.url, now)
+    if cached:
+        result.max_connections = cached[2]
+    return result
+
+
+def _cached_capabilities(url, not_before):
+    """(host, linha do cache ou None, head_ok, no_ranges) para sondar `url`."""
+    host = host_of(url)
+    cached = database.get_host_capabilities(host, not_before)
+    head_ok = cached[1] if cached else True
+    no_ranges = bool(cached) and not cached[0]
+    return host, cached, head_ok, no_ranges
+
+
+def remember_max_connections(url, max_connections):
+    """
+    Guarda quantas conexões o host de `url` aguentou antes de limitar (429/503).
+    Passe a URL final (ProbeResult.url), a mesma chave usada por probe().
+    """
+    database.save_host_max_connections(host_of(url), max_connections, time.time())
@@ -0,0 +1,88 @@
+# core/retry.py
+import http.client
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+import urllib3
+
+from .adaptive import ServerThrottled
+
+RETRY_ATTEMPTS = 5        # Falhas seguidas de um worker antes de ele desistir
+RETRY_BASE_DELAY = 1.0    # Segundos antes da primeira nova tentativa (dobra a cada falha)
+RETRY_MAX_DELAY = 60.0    # Teto da espera (também para o Retry-After do servidor)
+RETRY_STATUS = (408, 425, 429, 500, 502, 503, 504) # Respostas que valem nova tentativa
+
+
+class SegmentFailed(Exception):
+    """Um segmento falhou; `error` é a causa original (ver is_retryable)."""
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+class HTTPStatusError(Exception):
+    """Resposta HTTP de erro no motor asyncio (o equivalente ao HTTPError do requests)."""
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"Erro HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Segundos do header Retry-After (número ou data HTTP), ou None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_of(error):
+    if isinstance(error, (ServerThrottled, HTTPStatusError)):
+        return error.status
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code
+    return None
+
+
+def retry_after_of(error):
+    if isinstance(error, (ServerThrottled, HTTPStatusError)):
+        return error.retry_after
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return parse_retry_after(error.response.headers.get('Retry-After'))
+    return None
+
+
+def is_retryable(error):
+    """
+    Verdadeiro para falhas passageiras da rede ou do servidor (conexão
+    resetada, timeout, 5xx, 429...). Erros de disco, HTTP 4xx e arquivo
+    alterado no servidor (Range ignorado) não se resolvem tentando de novo.
+    """
+    status = _status_of(error)
+    if status is not None or isinstance(error, (ServerThrottled, requests.exceptions.HTTPError)):
+        return status in RETRY_STATUS
+    if isinstance(error, (ConnectionError, TimeoutError, http.client.HTTPException,
+                          requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError,
+                          urllib3.exceptions.ProtocolError, urllib3.exceptions.TimeoutError)):
+        return True
+    return False
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Espera antes da tentativa número `attempt` (1, 2, ...): o Retry-After do
+    servidor, se houver, ou um backoff exponencial com jitter (metade fixa,
+    metade aleatória), para que os workers não voltem todos juntos.
+    """
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY)
+    ceiling = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
@@ -0,0 +1,114 @@
+# core/segments.py
+import threading
+
+# Faixas menores que isto não são mais divididas (não compensa abrir outra conexão)
+MIN_SPLIT_SIZE = 1024 * 1024
+
+
+class Segment:
+    """Faixa de bytes [start, end] (inclusiva) baixada por um único worker."""
+    __slots__ = ("id", "start", "end", "position")
+
+    def __init__(self, seg_id, start, end):
+        self.id = seg_id
+        self.start = start
+        self.end = end
+        self.position = start # Próximo byte a ser gravado
+
+    @property
+    def remaining(self):
+        return max(0, self.end - self.position + 1)
+
+    def __repr__(self):
+        return f"Segment({self.id}, {self.start}-{self.end}, pos={self.position})"
+
+
+class SegmentScheduler:
+    """
+    Distribui as faixas do arquivo entre os workers (work stealing).
+
+    O arquivo começa dividido em `num_segments` faixas iguais. Quando um worker
+    termina a sua e não há mais faixas pendentes, ele "rouba" a metade final
+    da maior faixa ainda em andamento. Assim nenhuma conexão fica ociosa
+    enquanto outra (mais lenta) ainda tem muito a baixar.
+
+    O dono de um segmento lê `segment.end` a cada bloco e para ao alcançá-lo;
+    se um roubo acontecer enquanto ele grava, no pior caso alguns bytes são
+    gravados duas vezes com o mesmo conteúdo, o que é inofensivo.
+    """
+    def __init__(self, total_size, num_segments, min_split=MIN_SPLIT_SIZE, ranges=None):
+        self.total_size = total_size
+        self.min_split = min_split
+        self.lock = threading.Lock()
+        self.pending = []
+        self.active = {}
+        self.done = []
+        self._next_id = 0
+
+        if ranges is not None:
+            # Retomada: apenas as faixas que faltam; o roubo equilibra o resto
+            for start, end in ranges:
+                self.pending.append(self._new_segment(start, end))
+            return
+
+        num_segments = max(1, min(num_segments, total_size // max(1, min_split) or 1))
+        chunk_size = total_size // num_segments
+        for i in range(num_segments):
+            start = i * chunk_size
+            end = start + chunk_size - 1 if i < num_segments - 1 else total_size - 1
+            self.pending.append(self._new_segment(start, end))
+
+    def _new_segment(self, start, end):
+        segment = Segment(self._next_id, start, end)
+        self._next_id += 1
+        return segment
+
+    def next_segment(self):
+        """Retorna o próximo segmento a baixar, ou None se não há mais trabalho."""
+        with self.lock:
+            if self.pending:
+                segment = self.pending.pop(0)
+                self.active[segment.id] = segment
+                return segment
+            return self._steal()
+
+    def _steal(self):
+        # Chamado com self.lock adquirido
+        if not self.active:
+            return None
+        victim = max(self.active.values(), key=lambda s: s.remaining)
+        remaining = victim.remaining
+        if remaining < 2 * self.min_split:
+            return None
+
+        split_at = victim.position + remaining // 2
+        segment = self._new_segment(split_at, victim.end)
+        victim.end = split_at - 1
+        self.active[segment.id] = segment
+        return segment
+
+    def finish(self, segment):
+        """Marca o segmento como concluído (ou abandonado pelo worker)."""
+        with self.lock:
+            if self.active.pop(segment.id, None) is not None:
+                self.done.append(segment)
+
+    def release(self, segment):
+        """Devolve o que falta de um segmento à fila (o worker parou antes do fim)."""
+        with self.lock:
+            if self.active.pop(segment.id, None) is None:
+                return
+            if segment.position <= segment.end:
+                self.pending.append(segment)
+            else:
+                self.done.append(segment)
+
+    def snapshot(self):
+        """Lista de (start, end, position) de todos os segmentos, para o journal."""
+        with self.lock:
+            segments = self.done + self.pending + list(self.active.values())
+            return [(s.start, s.end, s.position) for s in segments]
+
+    def is_complete(self):
+        with self.lock:
+            return not self.pending and not self.active
@@ -9,11 +9,30 @@ APP_VERSION = "v1.5"
 DEFAULT_SETTINGS = {
     "thread_mode": "Automático",
     "custom_threads": 16,
+    "adaptive_max_threads": 32,
     "auto_level": "Alto",
     "language": "pt_BR",
     "theme": "Sistema",
     "start_with_windows": False,
-    "start_with_windows_minimized": False
+    "start_with_windows_minimized": False,
+    "max_active_jobs": 3,
+    "max_connections": 32,
+    "engine": "threads",
+    "async_max_concurrency": 64,
+    "telemetry_interval": 0.5,
+    "max_speed_kbps": 0,
+    "max_connections_per_host": 0,
+    "control_server": False,
+    "control_port": 8799,
+    "control_token": "",
+    "trace_downloads": False,
+    "metrics_server": False,
+    "metrics_port": 9464,
+    "metrics_file": "",
+    "metrics_interval": 15,
+    "content_store": False,
+    "content_store_max_mb": 10240,
+    "delta_updates": False
 }
 
 def get_app_data_path():
@@ -0,0 +1,79 @@
+# core/storage.py
+import os
+import threading
+
+MIN_READ_SIZE = 64 * 1024
+MAX_READ_SIZE = 4 * 1024 * 1024
+READ_TARGET_SECONDS = 0.05 # Cada leitura deve cobrir ~50 ms de dados na vazão atual
+
+
+def read_size_for(speed_bps):
+    """Tamanho de leitura (potência de 2) adequado à vazão de um worker."""
+    size = MIN_READ_SIZE
+    while size < MAX_READ_SIZE and size < speed_bps * READ_TARGET_SECONDS:
+        size *= 2
+    return size
+
+
+def preallocate(fd, size):
+    """
+    Reserva espaço real em disco para o arquivo inteiro (não um arquivo esparso),
+    evitando fragmentação e erros de disco cheio no meio do download.
+    """
+    if size <= 0:
+        return
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError as e:
+            # Sistemas de arquivos sem suporte (ex.: alguns montados via rede)
+            print(f"Aviso: fallocate indisponível ({e}), usando ftruncate")
+    # No Windows, estender o arquivo (SetEndOfFile) já aloca os clusters no NTFS
+    if os.fstat(fd).st_size < size:
+        os.ftruncate(fd, size)
+
+
+class FileWriter:
+    """
+    Um único descritor por download, compartilhado por todos os workers.
+    As escritas são posicionais (os.pwrite), sem seek e sem buffer do Python,
+    então o journal só registra bytes que já chegaram ao SO.
+    """
+    def __init__(self, filename, size=0, truncate=False):
+        self.filename = filename
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        if truncate:
+            flags |= os.O_TRUNC
+        self.fd = os.open(filename, flags, 0o644)
+        # Sem pwrite (Windows), seek + write no descritor compartilhado precisa de lock
+        self.seek_lock = None if hasattr(os, 'pwrite') else threading.Lock()
+        if truncate:
+            preallocate(self.fd, size)
+
+    def fileno(self):
+        return self.fd
+
+    def write_at(self, data, offset):
+        """Grava `data` (bytes, bytearray ou memoryview) a partir de `offset`."""
+        view = memoryview(data)
+        while view:
+            if self.seek_lock is None:
+                written = os.pwrite(self.fd, view, offset)
+            else:
+                with self.seek_lock:
+                    os.lseek(self.fd, offset, os.SEEK_SET)
+                    written = os.write(self.fd, view)
+            view = view[written:]
+            offset += written
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
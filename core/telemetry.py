@@ -0,0 +1,141 @@
+# core/telemetry.py
+import threading
+import time
+
+from .utils import format_speed
+from .storage import read_size_for
+
+TELEMETRY_INTERVAL = 0.5 # Segundos entre amostras (padrão de "telemetry_interval")
+EWMA_ALPHA = 0.3         # Peso da amostra nova na média móvel da velocidade
+
+
+class RateMeter:
+    """Velocidade suavizada (média móvel exponencial) de um contador crescente."""
+    __slots__ = ('alpha', 'last_value', 'last_time', 'rate')
+
+    def __init__(self, alpha=EWMA_ALPHA):
+        self.alpha = alpha
+        self.last_value = None
+        self.last_time = None
+        self.rate = None
+
+    def update(self, value, now):
+        if self.last_time is not None and now > self.last_time:
+            instant = max(0, value - self.last_value) / (now - self.last_time)
+            if self.rate is None:
+                self.rate = instant # A primeira medição não é suavizada
+            else:
+                self.rate += self.alpha * (instant - self.rate)
+        self.last_value, self.last_time = value, now
+        return self.rate or 0.0
+
+
+class _Source:
+    __slots__ = ('logic', 'on_snapshot', 'meter', 'segment_meters')
+
+    def __init__(self, logic, on_snapshot, alpha):
+        self.logic = logic
+        self.on_snapshot = on_snapshot
+        self.meter = RateMeter(alpha)
+        self.segment_meters = {} # thread_id -> RateMeter (limitado ao número de workers)
+
+
+class Telemetry:
+    """
+    Um único thread de amostragem por motor (ou por fila): a cada `interval`
+    segundos lê os contadores dos downloads registrados com `track()` e entrega
+    um snapshot a cada um. Os workers nunca são bloqueados; o sampler guarda só
+    a última amostra e a média de cada download/worker, então a memória não
+    cresce com a duração do download.
+
+    Snapshot entregue a `on_snapshot`:
+        downloaded, total, progress (%), speed (bytes/s, EWMA), speed_str,
+        eta (segundos ou None), segments {thread_id: {start, end, downloaded,
+        total_size, speed}} e connections (ConnectionPool.counters() do motor).
+    """
+    def __init__(self, interval=TELEMETRY_INTERVAL, alpha=EWMA_ALPHA):
+        self.interval = max(0.05, float(interval))
+        self.alpha = alpha
+        self.cond = threading.Condition()
+        self.sources = {}
+        self.thread = None
+
+    def track(self, key, logic, on_snapshot):
+        """Começa a amostrar `logic` (um DownloadLogic ativo). Chamadas repetidas são ignoradas."""
+        with self.cond:
+            if key in self.sources:
+                return
+            self.sources[key] = _Source(logic, on_snapshot, self.alpha)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def untrack(self, key):
+        with self.cond:
+            self.sources.pop(key, None)
+
+    def set_interval(self, interval):
+        with self.cond:
+            self.interval = max(0.05, float(interval))
+            self.cond.notify()
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.sources:
+                    self.cond.wait()
+                self.cond.wait(self.interval)
+                # Downloads que terminaram sem chamar untrack() saem sozinhos
+                for key in [k for k, s in self.sources.items() if not s.logic.download_active]:
+                    del self.sources[key]
+                sources = list(self.sources.values())
+
+            now = time.time()
+            for source in sources:
+                try:
+                    source.on_snapshot(self.sample(source, now))
+                except Exception as e:
+                    print(f"Erro na telemetria: {e}")
+
+    @staticmethod
+    def sample(source, now):
+        logic = source.logic
+        segments = {}
+        for thread_id, stats in list(logic.thread_stats.items()):
+            downloaded = stats['downloaded']
+            segment = stats['segment']
+            meter = source.segment_meters.get(thread_id)
+            if meter is None:
+                meter = source.segment_meters[thread_id] = RateMeter(source.meter.alpha)
+            speed = meter.update(downloaded, now)
+            # O sampler é o único escritor destes campos (lidos pelo monitor de threads)
+            if segment is not None:
+                stats['total_size'] = downloaded + segment.remaining
+            stats['speed_str'] = format_speed(speed)
+            stats['read_size'] = read_size_for(speed)
+            segments[thread_id] = {
+                "start": segment.start if segment else None,
+                "end": segment.end if segment else None,
+                "downloaded": downloaded,
+                "total_size": stats['total_size'],
+                "speed": speed,
+            }
+
+        downloaded = logic.current_downloaded()
+        total = logic.global_total_size
+        # Bytes retomados do journal não contam como velocidade desta sessão
+        speed = source.meter.update(downloaded - logic.resumed_bytes, now)
+        eta = None
+        if total > 0 and speed > 0:
+            eta = max(0, total - downloaded) / speed
+        return {
+            "downloaded": downloaded,
+            "total": total,
+            "progress": (downloaded / total) * 100 if total > 0 else 0,
+            "speed": speed,
+            "speed_str": format_speed(speed),
+            "eta": eta,
+            "segments": segments,
+            "connections": logic.connection_pool.counters(),
+        }
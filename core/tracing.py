@@ -0,0 +1,138 @@
+# core/tracing.py
+import json
+import os
+import threading
+import time
+
+TRACE_STALL = 0.2       # Leituras que bloqueiam mais que isto (s) viram um evento "stall"
+TRACE_SLOW_WRITE = 0.005 # Escritas mais lentas que isto (s) viram um evento "write"
+MAIN = -1               # Linha do tempo do próprio download (sondagem, journal...)
+
+_local = threading.local()
+
+
+def bind(tracer, worker):
+    """Associa a thread atual a um worker do trace (lido pelas conexões em core/connections.py)."""
+    _local.current = (tracer, worker) if tracer is not None else None
+
+
+def current():
+    """(tracer, worker) da thread atual, ou None se ela não está sendo rastreada."""
+    return getattr(_local, 'current', None)
+
+
+class Tracer:
+    """
+    Linha do tempo de um download, por worker: requisição, cabeçalhos, primeiro
+    byte, conexão (DNS, TCP, TLS), travadas da leitura, escritas lentas e novas
+    tentativas. Exporta no formato Chrome trace (JSON), aberto no Perfetto
+    (ui.perfetto.dev) ou em chrome://tracing.
+
+    Os eventos só são guardados em memória (um append por evento, sem lock) e
+    o motor só chama o tracer se `logic.tracer` existir: desligado, o custo
+    no loop de leitura é um teste de None por bloco.
+    """
+    def __init__(self, name="download"):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.events = [] # (fase, nome, worker, início, duração, args)
+
+    now = staticmethod(time.perf_counter)
+
+    def span(self, name, worker, start, end, /, **args):
+        """Intervalo [start, end] (valores de now()) na linha do worker."""
+        self.events.append(("X", name, worker, start, end - start, args))
+
+    def instant(self, name, worker, **args):
+        self.events.append(("i", name, worker, time.perf_counter(), 0, args))
+
+    def to_chrome(self):
+        pid = os.getpid()
+        workers = sorted({event[2] for event in self.events})
+        trace = [{"ph": "M", "name": "process_name", "pid": pid, "args": {"name": self.name}}]
+        for worker in workers:
+            label = "download" if worker == MAIN else f"worker {worker}"
+            trace.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": worker + 1,
+                          "args": {"name": label}})
+        for phase, name, worker, start, duration, args in list(self.events):
+            event = {"ph": phase, "name": name, "pid": pid, "tid": worker + 1,
+                     "ts": round((start - self.origin) * 1e6, 1), "args": args}
+            if phase == "X":
+                event["dur"] = round(duration * 1e6, 1)
+            else:
+                event["s"] = "t"
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms",
+                "otherData": {"started_at": time.strftime("%Y-%m-%d %H:%M:%S",
+                                                          time.localtime(self.started_at))}}
+
+    def export(self, path):
+        """Grava o trace em `path` (cria a pasta se preciso) e retorna o caminho."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome(), f)
+        return path
+
+
+class SegmentTrace:
+    """
+    Medições de uma requisição de segmento, feitas pelo loop de leitura
+    do motor. Só é criado com o trace ligado.
+    """
+    __slots__ = ('tracer', 'worker', 'segment', 'args', 'begin', 'mark', 'first_byte',
+                 'start_position', 'writes', 'write_time', 'max_write', 'stalls')
+
+    def __init__(self, tracer, worker, segment, **args):
+        self.tracer = tracer
+        self.worker = worker
+        self.segment = segment
+        self.args = args
+        self.begin = self.mark = tracer.now()
+        self.first_byte = None
+        self.start_position = segment.position
+        self.writes = 0
+        self.write_time = 0.0
+        self.max_write = 0.0
+        self.stalls = 0
+
+    def span(self, name, start, end, /, **args):
+        self.tracer.span(name, self.worker, start, end, **args)
+
+    def headers(self, status):
+        """Cabeçalhos da resposta recebidos (inclui a abertura da conexão, se houve)."""
+        now = self.tracer.now()
+        self.span("request", self.begin, now, status=status, range_start=self.segment.position)
+        self.mark = now
+
+    def before_read(self):
+        self.mark = self.tracer.now()
+
+    def after_read(self):
+        now = self.tracer.now()
+        if self.first_byte is None:
+            self.first_byte = now
+            self.tracer.instant("first_byte", self.worker, ttfb_ms=round((now - self.begin) * 1000, 2))
+        elif now - self.mark > TRACE_STALL:
+            self.stalls += 1
+            self.span("stall", self.mark, now)
+        self.mark = now
+
+    def after_write(self):
+        now = self.tracer.now()
+        elapsed = now - self.mark
+        self.writes += 1
+        self.write_time += elapsed
+        if elapsed > self.max_write:
+            self.max_write = elapsed
+        if elapsed > TRACE_SLOW_WRITE:
+            self.span("write", self.mark, now)
+
+    def finish(self, error=None):
+        args = dict(self.args, start=self.start_position, end=self.segment.end,
+                    bytes=self.segment.position - self.start_position, writes=self.writes,
+                    write_ms=round(self.write_time * 1000, 2),
+                    max_write_ms=round(self.max_write * 1000, 2), stalls=self.stalls)
+        if error is not None:
+            args["error"] = str(error)
+        self.span("segment", self.begin, self.tracer.now(), **args)
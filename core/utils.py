@@ -21,4 +21,11 @@ def open_folder_in_explorer(folder_path):
         return True
     except Exception as e:
         print(f"Erro ao abrir pasta: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def format_speed(speed_bps):
+    """Formata uma velocidade em bytes/s como 'x.xx MB/s' ou 'x.xx KB/s'."""
+    speed_MBps = speed_bps / 1024 / 1024
+    if speed_MBps >= 1:
+        return f"{speed_MBps:.2f} MB/s"
+    return f"{speed_bps / 1024:.2f} KB/s"
\ No newline at end of file
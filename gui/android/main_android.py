@@ -3,10 +3,12 @@
 
 import os
 import sys
+import threading
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
+from kivy.uix.textinput import TextInput
 from kivy.clock import mainthread # Para atualizar a GUI a partir de threads
 
 # Adiciona o diretório raiz ao sys.path para encontrar a pasta 'core'
@@ -16,7 +18,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 from core.settings import load_settings
 from core.database import init_db
 from core.i18n import LanguageManager
-from core.downloader import DownloadLogic
+from core.downloader import create_download_logic
+from core.download_queue import DownloadQueue
+from core.control_server import ControlServer
 
 class AndroidDownloaderGUI(BoxLayout):
     def __init__(self, **kwargs):
@@ -35,14 +39,48 @@ class AndroidDownloaderGUI(BoxLayout):
             "on_set_downloading_state": self.set_download_button_state
         }
         
-        self.downloader = DownloadLogic(self.lang, callbacks)
+        self.downloader = create_download_logic(self.lang, callbacks, self.settings)
+        
+        # Fila compartilha o mesmo limite de conexões do download direto
+        self.jobs = {}
+        self.queue = DownloadQueue(self.lang, {"on_job_update": self.on_job_update},
+                                   max_active_jobs=self.settings['max_active_jobs'],
+                                   max_connections=self.settings['max_connections'],
+                                   settings=self.settings)
+        self.downloader.connection_budget = self.queue.budget
+        self.downloader.limiter.parent = self.queue.bandwidth
+        self.downloader.connection_pool = self.queue.connections
+        
+        # API local opcional (ex.: um app de automação enviando URLs para a fila)
+        if self.settings.get('control_server'):
+            try:
+                ControlServer(self.queue, self.settings['control_port'], self.settings['control_token'],
+                              default_threads=lambda: int(self.settings['custom_threads'])).start()
+            except OSError as e:
+                print(f"Erro ao iniciar a API de controle: {e}")
         
         self.status_label = Label(text=self.lang.get_string("status_awaiting"))
         self.add_widget(self.status_label)
         
+        # URL (espelhos separados por espaço, como no Windows) e pasta de destino da fila
+        self.url_input = TextInput(hint_text="URL", multiline=False)
+        self.add_widget(self.url_input)
+        self.folder_input = TextInput(text=self.settings.get('last_path') or "/storage/emulated/0/Download",
+                                      multiline=False)
+        self.add_widget(self.folder_input)
+        
         self.download_button = Button(text=self.lang.get_string("button_download"))
         self.download_button.bind(on_press=self.start_download)
         self.add_widget(self.download_button)
+        
+        self.queue_button = Button(text=self.lang.get_string("button_add_queue"))
+        self.queue_button.bind(on_press=self.add_to_queue)
+        self.add_widget(self.queue_button)
+        
+        self.queue_label = Label(text="")
+        self.add_widget(self.queue_label)
+        for job in self.queue.list_jobs():
+            self.on_job_update(job)
 
     def start_download(self, instance):
         # Lógica de pegar URL e pasta (do Kivy)
@@ -55,7 +93,32 @@ class AndroidDownloaderGUI(BoxLayout):
         threading.Thread(target=self.downloader.download_file_manager, 
                          args=(url, save_path, num_threads), daemon=True).start()
 
+    def add_to_queue(self, instance):
+        urls = self.url_input.text.split()
+        save_path = self.folder_input.text.strip()
+        if not urls or not save_path:
+            self.status_label.text = self.lang.get_string("warn_empty_fields_msg")
+            return
+        if not os.path.isdir(save_path):
+            self.status_label.text = self.lang.get_string("error_invalid_folder_msg")
+            return
+        try:
+            num_threads = max(1, int(self.settings['custom_threads']))
+        except ValueError:
+            num_threads = 8
+        self.queue.add(urls[0], save_path, num_threads, mirrors=urls[1:])
+        self.url_input.text = ""
+
     # --- Callbacks do Kivy ---
+    @mainthread
+    def on_job_update(self, job):
+        self.jobs[job['id']] = job
+        lines = []
+        for item in self.jobs.values():
+            state = self.lang.get_string(f"queue_state_{item['state']}")
+            lines.append(f"#{item['id']} {state} {item['progress']:.1f}% {item['speed']}")
+        self.queue_label.text = "\n".join(lines)
+
     @mainthread
     def on_status_change(self, message):
         self.status_label.text = message
@@ -1,10 +1,10 @@
 # gui/windows/main_windows.py
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import threading
 import os
 import json
-import sqlite3
+import datetime
 import webbrowser
 import sys
 from urllib.parse import urlparse
@@ -17,7 +17,12 @@ sys.path.append(project_root)
 
 # --- IMPORTS DO NOSSO CORE ---
 from core.i18n import LanguageManager
-from core.downloader import DownloadLogic
+from core.database import init_db, get_history_page, get_history_newer, search_history
+from core.history import PAGE_SIZE as HISTORY_PAGE_SIZE
+from core.downloader import create_download_logic, ENGINES
+from core.download_queue import DownloadQueue, RUNNING
+from core.control_server import ControlServer
+from core.metrics import Metrics, MetricsServer, MetricsFile
 # (Vamos usar a versão local de open_folder por enquanto)
 
 # --- 0. FUNÇÃO HELPER (Específica da GUI) ---
@@ -45,44 +50,40 @@ else:
     APP_DATA_PATH = os.path.join(os.path.expanduser('~'), '.config', APP_NAME)
 
 SETTINGS_FILE = os.path.join(APP_DATA_PATH, 'settings.json')
-DB_FILE = os.path.join(APP_DATA_PATH, 'history.db')
 
 os.makedirs(APP_DATA_PATH, exist_ok=True)
 
 DEFAULT_SETTINGS = {
     "thread_mode": "Automático",
     "custom_threads": 16,
+    "adaptive_max_threads": 32,
     "auto_level": "Alto",
     "language": "pt_BR",
     "theme": "Sistema",
     "start_with_windows": False,
-    "start_with_windows_minimized": False
+    "start_with_windows_minimized": False,
+    "max_active_jobs": 3,
+    "max_connections": 32,
+    "engine": "threads",
+    "async_max_concurrency": 64,
+    "telemetry_interval": 0.5,
+    "max_speed_kbps": 0,
+    "max_connections_per_host": 0,
+    "control_server": False,
+    "control_port": 8799,
+    "control_token": "",
+    "trace_downloads": False,
+    "metrics_server": False,
+    "metrics_port": 9464,
+    "metrics_file": "",
+    "metrics_interval": 15,
+    "content_store": False,
+    "content_store_max_mb": 10240,
+    "delta_updates": False
 }
 
 # --- 3. BANCO DE DADOS DO HISTÓICO ---
-def init_db():
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS downloads (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            url TEXT NOT NULL,
-            path TEXT NOT NULL,
-            filename TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        conn.commit()
-
-def get_history():
-    try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT url, path, filename, timestamp FROM downloads ORDER BY timestamp DESC")
-            return cursor.fetchall()
-    except Exception as e:
-        print(f"Erro ao ler o histórico: {e}")
-        return []
+# init_db e as consultas do histórico vêm de core/database.py (histórico em core/history.py)
 
 # --- 4. DEFINIÇÃO DAS PÁGINAS (FRAMES) ---
 
@@ -93,7 +94,7 @@ class DownloadFrame(ttk.Frame):
         self.lang = app_instance.lang_manager
         self.style = app_instance.style
         
-        callbacks = {
+        self.callbacks = {
             "on_progress": self.on_download_progress,
             "on_complete": self.on_download_complete,
             "on_error": self.on_download_error,
@@ -101,7 +102,7 @@ class DownloadFrame(ttk.Frame):
             "on_show_monitor": self.on_show_monitor,
             "on_set_downloading_state": self.on_set_downloading_state
         }
-        self.downloader = DownloadLogic(self.lang, callbacks)
+        self.downloader = create_download_logic(self.lang, self.callbacks, self.app_instance.settings)
         
         self.create_widgets()
         self.update_text()
@@ -129,6 +130,14 @@ class DownloadFrame(ttk.Frame):
         self.browse_button = ttk.Button(self.folder_frame, command=self.browse_folder)
         self.browse_button.pack(side=tk.LEFT, padx=(2, 5))
 
+        self.checksum_label = ttk.Label(self)
+        self.checksum_label.pack(padx=5, pady=(10, 2), anchor='w')
+        self.checksum_entry = ttk.Entry(self, width=60)
+        self.checksum_entry.pack(padx=5, pady=2, fill='x')
+
+        self.queue_button = ttk.Button(self, command=self.add_to_queue)
+        self.queue_button.pack(pady=(20, 0), fill='x')
+
         self.download_button = ttk.Button(self, command=self.start_download_thread, style="Accent.TButton")
         self.download_button.pack(pady=20, fill='x', ipady=5) 
         self.style.configure("Accent.TButton", font=("-size 10 -weight bold"))
@@ -212,8 +221,10 @@ class DownloadFrame(ttk.Frame):
     def update_text(self):
         self.url_label.config(text=self.lang.get_string('label_url'))
         self.path_label.config(text=self.lang.get_string('label_path'))
+        self.checksum_label.config(text=self.lang.get_string('label_checksum'))
         self.browse_button.config(text=self.lang.get_string('button_browse'))
         self.download_button.config(text=self.lang.get_string('button_download'))
+        self.queue_button.config(text=self.lang.get_string('button_add_queue'))
         self.cancel_button.config(text=self.lang.get_string('button_cancel'))
         
     def get_thread_count(self):
@@ -230,6 +241,9 @@ class DownloadFrame(ttk.Frame):
                 return cpus * 2
             elif level == "Máximo":
                 return max(16, cpus * 4)
+        elif mode == "Adaptativo":
+            # O motor começa com poucas conexões e aumenta até este máximo
+            return max(1, int(self.app_instance.settings['adaptive_max_threads']))
         elif mode == "Personalizado":
             try:
                 val = int(self.app_instance.settings['custom_threads'])
@@ -250,32 +264,60 @@ class DownloadFrame(ttk.Frame):
             self.app_instance.settings['last_path'] = foldername
             self.app_instance.save_settings(self.app_instance.settings)
 
-    def start_download_thread(self):
-        url = self.url_entry.get()
+    def get_validated_inputs(self):
+        # Várias URLs separadas por espaço: a primeira é a principal, as outras são espelhos
+        urls = self.url_entry.get().split()
         folder = self.folder_entry.get()
         
-        if not url or not folder:
+        if not urls or not folder:
             messagebox.showwarning(self.lang.get_string("warn_empty_fields"), 
                                      self.lang.get_string("warn_empty_fields_msg"))
-            return
+            return None
             
         if not os.path.isdir(folder):
             messagebox.showerror(self.lang.get_string("error_invalid_folder"), 
                                    self.lang.get_string("error_invalid_folder_msg"))
+            return None
+        return urls[0], urls[1:], folder
+
+    def add_to_queue(self):
+        inputs = self.get_validated_inputs()
+        if not inputs:
+            return
+        url, mirrors, folder = inputs
+        self.app_instance.download_queue.add(url, folder, self.get_thread_count(),
+                                             checksum=self.checksum_entry.get().strip() or None,
+                                             mirrors=mirrors)
+        self.url_entry.delete(0, tk.END)
+        self.checksum_entry.delete(0, tk.END)
+        self.app_instance.show_page("queue")
+
+    def start_download_thread(self):
+        inputs = self.get_validated_inputs()
+        if not inputs:
             return
+        url, mirrors, folder = inputs
         
         num_threads = self.get_thread_count()
         
+        # Recria o motor: o usuário pode ter trocado o 'engine' nas configurações
+        budget = self.downloader.connection_budget
+        self.downloader = create_download_logic(self.lang, self.callbacks, self.app_instance.settings,
+                                                connection_budget=budget,
+                                                telemetry=self.downloader.telemetry,
+                                                bandwidth=self.downloader.limiter.parent,
+                                                connection_pool=self.downloader.connection_pool,
+                                                metrics=self.downloader.metrics)
+        
         # A própria lógica de download chamará o callback
         # 'on_set_downloading_state' para atualizar o botão.
         
+        checksum = self.checksum_entry.get().strip() or None
         download_thread = threading.Thread(target=self.downloader.download_file_manager, 
-                                           args=(url, folder, num_threads))
+                                           args=(url, folder, num_threads, checksum, mirrors))
         download_thread.daemon = True
         download_thread.start()
         
-        self.downloader.update_progress_bar()
-        
     def cancel_download(self):
         print("Cancelamento solicitado pelo usuário.")
         self.downloader.stop_download(cancelled=True)
@@ -346,31 +388,172 @@ class HistoryFrame(ttk.Frame):
 
         self.btn_redownload = ttk.Button(button_frame, command=self.redownload)
         self.btn_redownload.pack(side=tk.LEFT, padx=5)
+
+        # Busca (texto em URL/arquivo/pasta) e filtros de host e datas
+        search_frame = ttk.Frame(self)
+        search_frame.pack(fill=tk.X, side=tk.TOP, pady=(0, 5))
+
+        self.search_entry = ttk.Entry(search_frame)
+        self.search_entry.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 5))
+        self.host_label = ttk.Label(search_frame)
+        self.host_label.pack(side=tk.LEFT)
+        self.host_entry = ttk.Entry(search_frame, width=18)
+        self.host_entry.pack(side=tk.LEFT, padx=(2, 5))
+        self.since_label = ttk.Label(search_frame)
+        self.since_label.pack(side=tk.LEFT)
+        self.since_entry = ttk.Entry(search_frame, width=11)
+        self.since_entry.pack(side=tk.LEFT, padx=(2, 5))
+        self.until_label = ttk.Label(search_frame)
+        self.until_label.pack(side=tk.LEFT)
+        self.until_entry = ttk.Entry(search_frame, width=11)
+        self.until_entry.pack(side=tk.LEFT, padx=(2, 5))
+        self.btn_search = ttk.Button(search_frame, command=self.apply_filter)
+        self.btn_search.pack(side=tk.LEFT, padx=5)
+        self.btn_clear_filter = ttk.Button(search_frame, command=self.clear_filter)
+        self.btn_clear_filter.pack(side=tk.LEFT)
+        for entry in (self.search_entry, self.host_entry, self.since_entry, self.until_entry):
+            entry.bind('<Return>', lambda event: self.apply_filter())
         
         tree_frame = ttk.Frame(self)
         tree_frame.pack(expand=True, fill=tk.BOTH, side=tk.TOP, pady=(0, 5))
 
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         self.cols = ('Data', 'Arquivo', 'Link', 'Pasta')
-        self.tree = ttk.Treeview(tree_frame, columns=self.cols, show='headings', yscrollcommand=scrollbar.set)
+        self.tree = ttk.Treeview(tree_frame, columns=self.cols, show='headings', yscrollcommand=self._on_scroll)
         self.tree.pack(expand=True, fill=tk.BOTH, side=tk.LEFT)
         
-        scrollbar.config(command=self.tree.yview)
+        self.scrollbar.config(command=self.tree.yview)
+
+        # Paginação por chave: (timestamp, id) da linha mais antiga e da mais nova carregadas
+        self.oldest_key = None
+        self.newest_key = None
+        self.loaded = False # Primeira página já chegou
+        self.exhausted = False # Não há linhas mais antigas
+        self.loading = False # Consulta em andamento (uma por vez)
+        self.refresh_pending = False # on_show durante uma consulta
+        self.filters = None # Busca ativa (argumentos de search_history), paginada por OFFSET
+        self.search_offset = 0
+        self.generation = 0 # Muda a cada busca; resultados de consultas antigas são descartados
         
         self.update_text()
         
     def on_show(self):
-        self.load_history()
-        
-    def load_history(self):
-        self.tree.delete(*self.tree.get_children()) 
-        history_data = get_history()
-        for item in history_data:
-            url, path, filename, timestamp = item
-            date_str = timestamp.split(" ")[0]
-            self.tree.insert("", tk.END, values=(date_str, filename, url, path))
+        # Só a primeira visita monta a árvore; as outras só acrescentam os downloads novos
+        if not self.loaded:
+            self.load_more()
+        elif self.filters is None:
+            self.load_newer()
+
+    def apply_filter(self):
+        text = self.search_entry.get().strip()
+        host = self.host_entry.get().strip()
+        since = self.since_entry.get().strip()
+        until = self.until_entry.get().strip()
+        try:
+            for date in (since, until):
+                if date:
+                    datetime.date.fromisoformat(date)
+        except ValueError:
+            messagebox.showwarning(self.lang.get_string("error_invalid_date"),
+                                   self.lang.get_string("error_invalid_date_msg"))
+            return
+        if not (text or host or since or until):
+            self.clear_filter()
+            return
+        self._reset()
+        self.filters = {"text": text, "host": host or None, "since": since or None, "until": until or None}
+        self.load_more()
+
+    def clear_filter(self):
+        for entry in (self.search_entry, self.host_entry, self.since_entry, self.until_entry):
+            entry.delete(0, tk.END)
+        if self.filters is None and self.loaded:
+            return
+        self._reset()
+        self.load_more()
+
+    def _reset(self):
+        self.generation += 1
+        self.tree.delete(*self.tree.get_children())
+        self.oldest_key = self.newest_key = None
+        self.loaded = self.exhausted = self.loading = self.refresh_pending = False
+        self.filters = None
+        self.search_offset = 0
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        # Perto do fim da lista: busca a próxima página
+        if self.loaded and float(last) >= 0.9:
+            self.load_more()
+
+    def _query(self, fetch, apply):
+        """Roda a consulta fora da thread do Tk e aplica o resultado com self.after."""
+        self.loading = True
+        generation = self.generation
+
+        def run():
+            rows = fetch()
+            self.after(0, self._apply_rows, generation, apply, rows)
+        threading.Thread(target=run, daemon=True).start()
+
+    def _apply_rows(self, generation, apply, rows):
+        if generation != self.generation:
+            return # A busca mudou enquanto a consulta rodava
+        self.loading = False
+        apply(rows)
+        if self.refresh_pending:
+            self.refresh_pending = False
+            self.load_newer()
+
+    def load_more(self):
+        if self.loading or self.exhausted:
+            return
+        if self.filters is not None:
+            filters, offset = self.filters, self.search_offset
+            self._query(lambda: search_history(**filters, offset=offset), self._append_rows)
+            return
+        before = self.oldest_key
+        self._query(lambda: get_history_page(before), self._append_rows)
+
+    def load_newer(self):
+        if self.loading:
+            self.refresh_pending = True
+            return
+        if self.newest_key is None:
+            # Histórico estava vazio: recomeça da primeira página
+            self.loaded = self.exhausted = False
+            self.load_more()
+            return
+        after = self.newest_key
+        self._query(lambda: get_history_newer(after), self._prepend_rows)
+
+    def _append_rows(self, rows):
+        for row in rows:
+            self._insert_row(row, tk.END)
+        self.search_offset += len(rows)
+        if rows and self.filters is None:
+            self.oldest_key = (rows[-1][4], rows[-1][0])
+            if self.newest_key is None:
+                self.newest_key = (rows[0][4], rows[0][0])
+        if len(rows) < HISTORY_PAGE_SIZE:
+            self.exhausted = True
+        self.loaded = True
+
+    def _prepend_rows(self, rows):
+        # `rows` vem do mais novo para o mais antigo
+        for row in reversed(rows):
+            self._insert_row(row, 0)
+        if rows:
+            self.newest_key = (rows[0][4], rows[0][0])
+
+    def _insert_row(self, row, index):
+        row_id, url, path, filename, timestamp = row[:5]
+        if self.tree.exists(str(row_id)):
+            return
+        date_str = timestamp.split(" ")[0]
+        self.tree.insert("", index, iid=str(row_id), values=(date_str, filename, url, path))
             
     def update_text(self):
         self.tree.heading('Data', text=self.lang.get_string('win_history_date'))
@@ -380,6 +563,11 @@ class HistoryFrame(ttk.Frame):
         self.btn_copy.config(text=self.lang.get_string('win_history_copy'))
         self.btn_open.config(text=self.lang.get_string('win_history_open'))
         self.btn_redownload.config(text=self.lang.get_string('win_history_redownload'))
+        self.host_label.config(text=self.lang.get_string('win_history_host'))
+        self.since_label.config(text=self.lang.get_string('win_history_from'))
+        self.until_label.config(text=self.lang.get_string('win_history_to'))
+        self.btn_search.config(text=self.lang.get_string('win_history_search'))
+        self.btn_clear_filter.config(text=self.lang.get_string('win_history_clear_filter'))
 
     def get_selected_item_data(self):
         selected_item = self.tree.focus()
@@ -419,6 +607,118 @@ class HistoryFrame(ttk.Frame):
             self.app_instance.show_page("home")
 
 
+class QueueFrame(ttk.Frame):
+    def __init__(self, master, app_instance):
+        super().__init__(master, padding="10")
+        self.app_instance = app_instance
+        self.lang = app_instance.lang_manager
+
+        button_frame = ttk.Frame(self, padding="10")
+        button_frame.pack(fill=tk.X, side=tk.BOTTOM)
+
+        self.btn_pause = ttk.Button(button_frame, command=lambda: self.apply_to_selected("pause"))
+        self.btn_pause.pack(side=tk.LEFT, padx=5)
+
+        self.btn_resume = ttk.Button(button_frame, command=lambda: self.apply_to_selected("resume"))
+        self.btn_resume.pack(side=tk.LEFT, padx=5)
+
+        self.btn_cancel = ttk.Button(button_frame, command=lambda: self.apply_to_selected("cancel"))
+        self.btn_cancel.pack(side=tk.LEFT, padx=5)
+
+        self.btn_limit = ttk.Button(button_frame, command=self.set_speed_limit)
+        self.btn_limit.pack(side=tk.LEFT, padx=5)
+
+        self.btn_clear = ttk.Button(button_frame, command=self.clear_finished)
+        self.btn_clear.pack(side=tk.RIGHT, padx=5)
+
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(expand=True, fill=tk.BOTH, side=tk.TOP, pady=(0, 5))
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.cols = ('Arquivo', 'Estado', 'Progresso', 'Velocidade')
+        self.tree = ttk.Treeview(tree_frame, columns=self.cols, show='headings', yscrollcommand=scrollbar.set)
+        self.tree.pack(expand=True, fill=tk.BOTH, side=tk.LEFT)
+        self.tree.column('Estado', width=110, anchor='center')
+        self.tree.column('Progresso', width=90, anchor='e')
+        self.tree.column('Velocidade', width=110, anchor='e')
+
+        scrollbar.config(command=self.tree.yview)
+
+        self.update_text()
+
+    def on_show(self):
+        self.load_jobs()
+
+    def load_jobs(self):
+        self.tree.delete(*self.tree.get_children())
+        for job in self.app_instance.download_queue.list_jobs():
+            self._update_job_ui(job)
+
+    # Chamado pelas threads da fila
+    def on_job_update(self, job):
+        self.after(0, self._update_job_ui, job)
+
+    def _update_job_ui(self, job):
+        name = os.path.basename(job['filename'] or urlparse(job['url']).path) or job['url']
+        state = self.lang.get_string(f"queue_state_{job['state']}")
+        if job['state'] == RUNNING:
+            progress, speed = f"{job['progress']:.1f}%", job['speed']
+        else:
+            progress, speed = "", ""
+        values = (name, state, progress, speed)
+        iid = str(job['id'])
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=values)
+        else:
+            self.tree.insert("", tk.END, iid=iid, values=values)
+
+    def update_text(self):
+        self.tree.heading('Arquivo', text=self.lang.get_string('win_queue_file'))
+        self.tree.heading('Estado', text=self.lang.get_string('win_queue_state'))
+        self.tree.heading('Progresso', text=self.lang.get_string('win_queue_progress'))
+        self.tree.heading('Velocidade', text=self.lang.get_string('win_queue_speed'))
+        self.btn_pause.config(text=self.lang.get_string('win_queue_pause'))
+        self.btn_resume.config(text=self.lang.get_string('win_queue_resume'))
+        self.btn_cancel.config(text=self.lang.get_string('win_queue_cancel'))
+        self.btn_limit.config(text=self.lang.get_string('win_queue_limit'))
+        self.btn_clear.config(text=self.lang.get_string('win_queue_clear'))
+        if hasattr(self.app_instance, 'download_queue'):
+            self.load_jobs()
+
+    def apply_to_selected(self, action):
+        selected = self.tree.selection()
+        if not selected:
+            messagebox.showwarning(self.lang.get_string("error_no_selection"),
+                                     self.lang.get_string("error_no_selection_msg"))
+            return
+        queue = self.app_instance.download_queue
+        for iid in selected:
+            getattr(queue, action)(int(iid))
+
+    def set_speed_limit(self):
+        selected = self.tree.selection()
+        if not selected:
+            messagebox.showwarning(self.lang.get_string("error_no_selection"),
+                                     self.lang.get_string("error_no_selection_msg"))
+            return
+        queue = self.app_instance.download_queue
+        current = queue.get_job(int(selected[0]))
+        value = simpledialog.askinteger(self.lang.get_string('win_queue_limit'),
+                                        self.lang.get_string('win_queue_limit_prompt'),
+                                        initialvalue=current['max_speed'] if current else 0,
+                                        minvalue=0, parent=self)
+        if value is None:
+            return
+        for iid in selected:
+            queue.set_job_speed_limit(int(iid), value)
+
+    def clear_finished(self):
+        self.app_instance.download_queue.clear_finished()
+        self.load_jobs()
+
+
 class SettingsFrame(ttk.Frame):
     def __init__(self, master, app_instance):
         super().__init__(master, padding="15")
@@ -430,6 +730,8 @@ class SettingsFrame(ttk.Frame):
         self.thread_mode_var = tk.StringVar(master=self, value=self.settings['thread_mode'])
         self.auto_level_var = tk.StringVar(master=self, value=self.settings['auto_level'])
         self.custom_thread_var = tk.StringVar(master=self, value=str(self.settings['custom_threads']))
+        self.engine_var = tk.StringVar(master=self, value=self.settings['engine'])
+        self.speed_limit_var = tk.StringVar(master=self, value=str(self.settings['max_speed_kbps']))
         self.theme_var = tk.StringVar(master=self, value=self.settings['theme'])
         self.lang_var = tk.StringVar(master=self, value=self.settings['language'])
         self.startup_var = tk.BooleanVar(master=self, value=self.settings['start_with_windows'])
@@ -441,7 +743,7 @@ class SettingsFrame(ttk.Frame):
         self.thread_options_frame = ttk.Frame(self.threads_frame)
         self.thread_options_frame.pack(fill=tk.X, pady=5)
         
-        thread_options = ["Automático", "Personalizado", "1", "2", "3", "4", "5", "6", "7", "8"]
+        thread_options = ["Automático", "Adaptativo", "Personalizado", "1", "2", "3", "4", "5", "6", "7", "8"]
         self.thread_combo = ttk.Combobox(self.thread_options_frame, textvariable=self.thread_mode_var, 
                                          values=thread_options, state='readonly', width=15)
         self.thread_combo.pack(side=tk.LEFT, padx=5)
@@ -463,6 +765,23 @@ class SettingsFrame(ttk.Frame):
         self.auto_level_combo_2 = ttk.Combobox(self.auto_level_frame, textvariable=self.auto_level_var,
                                              values=auto_options, state='readonly', width=10)
         
+        self.engine_frame = ttk.Frame(self.threads_frame)
+        self.engine_frame.pack(fill=tk.X, side=tk.BOTTOM, pady=5)
+        self.engine_label = ttk.Label(self.engine_frame, text="Motor:")
+        self.engine_label.pack(side=tk.LEFT, padx=5)
+        self.engine_combo = ttk.Combobox(self.engine_frame, textvariable=self.engine_var,
+                                         values=list(ENGINES), state='readonly', width=10)
+        self.engine_combo.pack(side=tk.LEFT, padx=5)
+        
+        self.speed_limit_frame = ttk.Frame(self.threads_frame)
+        self.speed_limit_frame.pack(fill=tk.X, side=tk.BOTTOM, pady=5)
+        self.speed_limit_label = ttk.Label(self.speed_limit_frame, text="Limite de banda (KB/s):")
+        self.speed_limit_label.pack(side=tk.LEFT, padx=5)
+        self.speed_limit_entry = ttk.Entry(self.speed_limit_frame, textvariable=self.speed_limit_var,
+                                           width=8, validate='key',
+                                           validatecommand=(self.register(self.validate_speed), '%P'))
+        self.speed_limit_entry.pack(side=tk.LEFT, padx=5)
+        
         self.appearance_frame = ttk.LabelFrame(self, padding="10")
         self.appearance_frame.pack(fill=tk.X, pady=5)
         
@@ -508,6 +827,9 @@ class SettingsFrame(ttk.Frame):
             return True
         return False
 
+    def validate_speed(self, value_if_allowed):
+        return value_if_allowed == "" or (value_if_allowed.isdigit() and len(value_if_allowed) < 8)
+
     def on_thread_mode_change(self, *args):
         mode = self.thread_mode_var.get()
         
@@ -532,6 +854,7 @@ class SettingsFrame(ttk.Frame):
         
         thread_options = [
             self.lang.get_string("win_settings_mode_auto"),
+            self.lang.get_string("win_settings_mode_adaptive"),
             self.lang.get_string("win_settings_mode_custom"),
             "1", "2", "3", "4", "5", "6", "7", "8"
         ]
@@ -546,6 +869,8 @@ class SettingsFrame(ttk.Frame):
         self.auto_level_combo.config(values=auto_options)
         self.auto_level_combo_2.config(values=auto_options)
         self.auto_level_label.config(text=self.lang.get_string('win_settings_auto_level'))
+        self.engine_label.config(text=self.lang.get_string('win_settings_engine'))
+        self.speed_limit_label.config(text=self.lang.get_string('win_settings_speed_limit'))
         
         theme_options = [
             self.lang.get_string("win_settings_theme_system"),
@@ -567,6 +892,8 @@ class SettingsFrame(ttk.Frame):
         mode_str = self.thread_mode_var.get()
         if mode_str == self.lang.get_string("win_settings_mode_auto"):
             self.settings['thread_mode'] = "Automático"
+        elif mode_str == self.lang.get_string("win_settings_mode_adaptive"):
+            self.settings['thread_mode'] = "Adaptativo"
         elif mode_str == self.lang.get_string("win_settings_mode_custom"):
             self.settings['thread_mode'] = "Personalizado"
         else:
@@ -595,6 +922,11 @@ class SettingsFrame(ttk.Frame):
         elif theme_str == self.lang.get_string("win_settings_theme_dark"):
             self.settings['theme'] = "Escuro"
             
+        self.settings['engine'] = self.engine_var.get()
+        try:
+            self.settings['max_speed_kbps'] = int(self.speed_limit_var.get())
+        except ValueError:
+            self.settings['max_speed_kbps'] = 0
         self.settings['language'] = self.lang_var.get()
         self.settings['start_with_windows'] = self.startup_var.get()
         self.settings['start_with_windows_minimized'] = self.startup_minimized_var.get()
@@ -712,6 +1044,47 @@ class App(tk.Tk):
         
         self.create_widgets()
         self.apply_settings() 
+        
+        metrics = None
+        if self.settings['metrics_server'] or self.settings['metrics_file']:
+            metrics = Metrics()
+        
+        # A fila é criada depois das páginas: ela pode retomar jobs salvos imediatamente
+        self.download_queue = DownloadQueue(self.lang_manager, {"on_job_update": self.on_job_update},
+                                            max_active_jobs=self.settings['max_active_jobs'],
+                                            max_connections=self.settings['max_connections'],
+                                            settings=self.settings, metrics=metrics)
+        self.pages["home"].downloader.connection_budget = self.download_queue.budget
+        self.pages["home"].downloader.limiter.parent = self.download_queue.bandwidth
+        self.pages["home"].downloader.connection_pool = self.download_queue.connections
+        self.pages["home"].downloader.metrics = metrics
+        self.pages["queue"].load_jobs()
+        self.control_server = None
+        if self.settings['control_server']:
+            self.start_control_server()
+        if metrics is not None:
+            self.start_metrics(metrics)
+
+    def start_control_server(self):
+        """API local para outras ferramentas enviarem e acompanharem downloads da fila."""
+        self.control_server = ControlServer(self.download_queue, self.settings['control_port'],
+                                            self.settings['control_token'],
+                                            default_threads=self.pages["home"].get_thread_count)
+        try:
+            self.control_server.start()
+        except OSError as e:
+            print(f"Erro ao iniciar a API de controle na porta {self.settings['control_port']}: {e}")
+            self.control_server = None
+
+    def start_metrics(self, metrics):
+        """Exporta as métricas (formato Prometheus) em 127.0.0.1 e/ou em um arquivo."""
+        if self.settings['metrics_server']:
+            try:
+                MetricsServer(metrics, self.settings['metrics_port']).start()
+            except OSError as e:
+                print(f"Erro ao iniciar as métricas na porta {self.settings['metrics_port']}: {e}")
+        if self.settings['metrics_file']:
+            MetricsFile(metrics, self.settings['metrics_file'], self.settings['metrics_interval']).start()
 
     def load_settings(self):
         try:
@@ -741,6 +1114,13 @@ class App(tk.Tk):
             self.lang.set_language(self.settings['language'])
             self.update_all_text()
         self.apply_theme()
+        if hasattr(self, 'download_queue'):
+            self.pages["home"].downloader.telemetry.set_interval(self.settings['telemetry_interval'])
+            self.download_queue.telemetry.set_interval(self.settings['telemetry_interval'])
+            self.download_queue.settings = self.settings
+            self.download_queue.set_limits(self.settings['max_active_jobs'], self.settings['max_connections'],
+                                           self.settings['max_speed_kbps'],
+                                           self.settings['max_connections_per_host'])
         
     def apply_theme(self, on_startup=False):
         theme = self.settings.get('theme', 'Sistema')
@@ -771,6 +1151,7 @@ class App(tk.Tk):
         self.menu_bar.add_cascade(label="Menu", menu=self.menu_file) 
         self.menu_file.add_command(label="Download", command=lambda: self.show_page("home"))
         self.menu_file.add_command(label="Histórico", command=lambda: self.show_page("history"))
+        self.menu_file.add_command(label="Fila", command=lambda: self.show_page("queue"))
         self.menu_file.add_command(label="Configurações", command=lambda: self.show_page("settings"))
         self.menu_file.add_command(label="Sobre", command=lambda: self.show_page("about"))
         self.menu_file.add_separator()
@@ -782,6 +1163,7 @@ class App(tk.Tk):
         self.pages = {
             "home": DownloadFrame(self.main_container, self),
             "history": HistoryFrame(self.main_container, self),
+            "queue": QueueFrame(self.main_container, self),
             "settings": SettingsFrame(self.main_container, self),
             "about": AboutFrame(self.main_container, self)
         }
@@ -810,9 +1192,10 @@ class App(tk.Tk):
         self.menu_bar.entryconfig(1, label=self.lang.get_string('menu_file'))
         self.menu_file.entryconfig(0, label="Download")
         self.menu_file.entryconfig(1, label=self.lang.get_string('menu_history'))
-        self.menu_file.entryconfig(2, label=self.lang.get_string('menu_settings'))
-        self.menu_file.entryconfig(3, label=self.lang.get_string('menu_about'))
-        self.menu_file.entryconfig(5, label=self.lang.get_string('menu_exit'))
+        self.menu_file.entryconfig(2, label=self.lang.get_string('menu_queue'))
+        self.menu_file.entryconfig(3, label=self.lang.get_string('menu_settings'))
+        self.menu_file.entryconfig(4, label=self.lang.get_string('menu_about'))
+        self.menu_file.entryconfig(6, label=self.lang.get_string('menu_exit'))
         
         for page in self.pages.values():
             if hasattr(page, 'update_text'):
@@ -821,6 +1204,9 @@ class App(tk.Tk):
         if self.pages["home"].downloader and not self.pages["home"].downloader.download_active:
              self.pages["home"].status_label.config(text=self.lang.get_string('status_awaiting'))
 
+    def on_job_update(self, job):
+        self.pages["queue"].on_job_update(job)
+
     def open_monitor(self):
         if self.monitor_window and self.monitor_window.winfo_exists():
             self.monitor_window.lift() 
@@ -32,6 +32,11 @@ def detect_system():
 
 def main():
     """Ponto de entrada principal."""
+    if len(sys.argv) > 1:
+        # Com argumentos: modo sem interface (não importa tkinter nem kivy)
+        from cli.main_cli import start_cli
+        sys.exit(start_cli(sys.argv[1:]))
+
     system = detect_system()
 
     if system == 'windows' or system == 'desktop':
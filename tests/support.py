@@ -0,0 +1,133 @@
+import gzip
+import http.server
+import os
+import re
+import tempfile
+import threading
+from unittest import mock
+
+from core import database, history
+
+
+class TempDatabase:
+    """
+    Banco SQLite temporário no lugar do history.db dos dados do app, para os
+    testes da fila, da sondagem e do histórico (ver use_temp_database).
+    """
+    def __enter__(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "history.db")
+        self.store = history.HistoryStore(self.path)
+        self.patches = [mock.patch.object(database, "DB_FILE", self.path),
+                        mock.patch.object(history, "_store", self.store)]
+        for patch in self.patches:
+            patch.start()
+        database.init_db()
+        return self
+
+    def __exit__(self, *exc):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.store.close()
+        self.dir.cleanup()
+
+
+def use_temp_database(test):
+    """Liga um TempDatabase até o fim do teste (chamado no setUp)."""
+    db = TempDatabase().__enter__()
+    test.addCleanup(db.__exit__, None, None, None)
+    return db
+
+
+class _QuietServer(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass # Conexões descartadas pelo cliente (sondagem, cancelamento) são esperadas
+
+
+class LocalServer:
+    """
+    Servidor HTTP local (em uma thread) com Range e ETag, para os testes do
+    motor. `files` é {caminho: bytes}; caminhos em `gzip` respondem o arquivo
+    inteiro comprimido (Content-Encoding: gzip), ignorando o Range.
+    `redirects` é {caminho: URL} (302); com `ranges=False` o servidor ignora
+    o Range e não anuncia Accept-Ranges.
+    """
+    def __init__(self, files, gzip_paths=(), redirects=None, ranges=True):
+        self.files = files
+        self.gzip_paths = set(gzip_paths)
+        self.redirects = redirects or {}
+        self.ranges = ranges
+        self.requests = [] # (método, caminho, cabeçalhos)
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.respond(head=True)
+
+            def do_GET(self):
+                self.respond(head=False)
+
+            def respond(self, head):
+                server.requests.append((self.command, self.path, dict(self.headers)))
+                location = server.redirects.get(self.path)
+                if location:
+                    self.send_response(302)
+                    self.send_header("Location", location)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = server.files.get(self.path.split("?")[0])
+                if data is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status, body = 200, data
+                headers = {"ETag": '"v1"', "Accept-Ranges": "bytes"} if server.ranges else {"ETag": '"v1"'}
+                match = server.ranges and re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+                if self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.send_header("ETag", '"v1"')
+                    self.end_headers()
+                    return
+                if self.path in server.gzip_paths:
+                    body = gzip.compress(data)
+                    headers["Content-Encoding"] = "gzip"
+                elif match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+                    status, body = 206, data[start:end + 1]
+                    headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+        self.httpd = _QuietServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeLang:
+    """LanguageManager mínimo: devolve a própria chave."""
+    def get_string(self, key, **kwargs):
+        return key
@@ -0,0 +1,77 @@
+import unittest
+
+from core.adaptive import ADAPTIVE_COOLDOWN, AdaptiveController
+
+
+class Feed:
+    """Alimenta o controlador com uma medição por segundo, com a vazão dada por `rate(conexões)`."""
+    def __init__(self, controller, rate):
+        self.controller = controller
+        self.rate = rate
+        self.total = 0
+        self.now = 0.0
+        self.targets = []
+        controller.observe(self.total, self.now)
+
+    def tick(self, seconds=1.0):
+        self.total += self.rate(self.controller.target) * seconds
+        self.now += seconds
+        target = self.controller.observe(self.total, self.now)
+        self.targets.append(target)
+        return target
+
+
+class AdaptiveControllerTest(unittest.TestCase):
+    def test_grows_while_throughput_improves_then_stops(self):
+        # Cada conexão rende 100 até 6 conexões; depois disso não há ganho
+        feed = Feed(AdaptiveController(16), lambda n: 100 * min(n, 6))
+        for _ in range(10):
+            feed.tick()
+        self.assertEqual(feed.targets[:4], [4, 6, 8, None])
+        self.assertEqual(feed.controller.target, 8)
+        self.assertFalse(feed.controller.growing)
+
+    def test_undoes_an_increase_that_made_it_worse(self):
+        feed = Feed(AdaptiveController(16), lambda n: {2: 200, 4: 400}.get(n, 100))
+        for _ in range(5):
+            feed.tick()
+        self.assertEqual(feed.targets[:4], [4, 6, 4, None])
+        self.assertEqual(feed.controller.target, 4)
+
+    def test_never_exceeds_max_connections(self):
+        feed = Feed(AdaptiveController(5), lambda n: 100 * n)
+        for _ in range(10):
+            feed.tick()
+        self.assertEqual(feed.controller.target, 5)
+
+    def test_ignores_measurements_shorter_than_the_interval(self):
+        feed = Feed(AdaptiveController(16), lambda n: 100 * n)
+        self.assertIsNone(feed.tick(0.5))
+        self.assertEqual(feed.tick(0.5), 4)
+
+    def test_throttle_halves_then_probes_below_the_ceiling(self):
+        feed = Feed(AdaptiveController(16), lambda n: 100 * n)
+        for _ in range(3):
+            feed.tick()
+        self.assertEqual(feed.controller.target, 8)
+        feed.controller.throttled()
+        self.assertEqual(feed.tick(), 4)
+        # Sinais atrasados, de conexões abertas antes do corte, não cortam de novo
+        feed.controller.throttled()
+        self.assertIsNone(feed.tick())
+        self.assertEqual(feed.controller.target, 4)
+        while feed.now < ADAPTIVE_COOLDOWN + 10:
+            feed.tick()
+        # Depois do cooldown volta a subir, mas só até um abaixo de onde foi limitado
+        self.assertEqual(feed.controller.target, 7)
+
+    def test_throttle_at_one_connection_keeps_one(self):
+        controller = AdaptiveController(16, initial=1)
+        controller.observe(0, 0.0)
+        controller.throttled()
+        self.assertIsNone(controller.observe(100, 1.0))
+        self.assertEqual(controller.target, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
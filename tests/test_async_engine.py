@@ -0,0 +1,99 @@
+import asyncio
+import types
+import unittest
+
+from core.async_engine import AsyncDownloadLogic, RangeConnection
+from core.connections import ConnectionPool
+
+URL = "http://127.0.0.1:9/arquivo.bin"
+
+
+class AcquireHostTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(per_host=1)
+        self.addCleanup(self.pool.close)
+        self.engine = types.SimpleNamespace(connection_pool=self.pool, is_active=lambda: True)
+        self.engine._release_orphan_slot = lambda future, url: AsyncDownloadLogic._release_orphan_slot(
+            self.engine, future, url)
+
+    def acquire(self):
+        return AsyncDownloadLogic._acquire_host(self.engine, URL)
+
+    def test_free_slot_is_taken_without_the_executor(self):
+        self.assertTrue(asyncio.run(self.acquire()))
+        self.assertEqual(self.pool.active(), {"127.0.0.1:9": 1})
+
+    def test_cancelled_wait_gives_the_slot_back(self):
+        async def scenario():
+            self.assertTrue(await self.acquire()) # Host cheio (per_host=1)
+            waiter = asyncio.create_task(self.acquire())
+            await asyncio.sleep(0.1)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            # A thread do executor só consegue a vaga depois do cancelamento
+            self.pool.release(URL)
+            for _ in range(100):
+                await asyncio.sleep(0.02)
+                if not self.pool.active():
+                    break
+        asyncio.run(scenario())
+        self.assertEqual(self.pool.active(), {})
+        self.assertTrue(self.pool.try_acquire(URL))
+
+
+class RangeConnectionTest(unittest.TestCase):
+    def setUp(self):
+        self.data = bytes(range(256)) * 64
+        self.requests = []
+
+    async def serve(self, reader, writer):
+        try:
+            await self.answer(reader, writer)
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            writer.close()
+
+    async def answer(self, reader, writer):
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            self.requests.append(lines)
+            start, end = map(int, next(l for l in lines if l.startswith("Range:")).split("=")[1].split("-"))
+            body = self.data[start:end + 1]
+            writer.write(f"HTTP/1.1 206 Partial Content\r\nContent-Length: {len(body)}\r\n"
+                         f"Content-Range: bytes {start}-{end}/{len(self.data)}\r\n\r\n".encode() + body)
+            await writer.drain()
+
+    def test_ranges_reuse_the_keep_alive_connection(self):
+        pool = ConnectionPool()
+        self.addCleanup(pool.close)
+
+        async def scenario():
+            server = await asyncio.start_server(self.serve, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            conn = RangeConnection(f"http://127.0.0.1:{port}/a.bin?x=1", None, pool)
+            received = []
+            try:
+                for start, end in ((0, 999), (1000, 4095)):
+                    status, headers, left = await conn.request_range(start, end, {"If-Range": '"v1"'})
+                    self.assertEqual(status, 206)
+                    while left:
+                        chunk = await conn.read(left)
+                        received.append(chunk)
+                        left -= len(chunk)
+            finally:
+                conn.close()
+                server.close()
+                await server.wait_closed()
+            return b"".join(received), port
+
+        body, port = asyncio.run(scenario())
+        self.assertEqual(body, self.data[:4096])
+        self.assertEqual(self.requests[0][0], "GET /a.bin?x=1 HTTP/1.1")
+        self.assertIn('If-Range: "v1"', self.requests[1])
+        key = f"127.0.0.1:{port}"
+        self.assertEqual(pool.counters()["hosts"][key], {"handshakes": 1, "reused": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from unittest import mock
+
+from core.bandwidth import BURST_SECONDS, BandwidthLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("core.bandwidth.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unlimited(self):
+        bucket = TokenBucket(0)
+        bucket.consume(10 ** 9)
+        self.assertEqual(bucket.delay(), 0.0)
+
+    def test_debt_is_paid_at_the_rate(self):
+        bucket = TokenBucket(1000)
+        bucket.consume(1000)
+        self.assertAlmostEqual(bucket.delay(), 1.0)
+        self.clock.now += 0.5
+        self.assertAlmostEqual(bucket.delay(), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(bucket.delay(), 0.0)
+
+    def test_idle_credit_is_capped_at_the_burst(self):
+        bucket = TokenBucket(1000)
+        self.clock.now += 60 # Parado por um minuto
+        burst = 1000 * BURST_SECONDS
+        bucket.consume(burst)
+        self.assertEqual(bucket.delay(), 0.0)
+        bucket.consume(100)
+        self.assertAlmostEqual(bucket.delay(), 0.1)
+
+    def test_average_rate_holds_with_reads_larger_than_the_bucket(self):
+        bucket = TokenBucket(1000)
+        consumed = 0
+        start = self.clock.now
+        for _ in range(20):
+            bucket.consume(700) # Maior que a capacidade (250)
+            consumed += 700
+            self.clock.now += bucket.delay()
+        self.assertAlmostEqual(consumed / (self.clock.now - start), 1000, delta=1)
+
+    def test_new_rate_forgives_old_debt(self):
+        bucket = TokenBucket(100)
+        bucket.consume(10000)
+        self.assertGreater(bucket.delay(), 10)
+        bucket.set_rate(1000)
+        self.assertEqual(bucket.delay(), 0.0)
+
+
+class BandwidthLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("core.bandwidth.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_global_limit_applies_to_unlimited_download(self):
+        parent = BandwidthLimiter(1000)
+        child = BandwidthLimiter(0, parent=parent)
+        self.assertTrue(child.limited)
+        child.consume(2000)
+        self.assertAlmostEqual(child.delay(), 2.0)
+        self.assertAlmostEqual(parent.delay(), 2.0)
+
+    def test_stricter_limit_wins(self):
+        parent = BandwidthLimiter(1000)
+        child = BandwidthLimiter(100, parent=parent)
+        child.consume(500)
+        self.assertAlmostEqual(child.delay(), 5.0)
+
+    def test_shared_global_bucket(self):
+        parent = BandwidthLimiter(1000)
+        first = BandwidthLimiter(0, parent=parent)
+        second = BandwidthLimiter(0, parent=parent)
+        first.consume(1000)
+        # A banda já usada pelo primeiro job também atrasa o segundo
+        self.assertAlmostEqual(second.delay(), 1.0)
+
+    def test_unlimited(self):
+        self.assertFalse(BandwidthLimiter(0, parent=BandwidthLimiter(0)).limited)
+
+    def test_wait_stops_when_cancelled(self):
+        limiter = BandwidthLimiter(1)
+        limiter.consume(10 ** 6)
+        with mock.patch("core.bandwidth.time.sleep") as sleep:
+            limiter.wait(lambda: False)
+        sleep.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
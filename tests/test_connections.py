@@ -0,0 +1,123 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from core.connections import AUTO_PER_HOST, ConnectionBudget, ConnectionPool, host_key
+from core.downloader import DownloadLogic
+from tests.support import FakeLang, LocalServer, use_temp_database
+
+
+class ConnectionBudgetTest(unittest.TestCase):
+    def test_limit_and_release(self):
+        budget = ConnectionBudget(2)
+        self.assertTrue(budget.try_acquire())
+        self.assertTrue(budget.acquire())
+        self.assertFalse(budget.try_acquire())
+        budget.release()
+        self.assertTrue(budget.try_acquire())
+
+    def test_blocked_acquire_gives_up_when_stopped(self):
+        budget = ConnectionBudget(1)
+        budget.acquire()
+        self.assertFalse(budget.acquire(lambda: False))
+        self.assertEqual(budget.in_use, 1)
+
+    def test_raising_the_limit_wakes_waiters(self):
+        budget = ConnectionBudget(1)
+        budget.acquire()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(budget.acquire()))
+        waiter.start()
+        budget.set_limit(2)
+        waiter.join(2)
+        self.assertEqual(result, [True])
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool()
+        self.addCleanup(self.pool.close)
+
+    def test_host_key(self):
+        self.assertEqual(host_key("https://exemplo.com/a"), "exemplo.com:443")
+        self.assertEqual(host_key("http://exemplo.com:8080/a"), "exemplo.com:8080")
+
+    def test_reserve_grows_the_automatic_limit_and_swaps_the_session(self):
+        session = self.pool.session
+        self.pool.reserve(10)
+        self.assertEqual(self.pool.per_host, AUTO_PER_HOST)
+        self.assertIs(self.pool.session, session)
+        self.pool.reserve(20)
+        self.assertEqual((self.pool.demand, self.pool.per_host), (30, 30))
+        self.assertIsNot(self.pool.session, session)
+        self.pool.unreserve(20)
+        self.pool.unreserve(10)
+        self.assertEqual(self.pool.demand, 0)
+
+    def test_fixed_limit_ignores_reserve(self):
+        self.pool.set_per_host(4)
+        self.pool.reserve(50)
+        self.assertEqual(self.pool.per_host, 4)
+        self.pool.set_per_host(0) # De volta ao automático: acompanha a demanda atual
+        self.assertEqual(self.pool.per_host, 50)
+
+    def test_per_host_slots(self):
+        self.pool.set_per_host(1)
+        self.assertTrue(self.pool.try_acquire("http://a.com/x"))
+        self.assertFalse(self.pool.try_acquire("http://a.com/y"))
+        self.assertTrue(self.pool.try_acquire("http://b.com/x"))
+        self.assertEqual(self.pool.active(), {"a.com:80": 1, "b.com:80": 1})
+        self.pool.release("http://a.com/x")
+        self.assertTrue(self.pool.try_acquire("http://a.com/y"))
+
+
+class ReserveLeakTest(unittest.TestCase):
+    """A reserva de um download volta inteira ao pool, termine ele como terminar."""
+    def setUp(self):
+        use_temp_database(self)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.data = os.urandom(4 * 1024 * 1024)
+        self.server = LocalServer({"/a.bin": self.data})
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.pool = ConnectionPool()
+        self.addCleanup(self.pool.close)
+
+    def logic(self, adaptive=True):
+        logic = DownloadLogic(FakeLang(), {}, connection_pool=self.pool)
+        logic.adaptive = adaptive
+        return logic
+
+    def test_finished_downloads(self):
+        for _ in range(3):
+            self.logic().download_file_manager(self.server.url("/a.bin"), self.folder, 14)
+            self.assertEqual(self.pool.demand, 0)
+        with open(os.path.join(self.folder, "a.bin"), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(self.pool.per_host, AUTO_PER_HOST)
+
+    def test_failed_download(self):
+        self.logic().download_file_manager(self.server.url("/nada.bin"), self.folder, 14)
+        self.assertEqual(self.pool.demand, 0)
+
+    def test_cancelled_download(self):
+        logic = self.logic()
+        logic.set_speed_limit(256 * 1024) # Devagar o bastante para cancelar no meio
+        worker = threading.Thread(target=logic.download_file_manager,
+                                  args=(self.server.url("/a.bin"), self.folder, 14))
+        worker.start()
+        deadline = time.monotonic() + 5
+        while not logic.is_multithreaded and time.monotonic() < deadline:
+            time.sleep(0.01)
+        logic.stop_download(cancelled=True)
+        worker.join(10)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(self.pool.demand, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import itertools
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from core.content_store import ContentStore, link_or_copy
+
+
+class ContentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.store = ContentStore(root=os.path.join(self.dir.name, "store"), max_bytes=250,
+                                  db_file=os.path.join(self.dir.name, "store.db"))
+        self.addCleanup(lambda: self.store.conn and self.store.conn.close())
+        # Relógio que sempre anda, para a ordem de last_used não depender da resolução do sistema
+        clock = itertools.count(1000)
+        patcher = mock.patch("core.content_store.time")
+        patcher.start().time.side_effect = lambda: next(clock)
+        self.addCleanup(patcher.stop)
+
+    def file(self, name, size):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(name.encode()[:1] * size)
+        return path
+
+    def test_add_lookup_and_materialize(self):
+        self.assertTrue(self.store.add("SHA256:AB12", self.file("a.bin", 100)))
+        self.assertEqual(self.store.lookup("sha256:ab12"), (100, "a.bin"))
+        self.assertIsNone(self.store.lookup("sha256:cd34"))
+        target = os.path.join(self.dir.name, "copia.bin")
+        method, size = self.store.materialize("sha256:ab12", target)
+        self.assertIn(method, ("reflink", "hardlink", "copy"))
+        self.assertEqual(size, 100)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b"a" * 100)
+        self.assertIsNone(self.store.materialize("sha256:cd34", target))
+
+    def test_evicts_least_recently_used(self):
+        self.store.add("sha256:aa", self.file("a.bin", 100))
+        self.store.add("sha256:bb", self.file("b.bin", 100))
+        # Usar "aa" de novo deixa "bb" como o mais antigo
+        self.store.materialize("sha256:aa", os.path.join(self.dir.name, "outra.bin"))
+        self.store.add("sha256:cc", self.file("c.bin", 100))
+        self.assertIsNotNone(self.store.lookup("sha256:aa"))
+        self.assertIsNone(self.store.lookup("sha256:bb"))
+        self.assertIsNotNone(self.store.lookup("sha256:cc"))
+        self.assertFalse(os.path.exists(self.store.object_path("sha256:bb")))
+
+    def test_new_object_is_kept_even_when_alone_over_the_limit(self):
+        self.store.add("sha256:aa", self.file("a.bin", 100))
+        self.store.add("sha256:bb", self.file("b.bin", 200))
+        self.assertIsNone(self.store.lookup("sha256:aa"))
+        self.assertIsNotNone(self.store.lookup("sha256:bb"))
+
+    def test_rejects_files_larger_than_the_store(self):
+        self.assertFalse(self.store.add("sha256:aa", self.file("a.bin", 300)))
+        self.assertIsNone(self.store.lookup("sha256:aa"))
+
+    def test_changed_object_is_forgotten(self):
+        self.store.add("sha256:aa", self.file("a.bin", 100))
+        with open(self.store.object_path("sha256:aa"), 'ab') as f:
+            f.write(b"alterado")
+        self.assertIsNone(self.store.lookup("sha256:aa"))
+        self.assertFalse(os.path.exists(self.store.object_path("sha256:aa")))
+        self.assertEqual(self.store.conn.execute("SELECT COUNT(*) FROM content_store").fetchone()[0], 0)
+
+
+class LinkOrCopyTest(unittest.TestCase):
+    def test_replaces_the_target(self):
+        with tempfile.TemporaryDirectory() as folder:
+            src, dst = os.path.join(folder, "origem"), os.path.join(folder, "destino")
+            for path, data in ((src, b"novo"), (dst, b"velho")):
+                with open(path, 'wb') as f:
+                    f.write(data)
+            self.assertIn(link_or_copy(src, dst), ("reflink", "hardlink", "copy"))
+            with open(dst, 'rb') as f:
+                self.assertEqual(f.read(), b"novo")
+            self.assertEqual(sorted(os.listdir(folder)), ["destino", "origem"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import http.client
+import json
+import unittest
+
+from core.control_server import MAX_BODY, ControlServer
+
+TOKEN = "segredo"
+
+
+class FakeQueue:
+    """A parte da DownloadQueue usada pelo servidor, guardando as chamadas."""
+    def __init__(self):
+        self.jobs = {}
+        self.calls = []
+        self.listeners = []
+
+    def add(self, url, save_path, num_threads, max_speed=0, checksum=None, mirrors=None):
+        job_id = len(self.jobs) + 1
+        self.jobs[job_id] = {"id": job_id, "url": url, "save_path": save_path, "num_threads": num_threads,
+                             "max_speed": max_speed, "checksum": checksum, "mirrors": mirrors,
+                             "state": "queued"}
+        return job_id
+
+    def get_job(self, job_id, segments=False):
+        return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        return list(self.jobs.values())
+
+    def pause(self, job_id):
+        self.calls.append(("pause", job_id))
+
+    def resume(self, job_id):
+        self.calls.append(("resume", job_id))
+
+    def cancel(self, job_id):
+        self.calls.append(("cancel", job_id))
+
+    def set_job_speed_limit(self, job_id, max_speed):
+        self.calls.append(("limit", job_id, max_speed))
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+
+class ServerMixin:
+    token = TOKEN
+
+    def setUp(self):
+        self.queue = FakeQueue()
+        self.server = ControlServer(self.queue, port=0, token=self.token, default_path=lambda: "/padrao",
+                                    default_threads=lambda: 4)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def request(self, method, path, body=None, headers=None, host=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=5)
+        self.addCleanup(conn.close)
+        conn.putrequest(method, path, skip_host=True, skip_accept_encoding=True)
+        all_headers = {"Host": host or f"127.0.0.1:{self.server.port}"}
+        if self.token:
+            all_headers["Authorization"] = f"Bearer {self.token}"
+        if body is not None:
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            all_headers.update({"Content-Type": "application/json", "Content-Length": str(len(body))})
+        all_headers.update(headers or {})
+        for key, value in all_headers.items():
+            if value is not None:
+                conn.putheader(key, value)
+        conn.endheaders()
+        if body is not None:
+            conn.send(body)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+
+
+class ControlServerTest(ServerMixin, unittest.TestCase):
+    def test_submit_and_list(self):
+        status, data = self.request("POST", "/jobs", {"url": " https://x.com/a.iso ", "save_path": "/dados",
+                                                      "mirrors": ["https://y.com/a.iso"]})
+        self.assertEqual(status, 201)
+        self.assertEqual((data["job"]["url"], data["job"]["save_path"], data["job"]["num_threads"]),
+                         ("https://x.com/a.iso", "/dados", 4))
+        status, data = self.request("GET", "/jobs")
+        self.assertEqual((status, len(data["jobs"])), (200, 1))
+        self.assertEqual(self.request("GET", "/jobs/1")[0], 200)
+        self.assertEqual(self.request("GET", "/jobs/9")[0], 404)
+
+    def test_job_actions(self):
+        self.request("POST", "/jobs", {"url": "https://x.com/a.iso"})
+        self.assertEqual(self.request("POST", "/jobs/1/pause", {})[0], 200)
+        self.assertEqual(self.request("POST", "/jobs/1/limit", {"max_speed": 500})[0], 200)
+        self.assertEqual(self.request("POST", "/jobs/1/limit", {"max_speed": "rápido"})[0], 400)
+        self.assertEqual(self.request("POST", "/jobs/1/voar", {})[0], 404)
+        self.assertEqual(self.request("POST", "/jobs/2/cancel", {})[0], 404)
+        self.assertEqual(self.queue.calls, [("pause", 1), ("limit", 1, 500)])
+
+    def test_foreign_host_is_rejected(self):
+        for host in ("evil.example:80", f"evil.example:{self.server.port}", None):
+            with self.subTest(host=host):
+                status, _ = self.request("GET", "/jobs", headers={"Host": host})
+                self.assertEqual(status, 403)
+        self.assertEqual(self.request("GET", "/jobs", host=f"localhost:{self.server.port}")[0], 200)
+
+    def test_token_is_required(self):
+        self.assertEqual(self.request("GET", "/jobs", headers={"Authorization": None})[0], 401)
+        self.assertEqual(self.request("GET", "/jobs", headers={"Authorization": "Bearer outro"})[0], 401)
+
+    def test_invalid_bodies(self):
+        cases = [
+            ({"url": ""}, {}, 400),
+            ({"url": "https://x.com/a", "mirrors": "https://y.com/a"}, {}, 400),
+            ({"url": "https://x.com/a", "num_threads": "muitas"}, {}, 400),
+            ({"url": "https://x.com/a", "save_path": ["/a"]}, {}, 400),
+            ({"url": "https://x.com/a", "checksum": 123}, {}, 400),
+            (b"{nada", {}, 400),
+            (b"[1, 2]", {}, 400),
+            ({"url": "https://x.com/a"}, {"Content-Type": "text/plain"}, 415),
+        ]
+        for body, headers, expected in cases:
+            with self.subTest(body=body):
+                self.assertEqual(self.request("POST", "/jobs", body, headers)[0], expected)
+        self.assertEqual(self.queue.jobs, {})
+
+    def test_bad_content_length(self):
+        for length in ("abc", "-5", "1e3", "²"):
+            with self.subTest(length=length):
+                status, data = self.request("POST", "/jobs", {"url": "https://x.com/a"},
+                                            {"Content-Length": length})
+                self.assertEqual(status, 400)
+        status, _ = self.request("POST", "/jobs", {"url": "https://x.com/a"},
+                                 {"Content-Length": str(MAX_BODY + 1)})
+        self.assertEqual(status, 413)
+        # O servidor continua atendendo
+        self.assertEqual(self.request("GET", "/jobs")[0], 200)
+
+    def test_events_start_with_every_job(self):
+        self.request("POST", "/jobs", {"url": "https://x.com/a.iso"})
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=5)
+        self.addCleanup(conn.close)
+        conn.request("GET", "/events", headers={"Authorization": f"Bearer {self.token}"})
+        response = conn.getresponse()
+        self.assertEqual(response.getheader("Content-Type"), "text/event-stream")
+        self.assertEqual(response.readline(), b"event: job\n")
+        self.assertEqual(json.loads(response.readline()[len(b"data: "):])["id"], 1)
+
+
+class ControlServerWithoutTokenTest(ServerMixin, unittest.TestCase):
+    token = None
+
+    def test_save_path_needs_a_token(self):
+        status, _ = self.request("POST", "/jobs", {"url": "https://x.com/a.iso", "save_path": "/dados"})
+        self.assertEqual(status, 403)
+        status, data = self.request("POST", "/jobs", {"url": "https://x.com/a.iso"})
+        self.assertEqual((status, data["job"]["save_path"]), (201, "/padrao"))
+
+    def test_no_authorization_needed(self):
+        self.assertEqual(self.request("GET", "/jobs")[0], 200)
+        self.assertEqual(self.request("GET", "/jobs", headers={"Host": "evil.example"})[0], 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
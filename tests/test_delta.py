@@ -0,0 +1,128 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from core.delta import (MANIFEST_SUFFIX, build_manifest, copy_blocks, find_blocks, manifest_url,
+                        missing_ranges, parse_manifest, write_manifest)
+
+BLOCK = 1024
+
+
+class MemoryWriter:
+    def __init__(self, size):
+        self.data = bytearray(size)
+
+    def write_at(self, data, offset):
+        self.data[offset:offset + len(data)] = data
+
+
+class DeltaTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.random = random.Random(42)
+        self.old = self.random.randbytes(64 * BLOCK + 300)
+
+    def path(self, name, data):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def rebuild(self, new):
+        """Monta o arquivo novo como o motor faria: blocos copiados + faixas baixadas de `new`."""
+        manifest = build_manifest(self.path("novo.bin", new), BLOCK)
+        old_path = self.path("antigo.bin", self.old)
+        found = find_blocks(manifest, old_path)
+        writer = MemoryWriter(len(new))
+        copy_blocks(manifest, found, old_path, writer)
+        ranges = missing_ranges(manifest, found, merge_gap=0)
+        for start, end in ranges:
+            writer.write_at(new[start:end + 1], start)
+        self.assertEqual(bytes(writer.data), new)
+        return manifest, found, ranges
+
+    def test_in_place_edits(self):
+        new = bytearray(self.old)
+        for offset in (5 * BLOCK + 10, 30 * BLOCK, 50 * BLOCK + 999):
+            new[offset] ^= 0xff
+        manifest, found, ranges = self.rebuild(bytes(new))
+        self.assertEqual(ranges, [(5 * BLOCK, 6 * BLOCK - 1), (30 * BLOCK, 31 * BLOCK - 1),
+                                  (50 * BLOCK, 51 * BLOCK - 1), (64 * BLOCK, 64 * BLOCK + 299)])
+        self.assertEqual(len(found), 61)
+
+    def test_insertion_shifts_the_rest(self):
+        new = self.old[:10 * BLOCK + 7] + b"inserido" * 50 + self.old[10 * BLOCK + 7:]
+        manifest, found, ranges = self.rebuild(new)
+        # Só os blocos que cobrem a inserção e a cauda são baixados
+        downloaded = sum(end - start + 1 for start, end in ranges)
+        self.assertLessEqual(downloaded, 3 * BLOCK + 400 + BLOCK)
+        self.assertEqual(found[20], 20 * BLOCK - 400)
+
+    def test_deletion(self):
+        new = self.old[:20 * BLOCK + 100] + self.old[22 * BLOCK:]
+        manifest, found, ranges = self.rebuild(new)
+        downloaded = sum(end - start + 1 for start, end in ranges)
+        self.assertLessEqual(downloaded, 3 * BLOCK)
+
+    def test_long_replacement_that_changes_the_size(self):
+        # Mais que ROLL_LIMIT bytes do antigo somem e o resto fica deslocado por 37 bytes
+        new = self.old[:10 * BLOCK] + self.random.randbytes(20 * BLOCK + 37) + self.old[30 * BLOCK:]
+        with mock.patch("core.delta.ROLL_LIMIT", 8 * BLOCK), mock.patch("core.delta.ROLL_EVERY", 4):
+            manifest, found, ranges = self.rebuild(new)
+        self.assertEqual(sorted(found), list(range(10)) + list(range(31, 64)))
+        self.assertEqual(found[31], 30 * BLOCK + BLOCK - 37)
+
+    def test_unrelated_old_file(self):
+        new = self.random.randbytes(len(self.old))
+        manifest, found, ranges = self.rebuild(new)
+        self.assertEqual(found, {})
+        self.assertEqual(ranges, [(0, len(new) - 1)])
+
+    def test_cancelled_scan(self):
+        manifest = build_manifest(self.path("novo.bin", self.old), BLOCK)
+        self.assertIsNone(find_blocks(manifest, self.path("antigo.bin", self.old), lambda: False))
+
+    def test_missing_ranges_merges_close_gaps(self):
+        manifest = {"block_size": BLOCK, "size": 10 * BLOCK - 1, "blocks": [None] * 10}
+        found = {0: 0, 2: 0, 5: 0, 6: 0, 7: 0}
+        self.assertEqual(missing_ranges(manifest, found, merge_gap=0),
+                         [(BLOCK, 2 * BLOCK - 1), (3 * BLOCK, 5 * BLOCK - 1), (8 * BLOCK, 10 * BLOCK - 2)])
+        self.assertEqual(missing_ranges(manifest, found, merge_gap=BLOCK),
+                         [(BLOCK, 5 * BLOCK - 1), (8 * BLOCK, 10 * BLOCK - 2)])
+        self.assertEqual(missing_ranges(manifest, dict.fromkeys(range(10), 0)), [])
+
+
+class ManifestTest(unittest.TestCase):
+    def test_manifest_url_keeps_the_query(self):
+        self.assertEqual(manifest_url("https://x.com/a/imagem.iso?token=1"),
+                         "https://x.com/a/imagem.iso" + MANIFEST_SUFFIX + "?token=1")
+
+    def test_write_and_parse(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "arquivo.bin")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(2500))
+            target = write_manifest(path, 1024)
+            self.assertEqual(target, path + MANIFEST_SUFFIX)
+            with open(target, 'rb') as f:
+                manifest = parse_manifest(f.read())
+        self.assertEqual((manifest["size"], manifest["block_size"], len(manifest["blocks"])), (2500, 1024, 3))
+
+    def test_parse_rejects_invalid_manifests(self):
+        valid = {"version": 1, "size": 2500, "block_size": 1024, "sha256": "ab", "blocks": [[1, "a"]] * 3}
+        self.assertIsNotNone(parse_manifest(json.dumps(valid)))
+        for change in ({"version": 2}, {"block_size": 0}, {"size": -1}, {"blocks": [[1, "a"]] * 2},
+                       {"sha256": None}, {"size": "2500"}):
+            with self.subTest(change=change):
+                self.assertIsNone(parse_manifest(json.dumps({**valid, **change})))
+        for data in (b"", b"nada", b"[]", json.dumps({"version": 1}).encode()):
+            with self.subTest(data=data):
+                self.assertIsNone(parse_manifest(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from core import download_queue
+from core.download_queue import CANCELLED, COMPLETED, PAUSED, QUEUED, RUNNING, DownloadQueue
+from core.journal import JOURNAL_SUFFIX
+
+from tests.support import use_temp_database
+
+
+class FakeLogic:
+    """Download que só termina quando o teste manda (finish) ou quando é interrompido."""
+    def __init__(self, callbacks, folder):
+        self.callbacks = callbacks
+        self.folder = folder
+        self.partial_file = None
+        self.done = threading.Event()
+        self.stopped = False
+
+    def set_speed_limit(self, limit):
+        pass
+
+    def download_file_manager(self, url, save_path, num_threads, checksum=None, mirrors=None):
+        self.partial_file = os.path.join(save_path, os.path.basename(url))
+        for path in (self.partial_file, self.partial_file + JOURNAL_SUFFIX):
+            with open(path, 'wb') as f:
+                f.write(b"parcial")
+        self.done.wait(5)
+        if not self.stopped:
+            self.partial_file = None
+            self.callbacks["on_complete"](os.path.basename(url))
+
+    def stop_download(self, cancelled=False):
+        self.stopped = True
+        self.callbacks["on_status_change"]("cancelado")
+        self.done.set()
+
+
+class DownloadQueueTest(unittest.TestCase):
+    def setUp(self):
+        use_temp_database(self)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.logics = []
+
+        def create(lang, callbacks, settings, **kwargs):
+            logic = FakeLogic(callbacks, self.folder)
+            self.logics.append(logic)
+            return logic
+
+        patch = mock.patch.object(download_queue, "create_download_logic", create)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.queue = DownloadQueue(None, max_active_jobs=1, settings={})
+
+    def wait_for(self, predicate, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() > deadline:
+                self.fail("a fila não chegou ao estado esperado")
+            time.sleep(0.01)
+
+    def state(self, job_id):
+        job = self.queue.get_job(job_id)
+        return job and job["state"]
+
+    def add(self, name):
+        return self.queue.add(f"https://exemplo.com/{name}", self.folder, 4)
+
+    def partial(self, name):
+        return os.path.join(self.folder, name)
+
+    def test_runs_up_to_max_active_jobs(self):
+        first, second = self.add("a.bin"), self.add("b.bin")
+        self.assertEqual((self.state(first), self.state(second)), (RUNNING, QUEUED))
+        self.logics[0].done.set()
+        self.wait_for(lambda: self.state(second) == RUNNING)
+        self.assertEqual(self.state(first), COMPLETED)
+
+    def test_listener_can_call_back_into_the_queue(self):
+        # O listener cancela o job ao vê-lo rodando, em outra thread (como uma GUI
+        # que repassa o aviso para a própria thread) e espera a resposta
+        cancelled, stuck = set(), []
+
+        def listener(job):
+            if job["state"] == RUNNING and job["id"] not in cancelled:
+                cancelled.add(job["id"])
+                other = threading.Thread(target=self.queue.cancel, args=(job["id"],), daemon=True)
+                other.start()
+                other.join(2)
+                stuck.append(other.is_alive())
+        self.queue.add_listener(listener)
+        adder = threading.Thread(target=self.add, args=("a.bin",), daemon=True)
+        adder.start()
+        adder.join(5)
+        self.assertFalse(adder.is_alive(), "a fila travou chamando o listener")
+        self.wait_for(lambda: self.queue.list_jobs() and self.queue.list_jobs()[0]["state"] == CANCELLED)
+        self.assertEqual(stuck, [False])
+
+    def test_cancel_deletes_the_partial_file_and_journal(self):
+        job_id = self.add("a.bin")
+        self.wait_for(lambda: os.path.exists(self.partial("a.bin")))
+        self.queue.cancel(job_id)
+        self.wait_for(lambda: self.state(job_id) == CANCELLED)
+        self.assertFalse(os.path.exists(self.partial("a.bin")))
+        self.assertFalse(os.path.exists(self.partial("a.bin") + JOURNAL_SUFFIX))
+
+    def test_pause_keeps_the_partial_file_until_cancelled(self):
+        job_id = self.add("a.bin")
+        self.wait_for(lambda: os.path.exists(self.partial("a.bin")))
+        self.queue.pause(job_id)
+        self.wait_for(lambda: self.state(job_id) == PAUSED)
+        self.assertTrue(os.path.exists(self.partial("a.bin") + JOURNAL_SUFFIX))
+        self.queue.cancel(job_id)
+        self.assertEqual(self.state(job_id), CANCELLED)
+        self.assertFalse(os.path.exists(self.partial("a.bin")))
+
+    def test_completed_file_is_kept(self):
+        job_id = self.add("a.bin")
+        self.wait_for(lambda: os.path.exists(self.partial("a.bin")))
+        self.logics[0].done.set()
+        self.wait_for(lambda: self.state(job_id) == COMPLETED)
+        self.queue.cancel(job_id) # Já terminou: não faz nada
+        self.assertTrue(os.path.exists(self.partial("a.bin")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+import requests
+
+from core.downloader import ChunkReader, DownloadLogic, body_reader
+from tests.support import FakeLang, LocalServer, use_temp_database
+
+
+class WorkerIdsTest(unittest.TestCase):
+    def setUp(self):
+        self.logic = DownloadLogic(None, {})
+        self.addCleanup(self.logic.connection_pool.close)
+        self.started = []
+
+    def spawn(self, count=1):
+        for _ in range(count):
+            self.logic._spawn_worker(self.started.append)
+
+    def test_retire_and_spawn_cycles_reuse_ids(self):
+        self.spawn(4)
+        for cycle in range(50):
+            worker = cycle % 4
+            self.logic.thread_stats[worker]['downloaded'] += 10
+            retired = cycle % 2 == 0
+            if retired:
+                self.logic.running_workers -= 1 # Como em _should_retire_worker
+            self.logic._worker_exited(worker, retired)
+            self.spawn()
+        self.assertEqual(sorted(self.logic.thread_stats), [0, 1, 2, 3])
+        self.assertEqual(self.logic.running_workers, 4)
+        # Os bytes dos workers encerrados continuam no total
+        self.assertEqual(self.logic.current_downloaded(), 500)
+
+    def test_exit_clears_the_segment(self):
+        self.spawn(2)
+        self.logic.thread_stats[1]['segment'] = object()
+        self.logic._worker_exited(1)
+        self.assertIsNone(self.logic.thread_stats[1]['segment'])
+        self.assertEqual(self.logic.running_workers, 1)
+
+
+class BodyReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(300 * 1024 + 5)
+        self.server = LocalServer({"/a.bin": self.data, "/z.bin": self.data}, gzip_paths=["/z.bin"])
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+
+    def read_all(self, reader, size=64 * 1024):
+        buffer = memoryview(bytearray(size))
+        parts = []
+        while True:
+            n = reader.readinto(buffer)
+            if not n:
+                return b"".join(parts)
+            parts.append(bytes(buffer[:n]))
+
+    def get(self, path, **headers):
+        return self.session.get(self.server.url(path), headers=headers, stream=True, timeout=10)
+
+    def test_identity_body_reads_straight_from_http_client(self):
+        with self.get("/a.bin", Range="bytes=100-", **{"Accept-Encoding": "identity"}) as response:
+            reader = body_reader(response, 64 * 1024)
+            self.assertNotIsInstance(reader, ChunkReader)
+            self.assertEqual(self.read_all(reader), self.data[100:])
+
+    def test_compressed_body_goes_through_requests(self):
+        with self.get("/z.bin") as response:
+            reader = body_reader(response, 64 * 1024)
+            self.assertIsInstance(reader, ChunkReader)
+            self.assertEqual(self.read_all(reader, 1000), self.data) # Já descomprimido
+
+    def test_urllib3_without_fp_falls_back(self):
+        with self.get("/a.bin") as response:
+            fp = response.raw._fp
+            del response.raw._fp # Versão do urllib3 sem o atributo interno
+            try:
+                reader = body_reader(response, 4096)
+            finally:
+                response.raw._fp = fp
+            self.assertIsInstance(reader, ChunkReader)
+            self.assertEqual(self.read_all(reader, 777), self.data)
+
+    def test_decoding_urllib3_falls_back(self):
+        with self.get("/a.bin") as response:
+            response.raw.decode_content = True
+            self.assertIsInstance(body_reader(response, 4096), ChunkReader)
+
+
+class ConditionalDownloadTest(unittest.TestCase):
+    """Baixar de novo a mesma URL na mesma pasta vira uma sondagem condicional."""
+    def setUp(self):
+        use_temp_database(self)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.path = os.path.join(self.folder, "a.bin")
+        self.data = os.urandom(2 * 1024 * 1024)
+        self.server = LocalServer({"/a.bin": self.data})
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def download(self, checksum=None):
+        logic = DownloadLogic(FakeLang(), {})
+        self.addCleanup(logic.connection_pool.close)
+        del self.server.requests[:]
+        logic.download_file_manager(self.server.url("/a.bin"), self.folder, 4, checksum=checksum)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        return logic
+
+    def change_locally(self):
+        with open(self.path, 'r+b') as f:
+            f.write(b"x" * 10)
+        os.utime(self.path, (0, 2000)) # Outro mtime, mesmo tamanho
+
+    def test_unchanged_file_is_not_downloaded_again(self):
+        self.assertIsNone(self.download().source)
+        logic = self.download()
+        self.assertEqual(logic.source, "not_modified")
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[0][2].get("If-None-Match"), '"v1"')
+
+    def test_changed_file_without_hash_is_downloaded_again(self):
+        self.download()
+        self.change_locally()
+        self.assertIsNone(self.download().source)
+
+    def test_stored_hash_decides_after_a_touch(self):
+        checksum = "sha256:" + hashlib.sha256(self.data).hexdigest()
+        self.download(checksum)
+        os.utime(self.path, (0, 1000)) # Só o mtime mudou: o hash ainda confere
+        self.assertEqual(self.download(checksum).source, "not_modified")
+        self.change_locally()
+        self.assertIsNone(self.download(checksum).source)
+
+    def test_missing_file_is_downloaded_again(self):
+        self.download()
+        os.remove(self.path)
+        logic = self.download()
+        self.assertIsNone(logic.source)
+        self.assertNotIn("If-None-Match", self.server.requests[0][2])
+
+
+if __name__ == "__main__":
+    unittest.main()
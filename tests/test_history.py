@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from core.history import _INSERT_COLUMNS, HistoryStore, fts_query, host_of
+
+
+def row(url, timestamp, path="/downloads"):
+    """Linha no formato de _INSERT_COLUMNS, com timestamp escolhido pelo teste."""
+    values = {"url": url, "path": path, "filename": url.rsplit("/", 1)[-1], "timestamp": timestamp,
+              "size": 100, "duration": 1.0, "avg_speed": 100.0, "host": host_of(url)}
+    return tuple(values.get(column) for column in _INSERT_COLUMNS.split(", "))
+
+
+class HistoryStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.store = HistoryStore(db_file=os.path.join(self.dir.name, "historico.db"))
+        self.addCleanup(self.store.close)
+        self.store.open()
+
+    def insert(self, *rows):
+        self.store._write(list(rows))
+
+    def test_page_walks_equal_timestamps_without_gaps(self):
+        # Lote importado de uma vez: muitas linhas com o mesmo timestamp
+        self.insert(*(row(f"https://a.com/f{i}.bin", "2024-01-02 10:00:00") for i in range(25)))
+        self.insert(*(row(f"https://a.com/g{i}.bin", "2024-01-01 10:00:00") for i in range(7)))
+        seen, before = [], None
+        while True:
+            rows = self.store.page(before, limit=10)
+            if not rows:
+                break
+            seen.extend(r[0] for r in rows)
+            before = (rows[-1][4], rows[-1][0])
+        self.assertEqual(len(seen), 32)
+        self.assertEqual(len(set(seen)), 32)
+        expected = [r[0] for r in self.store.page(limit=100)]
+        self.assertEqual(seen, expected)
+
+    def test_newer(self):
+        self.insert(row("https://a.com/velho.bin", "2024-01-01 10:00:00"))
+        key = self.store.page(limit=1)[0]
+        self.insert(row("https://a.com/mesmo.bin", "2024-01-01 10:00:00"),
+                    row("https://a.com/novo.bin", "2024-01-03 10:00:00"))
+        names = [r[3] for r in self.store.newer((key[4], key[0]))]
+        self.assertEqual(names, ["novo.bin", "mesmo.bin"])
+
+    def _search_cases(self):
+        self.insert(row("https://downloads.exemplo.com/ubuntu-24.04.iso", "2024-03-10 12:00:00"),
+                    row("https://mirror.org/ubuntu-22.04.iso", "2024-02-10 12:00:00"),
+                    row("https://downloads.exemplo.com/relatorio.pdf", "2024-01-10 12:00:00", "/docs"))
+        names = lambda rows: sorted(r[3] for r in rows)
+        self.assertEqual(names(self.store.search("ubun")), ["ubuntu-22.04.iso", "ubuntu-24.04.iso"])
+        self.assertEqual(names(self.store.search("ubuntu", host="Downloads.Exemplo.com")), ["ubuntu-24.04.iso"])
+        self.assertEqual(names(self.store.search("docs")), ["relatorio.pdf"])
+        self.assertEqual(names(self.store.search("", since="2024-02-10", until="2024-03-09")), ["ubuntu-22.04.iso"])
+        self.assertEqual(names(self.store.search(until="2024-01-10")), ["relatorio.pdf"])
+        self.assertEqual(self.store.search("inexistente"), [])
+        # Sem texto: dos mais recentes para os mais antigos
+        self.assertEqual([r[3] for r in self.store.search()],
+                         ["ubuntu-24.04.iso", "ubuntu-22.04.iso", "relatorio.pdf"])
+
+    def test_search(self):
+        self._search_cases()
+
+    def test_search_without_fts(self):
+        self.store.fts = False
+        self._search_cases()
+
+    def test_search_rejects_bad_dates(self):
+        with self.assertRaises(ValueError):
+            self.store.search(since="10/01/2024")
+
+
+class HelpersTest(unittest.TestCase):
+    def test_fts_query_quotes_terms(self):
+        self.assertEqual(fts_query('ubuntu 24 "iso" OR'), '"ubuntu"* "24"* "iso"* "OR"*')
+        self.assertEqual(fts_query("  -*  "), "")
+
+    def test_host_of(self):
+        self.assertEqual(host_of("https://Exemplo.COM:8443/a"), "exemplo.com")
+        self.assertEqual(host_of("não é url"), "")
+        self.assertEqual(host_of("http://[::1"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
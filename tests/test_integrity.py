@@ -0,0 +1,140 @@
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from core import integrity
+from core.integrity import PrefixHasher, hash_file_range, parse_checksum
+from core.segments import SegmentScheduler
+
+SHA256_A = hashlib.sha256(b"a").hexdigest()
+MD5_A = hashlib.md5(b"a").hexdigest()
+
+
+class FakeResponse:
+    def __init__(self, text, status=200):
+        self.text = text
+        self.status = status
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise OSError(f"HTTP {self.status}")
+
+
+class FakeSession:
+    def __init__(self, text, status=200):
+        self.text = text
+        self.status = status
+        self.requests = []
+
+    def get(self, url, timeout=None):
+        self.requests.append(url)
+        return FakeResponse(self.text, self.status)
+
+
+class ParseChecksumTest(unittest.TestCase):
+    def test_algorithm_from_length(self):
+        self.assertEqual(parse_checksum(SHA256_A), ("sha256", SHA256_A))
+        self.assertEqual(parse_checksum(MD5_A.upper()), ("md5", MD5_A))
+
+    def test_explicit_algorithm(self):
+        self.assertEqual(parse_checksum(f"SHA-256:{SHA256_A}"), ("sha256", SHA256_A))
+        self.assertEqual(parse_checksum(f" md5:{MD5_A} "), ("md5", MD5_A))
+
+    def test_invalid_values(self):
+        for value in ("", "xyz", "abc123", f"md5:{SHA256_A}", f"nada:{MD5_A}", SHA256_A[:-1] + "g"):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_checksum(value)
+
+    def test_sidecar_picks_the_line_of_the_file(self):
+        text = f"# comentário\n{MD5_A}  outro.iso\n{SHA256_A} *pasta/imagem.iso\n"
+        session = FakeSession(text.replace(MD5_A, SHA256_A[::-1]))
+        self.assertEqual(parse_checksum("https://x/SHA256SUMS.sha256", "imagem.iso", session),
+                         ("sha256", SHA256_A))
+
+    def test_sidecar_bsd_format_and_single_line(self):
+        session = FakeSession(f"SHA256 (imagem.iso) = {SHA256_A}\n")
+        self.assertEqual(parse_checksum("https://x/imagem.iso.sha256", "imagem.iso", session),
+                         ("sha256", SHA256_A))
+        session = FakeSession(f"{MD5_A}\n")
+        self.assertEqual(parse_checksum("https://x/imagem.iso.md5", "outro.iso", session), ("md5", MD5_A))
+
+    def test_sidecar_is_fetched_once_with_a_cache(self):
+        session = FakeSession(f"{SHA256_A}  imagem.iso\n")
+        cache = {}
+        for _ in range(3):
+            parse_checksum("https://x/imagem.iso.sha256", "imagem.iso", session, cache)
+        self.assertEqual(len(session.requests), 1)
+
+    def test_sidecar_http_error_propagates(self):
+        with self.assertRaises(OSError):
+            parse_checksum("https://x/imagem.iso.sha256", "imagem.iso", FakeSession("", status=404))
+
+
+class FileHashTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "dados.bin")
+        self.data = os.urandom(3 * 1024 * 1024 + 17)
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+    def test_hash_file_range(self):
+        hasher = hashlib.sha256()
+        with open(self.path, 'rb') as f:
+            hash_file_range(hasher, f.fileno(), 100, 200000)
+        self.assertEqual(hasher.hexdigest(), hashlib.sha256(self.data[100:200000]).hexdigest())
+
+    def test_prefix_hasher_on_finished_download(self):
+        scheduler = SegmentScheduler(len(self.data), 4, min_split=512 * 1024)
+        while True:
+            segment = scheduler.next_segment()
+            if segment is None:
+                break
+            segment.position = segment.end + 1
+            scheduler.finish(segment)
+        hasher = PrefixHasher("sha256", self.path, scheduler)
+        try:
+            self.assertEqual(hasher.finish(len(self.data)), hashlib.sha256(self.data).hexdigest())
+        finally:
+            hasher.close()
+
+    def test_prefix_hasher_with_segments_finishing_out_of_order(self):
+        # O arquivo começa zerado (reservado) e os segmentos terminam fora de ordem
+        with open(self.path, 'r+b') as f:
+            f.write(bytes(len(self.data)))
+        scheduler = SegmentScheduler(len(self.data), 4, min_split=512 * 1024)
+        segments = [scheduler.next_segment() for _ in range(4)]
+        fd = os.open(self.path, os.O_RDWR)
+        self.addCleanup(os.close, fd)
+
+        def complete(segment):
+            os.pwrite(fd, self.data[segment.start:segment.end + 1], segment.start)
+            segment.position = segment.end + 1
+            scheduler.finish(segment)
+
+        with mock.patch.object(integrity, "PREFIX_INTERVAL", 0.01):
+            hasher = PrefixHasher("sha256", self.path, scheduler)
+            try:
+                for segment in segments[1:]:
+                    complete(segment)
+                time.sleep(0.1)
+                self.assertEqual(hasher.position, 0) # O primeiro segmento segura o prefixo
+                segments[0].position = segments[0].start + 1000 # Parte do primeiro chega
+                os.pwrite(fd, self.data[:1000], 0)
+                deadline = time.monotonic() + 5
+                while hasher.position < 1000 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(hasher.position, 1000)
+                complete(segments[0])
+                self.assertEqual(hasher.finish(len(self.data)), hashlib.sha256(self.data).hexdigest())
+            finally:
+                hasher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+import unittest
+
+from core.journal import DownloadJournal, build_validator, if_range_value, validator_matches
+
+
+class ValidatorTest(unittest.TestCase):
+    def test_build_validator(self):
+        headers = {'ETag': '"abc"', 'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'}
+        self.assertEqual(build_validator(headers, 10),
+                         {"etag": '"abc"', "last_modified": 'Wed, 01 Jan 2025 00:00:00 GMT', "size": 10})
+
+    def test_if_range_prefers_strong_etag(self):
+        self.assertEqual(if_range_value({"etag": '"abc"', "last_modified": "data"}), '"abc"')
+        self.assertEqual(if_range_value({"etag": 'W/"abc"', "last_modified": "data"}), "data")
+        self.assertIsNone(if_range_value({"etag": None, "last_modified": None}))
+
+    def test_size_must_always_match(self):
+        saved = {"etag": '"a"', "last_modified": None, "size": 10}
+        self.assertTrue(validator_matches(saved, {"etag": '"a"', "last_modified": None, "size": 10}))
+        self.assertFalse(validator_matches(saved, {"etag": '"a"', "last_modified": None, "size": 11}))
+        self.assertFalse(validator_matches(None, saved))
+
+    def test_validators_compared_only_when_both_sides_have_them(self):
+        saved = {"etag": '"a"', "last_modified": "ontem", "size": 10}
+        self.assertFalse(validator_matches(saved, {"etag": '"b"', "last_modified": "ontem", "size": 10}))
+        self.assertFalse(validator_matches(saved, {"etag": '"a"', "last_modified": "hoje", "size": 10}))
+        # O servidor parou de mandar ETag: vale o Last-Modified
+        self.assertTrue(validator_matches(saved, {"etag": None, "last_modified": "ontem", "size": 10}))
+        self.assertTrue(validator_matches(saved, {"etag": None, "last_modified": None, "size": 10}))
+
+
+class DownloadJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.filename = os.path.join(self.dir.name, "arquivo.bin")
+        with open(self.filename, 'wb') as f:
+            f.truncate(100)
+        self.validator = {"etag": '"a"', "last_modified": None, "size": 100}
+        self.journal = DownloadJournal(self.filename)
+
+    def test_save_and_load(self):
+        with open(self.filename, 'rb+') as f:
+            self.journal.save("http://x/arquivo.bin", self.validator, [(0, 49, 20), (50, 99, 100)], f.fileno())
+        state = self.journal.load()
+        self.assertEqual(state["url"], "http://x/arquivo.bin")
+        self.assertEqual(state["validator"], self.validator)
+        self.assertEqual(DownloadJournal.missing_ranges(state), [(20, 49)])
+        self.assertEqual(DownloadJournal.downloaded_bytes(state), 70)
+
+    def test_load_rejects_partial_file_of_other_size(self):
+        self.journal.save("u", self.validator, [(0, 99, 0)])
+        with open(self.filename, 'wb') as f:
+            f.truncate(50)
+        self.assertIsNone(self.journal.load())
+
+    def test_load_rejects_missing_file_corrupt_json_and_other_versions(self):
+        self.journal.save("u", self.validator, [(0, 99, 0)])
+        with open(self.journal.path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        state["version"] = 999
+        with open(self.journal.path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        self.assertIsNone(self.journal.load())
+        with open(self.journal.path, 'w', encoding='utf-8') as f:
+            f.write("{corrompido")
+        self.assertIsNone(self.journal.load())
+        self.journal.save("u", self.validator, [(0, 99, 0)])
+        os.remove(self.filename)
+        self.assertIsNone(self.journal.load())
+
+    def test_remove(self):
+        self.journal.save("u", self.validator, [(0, 99, 0)])
+        self.journal.remove()
+        self.assertFalse(os.path.exists(self.journal.path))
+        self.assertIsNone(self.journal.load())
+        self.journal.remove() # Sem journal: não falha
+
+
+if __name__ == "__main__":
+    unittest.main()
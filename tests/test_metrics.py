@@ -0,0 +1,69 @@
+import unittest
+
+from core.connections import ConnectionPool
+from core.metrics import PREFIX, Histogram, Metrics
+
+
+class FakeLogic:
+    def __init__(self, pool, resumed=0):
+        self.connection_pool = pool
+        self.resumed_bytes = resumed
+        self.downloaded = resumed
+
+    def current_downloaded(self):
+        return self.downloaded
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool()
+        self.addCleanup(self.pool.close)
+        self.metrics = Metrics()
+
+    def lines(self):
+        return self.metrics.render().splitlines()
+
+    def test_histogram_buckets(self):
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual((histogram.sum, histogram.count), (14.5, 4))
+
+    def test_bytes_count_only_this_session(self):
+        logic = FakeLogic(self.pool, resumed=1000)
+        self.metrics.download_started(logic, "https://Exemplo.com/a.iso")
+        logic.downloaded = 1500
+        self.metrics.sample(logic, {"downloaded": 1500, "speed": 250.0})
+        self.assertIn(f'{PREFIX}_throughput_bytes_per_second{{host="exemplo.com:443"}} 250', self.lines())
+        logic.downloaded = 3000
+        self.metrics.download_finished(logic, "completed")
+        lines = self.lines()
+        self.assertIn(f'{PREFIX}_bytes_total{{host="exemplo.com:443"}} 2000', lines)
+        self.assertIn(f'{PREFIX}_downloads_total{{result="completed"}} 1', lines)
+        self.assertIn(f'{PREFIX}_job_duration_seconds_count{{result="completed"}} 1', lines)
+        # Terminado: sai da vazão atual
+        self.assertFalse(any(line.startswith(f"{PREFIX}_throughput_bytes_per_second{{") for line in lines))
+
+    def test_write_latency_merges_on_finish(self):
+        logic = FakeLogic(self.pool)
+        self.metrics.download_started(logic, "https://exemplo.com/a.iso")
+        self.metrics.write_histogram(logic).observe(0.0002)
+        self.assertIn(f"{PREFIX}_disk_write_seconds_count 1", self.lines())
+        self.metrics.download_finished(logic, "cancelled")
+        self.metrics.download_finished(logic, "cancelled") # Repetido: ignorado
+        lines = self.lines()
+        self.assertIn(f"{PREFIX}_disk_write_seconds_count 1", lines)
+        self.assertIn(f'{PREFIX}_disk_write_seconds_bucket{{le="0.00025"}} 1', lines)
+        self.assertIn(f'{PREFIX}_downloads_total{{result="cancelled"}} 1', lines)
+
+    def test_label_values_are_escaped(self):
+        logic = FakeLogic(self.pool)
+        self.metrics.download_started(logic, 'https://exemplo.com/a.iso')
+        self.metrics.active[id(logic)].host = 'a"b\\c'
+        self.metrics.retry(logic)
+        self.assertIn(f'{PREFIX}_segment_retries_total{{host="a\\"b\\\\c"}} 1', self.lines())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import contextlib
+import io
+import unittest
+
+from core.mirrors import MIRROR_MAX_FAILURES, MIRROR_MIN_SAMPLE, Mirror, MirrorSet
+
+MB = 1024 * 1024
+
+
+class MirrorSetTest(unittest.TestCase):
+    def setUp(self):
+        self.a, self.b = Mirror("https://a.com/f.iso"), Mirror("https://b.com/f.iso")
+        self.mirrors = MirrorSet([self.a, self.b])
+
+    def pick_many(self, count):
+        picked = [self.mirrors.pick() for _ in range(count)]
+        return picked.count(self.a), picked.count(self.b)
+
+    def test_unmeasured_mirrors_are_tried_in_turn(self):
+        self.assertEqual(self.pick_many(4), (2, 2))
+
+    def test_segments_follow_the_measured_rate(self):
+        self.mirrors.record(self.a, 3 * MB, 1.0)
+        self.mirrors.record(self.b, MB, 1.0)
+        self.assertEqual(self.pick_many(40), (30, 10))
+
+    def test_small_transfers_do_not_measure(self):
+        self.mirrors.record(self.a, MIRROR_MIN_SAMPLE - 1, 0.001)
+        self.assertIsNone(self.a.rate)
+        self.assertEqual(self.a.bytes, MIRROR_MIN_SAMPLE - 1)
+
+    def test_slow_mirror_is_dropped(self):
+        self.mirrors.record(self.a, 10 * MB, 1.0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.mirrors.record(self.b, MB, 1.0)
+        self.assertEqual(self.mirrors.alive(), [self.a])
+        self.assertEqual(self.pick_many(3), (3, 0))
+
+    def test_failures_in_a_row_drop_a_mirror(self):
+        self.assertTrue(self.mirrors.can_fail_over(self.a))
+        for _ in range(MIRROR_MAX_FAILURES - 1):
+            self.mirrors.failed(self.a, "timeout")
+            self.mirrors.record(self.a, MB, 1.0) # Um sucesso zera a contagem
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(MIRROR_MAX_FAILURES):
+                self.mirrors.failed(self.a, "timeout")
+        self.assertFalse(self.a.alive)
+        self.assertFalse(self.mirrors.can_fail_over(self.b))
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(MIRROR_MAX_FAILURES):
+                self.mirrors.failed(self.b, "timeout")
+        self.assertIsNone(self.mirrors.pick())
+
+
+if __name__ == "__main__":
+    unittest.main()
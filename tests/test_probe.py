@@ -0,0 +1,90 @@
+import unittest
+
+import requests
+
+from core import database
+from core.probe import host_of, probe, remember_max_connections
+from tests.support import LocalServer, use_temp_database
+
+DATA = bytes(range(256)) * 400
+
+
+class ProbeCacheTest(unittest.TestCase):
+    def setUp(self):
+        use_temp_database(self)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+
+    def serve(self, **kwargs):
+        server = LocalServer({"/a.bin": DATA}, **kwargs)
+        server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        return server
+
+    def methods(self, server):
+        methods = [method for method, _, _ in server.requests]
+        del server.requests[:]
+        return methods
+
+    def caps(self, url):
+        return database.get_host_capabilities(host_of(url), 0)
+
+    def test_range_support_from_head(self):
+        server = self.serve()
+        result = probe(self.session, server.url("/a.bin"))
+        self.assertEqual((result.size, result.accepts_ranges), (len(DATA), True))
+        self.assertEqual(self.methods(server), ["HEAD"])
+        self.assertEqual(self.caps(server.url("/")), (True, True, None))
+
+    def test_host_without_ranges_skips_the_confirming_get_once_cached(self):
+        server = self.serve(ranges=False)
+        result = probe(self.session, server.url("/a.bin"))
+        self.assertEqual((result.size, result.accepts_ranges), (len(DATA), False))
+        self.assertEqual(self.methods(server), ["HEAD", "GET"])
+        result = probe(self.session, server.url("/a.bin"))
+        self.assertEqual((result.size, result.accepts_ranges), (len(DATA), False))
+        self.assertEqual(self.methods(server), ["HEAD"])
+
+    def test_not_modified(self):
+        server = self.serve()
+        result = probe(self.session, server.url("/a.bin"), {"If-None-Match": '"v1"'})
+        self.assertTrue(result.not_modified)
+        self.assertIsNone(self.caps(server.url("/"))) # Um 304 não diz nada sobre Range
+
+    def test_capabilities_belong_to_the_redirect_target(self):
+        target = self.serve()
+        redirector = self.serve(ranges=False, redirects={"/r": target.url("/a.bin")})
+        url = redirector.url("/r")
+        result = probe(self.session, url)
+        self.assertEqual(result.url, target.url("/a.bin"))
+        self.assertTrue(result.accepts_ranges)
+        self.assertEqual(self.caps(target.url("/")), (True, True, None))
+        self.assertIsNone(self.caps(url)) # O redirecionador não herda as capacidades
+
+        remember_max_connections(result.url, 6)
+        self.methods(redirector)
+        result = probe(self.session, url)
+        # Direto ao destino em cache, com o limite aprendido nele
+        self.assertEqual(self.methods(redirector), [])
+        self.assertEqual(result.max_connections, 6)
+
+    def test_redirect_to_another_host_does_not_reuse_the_old_entry(self):
+        old_target = self.serve(ranges=False)
+        new_target = self.serve()
+        redirector = self.serve(redirects={"/r": old_target.url("/a.bin")})
+        url = redirector.url("/r")
+        self.assertFalse(probe(self.session, url).accepts_ranges)
+        remember_max_connections(old_target.url("/a.bin"), 2)
+
+        # O destino muda; o cache de redirecionamento aponta para o antigo, que agora redireciona
+        old_target.redirects["/a.bin"] = new_target.url("/a.bin")
+        result = probe(self.session, url)
+        self.assertEqual(result.url, new_target.url("/a.bin"))
+        self.assertTrue(result.accepts_ranges)
+        self.assertIsNone(result.max_connections)
+        self.assertEqual(self.caps(new_target.url("/")), (True, True, None))
+        self.assertEqual(self.caps(old_target.url("/")), (False, True, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
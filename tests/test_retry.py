@@ -0,0 +1,80 @@
+import time
+import unittest
+from email.utils import formatdate
+
+import requests
+
+from core.adaptive import ServerThrottled
+from core.retry import (RETRY_MAX_DELAY, HTTPStatusError, backoff_delay, is_retryable,
+                        parse_retry_after, retry_after_of)
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.exceptions.HTTPError(f"Erro HTTP {status}", response=response)
+
+
+class IsRetryableTest(unittest.TestCase):
+    def test_network_failures_are_retried(self):
+        for error in (requests.exceptions.ConnectionError(), requests.exceptions.Timeout(),
+                      requests.exceptions.ChunkedEncodingError(), ConnectionResetError(), TimeoutError()):
+            with self.subTest(error=type(error).__name__):
+                self.assertTrue(is_retryable(error))
+
+    def test_http_status(self):
+        for status in (429, 500, 503):
+            self.assertTrue(is_retryable(http_error(status)))
+            self.assertTrue(is_retryable(HTTPStatusError(status)))
+        for status in (403, 404, 416):
+            self.assertFalse(is_retryable(http_error(status)))
+            self.assertFalse(is_retryable(HTTPStatusError(status)))
+
+    def test_server_throttled(self):
+        self.assertTrue(is_retryable(ServerThrottled("limite", status=429, retry_after=2.0)))
+        self.assertEqual(retry_after_of(ServerThrottled("limite", status=503, retry_after=2.0)), 2.0)
+        self.assertFalse(is_retryable(ServerThrottled("Range recusado", status=416)))
+
+    def test_disk_and_logic_errors_are_not_retried(self):
+        for error in (OSError(28, "No space left on device"), PermissionError(), ValueError("Range ignorado")):
+            with self.subTest(error=error):
+                self.assertFalse(is_retryable(error))
+
+
+class RetryAfterTest(unittest.TestCase):
+    def test_parse_seconds_and_dates(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(parse_retry_after(" 5 "), 5.0)
+        delay = parse_retry_after(formatdate(time.time() + 30, usegmt=True))
+        self.assertTrue(25 <= delay <= 31, delay)
+        self.assertEqual(parse_retry_after(formatdate(time.time() - 30, usegmt=True)), 0.0)
+
+    def test_parse_invalid(self):
+        for value in (None, "", "amanhã", "-5"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_retry_after(value))
+
+    def test_retry_after_of(self):
+        self.assertEqual(retry_after_of(http_error(503, {'Retry-After': '7'})), 7.0)
+        self.assertIsNone(retry_after_of(http_error(503)))
+        self.assertEqual(retry_after_of(HTTPStatusError(429, retry_after=3.0)), 3.0)
+        self.assertIsNone(retry_after_of(ConnectionResetError()))
+
+
+class BackoffDelayTest(unittest.TestCase):
+    def test_exponential_with_jitter(self):
+        for attempt in range(1, 12):
+            ceiling = min(RETRY_MAX_DELAY, 2 ** (attempt - 1))
+            for _ in range(20):
+                delay = backoff_delay(attempt)
+                self.assertTrue(ceiling / 2 <= delay <= ceiling, (attempt, delay))
+
+    def test_retry_after_wins_but_is_capped(self):
+        self.assertEqual(backoff_delay(1, retry_after=12.0), 12.0)
+        self.assertEqual(backoff_delay(1, retry_after=0.0), 0.0)
+        self.assertEqual(backoff_delay(3, retry_after=3600.0), RETRY_MAX_DELAY)
+
+
+if __name__ == "__main__":
+    unittest.main()
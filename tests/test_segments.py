@@ -0,0 +1,95 @@
+import unittest
+
+from core.segments import SegmentScheduler
+
+MB = 1024 * 1024
+
+
+def covered(scheduler):
+    """Faixas [start, end] de todos os segmentos, ordenadas."""
+    return sorted((start, end) for start, end, _ in scheduler.snapshot())
+
+
+class SegmentSchedulerTest(unittest.TestCase):
+    def test_initial_split_covers_file_without_overlap(self):
+        scheduler = SegmentScheduler(10 * MB + 7, 4)
+        ranges = covered(scheduler)
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 10 * MB + 6)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(start, end + 1)
+
+    def test_small_file_is_not_split_below_min_split(self):
+        scheduler = SegmentScheduler(3 * MB, 16)
+        self.assertEqual(len(scheduler.snapshot()), 3)
+        scheduler = SegmentScheduler(100, 16)
+        self.assertEqual(covered(scheduler), [(0, 99)])
+
+    def test_steals_second_half_of_largest_active_segment(self):
+        scheduler = SegmentScheduler(8 * MB, 2)
+        first = scheduler.next_segment()
+        second = scheduler.next_segment()
+        first.position = first.start + 2 * MB # O primeiro já baixou metade
+        stolen = scheduler.next_segment()
+        # O segundo tem mais a baixar: perde a metade final
+        self.assertEqual((stolen.start, stolen.end), (6 * MB, 8 * MB - 1))
+        self.assertEqual(second.end, 6 * MB - 1)
+        self.assertEqual(first.end, 4 * MB - 1)
+
+    def test_does_not_steal_small_remainders(self):
+        scheduler = SegmentScheduler(4 * MB, 1, min_split=MB)
+        segment = scheduler.next_segment()
+        segment.position = segment.end - MB # Falta menos que 2 * min_split
+        self.assertIsNone(scheduler.next_segment())
+
+    def test_release_requeues_only_the_rest(self):
+        scheduler = SegmentScheduler(4 * MB, 1)
+        segment = scheduler.next_segment()
+        segment.position = MB
+        scheduler.release(segment)
+        self.assertFalse(scheduler.is_complete())
+        again = scheduler.next_segment()
+        self.assertIs(again, segment)
+        self.assertEqual(again.position, MB)
+        again.position = again.end + 1
+        scheduler.finish(again)
+        self.assertTrue(scheduler.is_complete())
+
+    def test_release_of_finished_segment_counts_as_done(self):
+        scheduler = SegmentScheduler(MB, 1)
+        segment = scheduler.next_segment()
+        segment.position = segment.end + 1
+        scheduler.release(segment)
+        self.assertTrue(scheduler.is_complete())
+
+    def test_resume_ranges(self):
+        scheduler = SegmentScheduler(10 * MB, 4, ranges=[(0, 99), (5 * MB, 6 * MB - 1)])
+        self.assertEqual(covered(scheduler), [(0, 99), (5 * MB, 6 * MB - 1)])
+
+    def test_fast_worker_steals_and_every_byte_is_written(self):
+        size = 16 * MB + 123
+        scheduler = SegmentScheduler(size, 4, min_split=256 * 1024)
+        written = bytearray(size)
+        block = 64 * 1024
+        # Workers simulados em rodízio; o último é 8x mais rápido que os outros
+        speeds = [1, 1, 1, 8]
+        current = [scheduler.next_segment() for _ in speeds]
+        while any(current):
+            for i, speed in enumerate(speeds):
+                segment = current[i]
+                if segment is None:
+                    continue
+                n = min(block * speed, segment.end - segment.position + 1)
+                written[segment.position:segment.position + n] = b"\x01" * n
+                segment.position += n
+                if segment.position > segment.end:
+                    scheduler.finish(segment)
+                    current[i] = scheduler.next_segment()
+        self.assertTrue(scheduler.is_complete())
+        self.assertNotIn(0, written)
+        self.assertGreater(len(scheduler.snapshot()), 4) # Houve roubo
+
+
+if __name__ == "__main__":
+    unittest.main()
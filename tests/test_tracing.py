@@ -0,0 +1,57 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from core import tracing
+from core.downloader import DownloadLogic
+from tests.support import FakeLang, LocalServer, use_temp_database
+
+
+class TracerTest(unittest.TestCase):
+    def test_chrome_format(self):
+        tracer = tracing.Tracer("a.iso")
+        start = tracer.now()
+        tracer.span("probe", tracing.MAIN, start, start + 0.002, size=10)
+        tracer.instant("first_byte", 3, ttfb_ms=1.5)
+        events = tracer.to_chrome()["traceEvents"]
+        names = {e["args"]["name"] for e in events if e["ph"] == "M"}
+        self.assertEqual(names, {"a.iso", "download", "worker 3"})
+        span = next(e for e in events if e["name"] == "probe")
+        self.assertEqual((span["tid"], span["dur"], span["args"]), (0, 2000.0, {"size": 10}))
+        instant = next(e for e in events if e["name"] == "first_byte")
+        self.assertEqual((instant["tid"], instant["s"]), (4, "t"))
+
+    def test_bind_is_per_thread(self):
+        tracer = tracing.Tracer()
+        tracing.bind(tracer, 2)
+        self.addCleanup(tracing.bind, None, None)
+        self.assertEqual(tracing.current(), (tracer, 2))
+        tracing.bind(None, 2)
+        self.assertIsNone(tracing.current())
+
+
+class DownloadTraceTest(unittest.TestCase):
+    def test_segmented_download_writes_a_trace(self):
+        use_temp_database(self)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        data = os.urandom(4 * 1024 * 1024)
+        with LocalServer({"/a.bin": data}) as server:
+            logic = DownloadLogic(FakeLang(), {})
+            self.addCleanup(logic.connection_pool.close)
+            logic.trace_dir = os.path.join(folder.name, "traces")
+            with contextlib.redirect_stdout(io.StringIO()): # Aviso com o caminho do trace
+                logic.download_file_manager(server.url("/a.bin"), folder.name, 4)
+        with open(logic.trace_file, encoding='utf-8') as f:
+            events = json.load(f)["traceEvents"]
+        names = {e["name"] for e in events}
+        self.assertTrue({"probe", "request", "first_byte", "segment"} <= names, names)
+        segments = [e for e in events if e["name"] == "segment"]
+        self.assertEqual(sum(e["args"]["bytes"] for e in segments), len(data))
+
+
+if __name__ == "__main__":
+    unittest.main()